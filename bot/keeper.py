@@ -3,6 +3,7 @@ import time
 import asyncio
 from dotenv import load_dotenv
 from safe_tx_utils import keeper_txs_handler
+from utils.rate_limiter import set_rpc_service
 import requests
 
 load_dotenv()
@@ -30,7 +31,8 @@ async def run_bot_loop(chain_id, api_url, sleep_interval):
     while True:
         try:
             print(f"\n--- Bot cycle started for chain {chain_id} at {time.strftime('%Y-%m-%d %H:%M:%S')} ---")
-            run_bot(chain_id, api_url)
+            # Sync HTTP and RPC calls: run them off the loop shared by every chain's bot
+            await asyncio.to_thread(run_bot, chain_id, api_url)
             print(f"--- Bot cycle completed for chain {chain_id}, sleeping for {sleep_interval} seconds ---")
             await asyncio.sleep(sleep_interval)
         except KeyboardInterrupt:
@@ -81,6 +83,7 @@ def wait_for_api_ready(url: str, timeout: int = 60, retry_interval: int = 3):
         time.sleep(retry_interval)
 
 if __name__ == "__main__":
+    set_rpc_service("bot")
     api_url = os.getenv("API_URL", "http://damm-api:8000")
     wait_for_api_ready(api_url, timeout=20, retry_interval=3)
     asyncio.run(run_parallel_bots(api_url))
@@ -118,8 +118,7 @@ def keeper_txs_handler(chain_id, pending):
                     raise ValueError(f"[{vault_address}] Unknown request type: {method}")
 
             if batched_args:
-                url = get_rpc_url(chain_id)
-                run_safe_tx(url, contract, instance["vault"]["safe"], *batched_args)
+                run_safe_tx(get_rpc_url(chain_id), contract, instance["vault"]["safe"], *batched_args)
 
         return True
 
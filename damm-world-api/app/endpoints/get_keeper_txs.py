@@ -1,22 +1,30 @@
 from fastapi import Depends, Query, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from app.auth.jwt_auth import get_current_user_jwt
 from db.query.endpoints.lagoon_keeper_txs import get_keepers_pending_txs_metadata
-from utils.rpc import get_w3
-from app.constants.abi.lagoon import LAGOON_ABI
-from app.constants.abi.erc20 import ERC20_ABI
+from core.blockchain import getEnvNode
 
 router = APIRouter()
 
-def get_new_total_assets(chain_id: int, vault_address: str, safe_address: str):
-    w3 = get_w3(chain_id)
-    vault_contract = w3.eth.contract(address=vault_address, abi=LAGOON_ABI)
-    deposit_token_address = vault_contract.functions.asset().call()
-    deposit_token_contract = w3.eth.contract(address=deposit_token_address, abi=ERC20_ABI)
-    realTotalAssets = deposit_token_contract.functions.balanceOf(safe_address).call()
-    return realTotalAssets
+def get_new_total_assets(chain_id: int, vaults: list) -> dict:
+    """
+    Underlying token balance of each vault's safe, keyed by vault address, read in a
+    single multicall. The underlying token is the vault's `asset()` stored at registration.
+    """
+    if not vaults:
+        return {}
+    node = getEnvNode(chain_id)
+    balances = node.multicall([
+        (node.get_erc20_contract(vault["underlying_token_address"]), "balanceOf", [vault["safe"]])
+        for vault in vaults
+    ])
+    for vault, balance in zip(vaults, balances):
+        if balance is None:
+            raise ValueError(f"Could not read the safe balance of vault {vault['vault_address']} on chain {chain_id}")
+    return {vault["vault_address"]: balance for vault, balance in zip(vaults, balances)}
 
-def get_keeper_txs(chain_id: int = 480):
-    result = get_keepers_pending_txs_metadata(chain_id)
+async def get_keeper_txs(chain_id: int = 480):
+    result = await get_keepers_pending_txs_metadata(chain_id)
     """ Result JSON format example:
     result = {
         "vaults_txs": [
@@ -47,7 +55,15 @@ def get_keeper_txs(chain_id: int = 480):
     if len(result["vaults_txs"]) == 0:
         return result
     
-    
+    # Total assets of every vault about to settle, in one round trip
+    settling = [
+        instance["vault"] for instance in result["vaults_txs"]
+        if instance["status"] not in ("syncing", "error") and instance["vault_txs"] != {}
+        and instance["vault_txs"]["initialUpdate"] != True
+        and (instance["vault_txs"]["pendingDeposit"] == True or instance["vault_txs"]["pendingRedeem"] == True)
+    ]
+    total_assets = await run_in_threadpool(get_new_total_assets, chain_id, settling)
+
     txs = []
     
     for instance in result["vaults_txs"]:
@@ -77,7 +93,7 @@ def get_keeper_txs(chain_id: int = 480):
             })
             continue
         if instance["vault_txs"]["pendingDeposit"] == True or instance["vault_txs"]["pendingRedeem"] == True:
-            realTotalAssets = get_new_total_assets(chain_id, vault["vault_address"], vault["safe"])
+            realTotalAssets = total_assets[vault["vault_address"]]
             instance_txs.append({
                 "type": "updateNewTotalAssets",
                 "assets": realTotalAssets,
@@ -110,16 +126,16 @@ def get_keeper_txs(chain_id: int = 480):
 
 
 @router.get("/lagoon/keeper_txs/test/{chain_id}")
-def read_keeper_txs_test(
+async def read_keeper_txs_test(
     chain_id: int = Query(480, description="Chain ID (default: 480 for Worldchain)"),
 ):
-    result = get_keeper_txs(chain_id)
+    result = await get_keeper_txs(chain_id)
     return result
     
 @router.get("/lagoon/keeper_txs")
-def read_keeper_txs(
+async def read_keeper_txs(
     current_user: dict = Depends(get_current_user_jwt),
     chain_id: int = Query(480, description="Chain ID (default: 480 for Worldchain)"),
 ):
-    result = get_keeper_txs(chain_id)
+    result = await get_keeper_txs(chain_id)
     return result
@@ -1,7 +1,12 @@
 import os
+import asyncio
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
+from db.async_db import init_async_db, get_async_db, close_async_db
+from utils.rate_limiter import set_rpc_service
 from app.auth.auth import router as auth_router
+from app.auth.jwt_auth import get_current_user_jwt
 from app.endpoints.get_user_txs import router as get_user_txs_router
 from app.endpoints.get_vault_snapshots import router as get_vault_snapshots_router
 from app.endpoints.get_user_position import router as get_user_position_router
@@ -13,9 +18,24 @@ from app.endpoints.get_vault_metadata import router as get_vault_metadata_router
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
+set_rpc_service("api")
 
 app = FastAPI(title="DAMM World API", version="0.1.0")
 
+# One asyncpg pool for the app's lifetime, shared by every request
+@app.on_event("startup")
+async def open_db_pool():
+    await init_async_db(os.getenv("DB_NAME"))
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await close_async_db()
+
+@app.exception_handler(asyncio.TimeoutError)
+async def db_pool_exhausted(request: Request, exc: asyncio.TimeoutError):
+    # No pooled connection freed up within API_DB_ACQUIRE_TIMEOUT
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"})
+
 allowed_origins_urls = []
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "")
 if allowed_origins:
@@ -42,4 +62,9 @@ app.include_router(get_vault_metadata_router)
 # Root endpoint for checking if the API is running
 @app.get("/")
 def read_root():
-    return {"status": "ok", "message": "Hello from DAMM World!"}
\ No newline at end of file
+    return {"status": "ok", "message": "Hello from DAMM World!"}
+
+# Connection pool usage: size, idle connections and acquire waits / timeouts
+@app.get("/db/stats")
+async def read_db_stats(current_user: dict = Depends(get_current_user_jwt)):
+    return get_async_db().stats()
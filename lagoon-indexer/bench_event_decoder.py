@@ -0,0 +1,120 @@
+"""
+Parity check and microbenchmark for the Lagoon log decoders.
+
+Synthesizes raw eth_getLogs entries for every tracked event, spot-checks that
+LagoonEventDecoder.decode_raw yields the same arguments as web3's process_log
+(the full parity suite is tests/test_event_decoder.py), then reports logs/sec
+for the web3, table-dispatch and fast paths.
+
+Usage: python bench_event_decoder.py [--logs 20000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_abi import encode
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+from constants.abi.lagoon import LAGOON_ABI
+from lagoon_event_decoder import TRACKED_EVENTS, get_lagoon_event_decoder, _abi_type
+
+VAULT = "0x" + "42" * 20
+
+
+def _random_value(abi_type: str) -> Any:
+    if abi_type == "address":
+        return "0x" + os.urandom(20).hex()
+    if abi_type.startswith("uint"):
+        return random.getrandbits(int(abi_type[4:] or 256))
+    if abi_type.startswith("("):
+        return tuple(_random_value(t) for t in abi_type[1:-1].split(","))
+    raise ValueError(f"Unsupported type in benchmark: {abi_type}")
+
+
+def make_raw_log(event_abi: Dict, topic0: bytes, block_number: int, log_index: int) -> Dict:
+    indexed = [i for i in event_abi["inputs"] if i["indexed"]]
+    not_indexed = [i for i in event_abi["inputs"] if not i["indexed"]]
+    topics = ["0x" + topic0.hex()]
+    for i in indexed:
+        abi_type = _abi_type(i)
+        topics.append("0x" + encode([abi_type], [_random_value(abi_type)]).hex())
+    data_types = [_abi_type(i) for i in not_indexed]
+    data = encode(data_types, [_random_value(t) for t in data_types])
+    return {
+        "address": VAULT,
+        "topics": topics,
+        "data": "0x" + data.hex(),
+        "blockNumber": hex(block_number),
+        "blockHash": "0x" + os.urandom(32).hex(),
+        "logIndex": hex(log_index),
+        "transactionIndex": "0x0",
+        "transactionHash": "0x" + os.urandom(32).hex(),
+        "removed": False,
+    }
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def check_parity(raw_logs: List[Dict], web3_events: Dict) -> int:
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    checked = 0
+    for raw in raw_logs:
+        fast = decoder.decode_raw(raw)
+        formatted = log_entry_formatter(raw)
+        reference = web3_events[fast.event_name]().process_log(formatted)
+        assert _normalize(fast.args) == _normalize(dict(reference["args"])), (fast.event_name, fast.args, reference["args"])
+        assert fast.blockNumber == reference["blockNumber"]
+        assert fast.logIndex == reference["logIndex"]
+        assert fast.transactionHash == reference["transactionHash"]
+        assert fast.blockHash == reference["blockHash"]
+        assert fast.address == reference["address"].lower()
+        checked += 1
+    return checked
+
+
+def bench(label: str, fn, raw_logs: List[Dict]):
+    start = time.perf_counter()
+    for raw in raw_logs:
+        fn(raw)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(raw_logs) / elapsed:>12,.0f} logs/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lagoon log decoder parity check and benchmark")
+    parser.add_argument("--logs", type=int, default=20000, help="Number of synthetic logs to decode")
+    args = parser.parse_args()
+
+    abis = {e["name"]: e for e in LAGOON_ABI if e.get("type") == "event"}
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    topic_by_name = {name: topic for topic, (name, _) in decoder.decoders.items()}
+    raw_logs = [
+        make_raw_log(abis[name], topic_by_name[name], 1_000_000 + n, n % 50)
+        for n, name in enumerate(random.choices(TRACKED_EVENTS, k=args.logs))
+    ]
+
+    web3_events = Web3().eth.contract(address=Web3.to_checksum_address(VAULT), abi=LAGOON_ABI).events
+    print(f"Parity OK for {check_parity(raw_logs, web3_events)} logs across {len(TRACKED_EVENTS)} event types")
+
+    # The pre-change loop: format the entry, then let a fresh ContractEvent decode it
+    event_by_topic = {raw["topics"][0]: web3_events[decoder.decode_raw(raw).event_name] for raw in raw_logs}
+    bench("web3 process_log", lambda raw: event_by_topic[raw["topics"][0]]().process_log(log_entry_formatter(raw)), raw_logs)
+    bench("topic0 table + get_event_data", lambda raw: decoder.decode(log_entry_formatter(raw)), raw_logs)
+    bench("fast path (decode_raw)", decoder.decode_raw, raw_logs)
+
+
+if __name__ == "__main__":
+    main()
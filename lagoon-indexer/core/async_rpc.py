@@ -0,0 +1,204 @@
+import os
+import time
+import asyncio
+import itertools
+from typing import Any, Dict, List, Tuple
+
+import aiohttp
+from hexbytes import HexBytes
+from web3._utils.method_formatters import block_formatter, log_entry_formatter
+
+from core.hedging import HedgingPolicy, hedge_key
+from utils.rate_limiter import get_scheduler, parse_retry_after
+from utils.rpc import is_throttle_response, redact_url
+from utils.rpc_cache import MISS, get_rpc_cache
+
+
+class RpcError(Exception):
+    """JSON-RPC level error returned by the node (HTTP 200 with an `error` member)."""
+    def __init__(self, method: str, error: Dict):
+        self.method = method
+        self.code = error.get("code") if isinstance(error, dict) else None
+        self.message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        super().__init__(f"{method} failed ({self.code}): {self.message}")
+
+
+# One keep-alive session per (event loop, rpc url), shared by every client
+_sessions: Dict[Tuple[int, str], aiohttp.ClientSession] = {}
+
+def _get_session(rpc_url: str) -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    key = (id(loop), rpc_url)
+    session = _sessions.get(key)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv("RPC_MAX_CONNECTIONS", "100")),
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=float(os.getenv("RPC_TIMEOUT", "30"))),
+        )
+        _sessions[key] = session
+    return session
+
+async def close_sessions():
+    """Close every pooled session opened from the running event loop."""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [k for k in _sessions if k[0] == loop_id]:
+        await _sessions.pop(key).close()
+
+
+class AsyncRpcClient:
+    """
+    Asyncio JSON-RPC client for a single endpoint, or for a chain's endpoint pool
+    when `pool` is given (each request then goes to an endpoint the pool picks and
+    its outcome is reported back). With a `hedging` policy, idempotent reads are
+    hedged across two pool endpoints. Requests go over pooled keep-alive aiohttp
+    sessions, so no thread is involved per call. Pool clients serve immutable
+    results from the local RPC cache when it is on.
+    """
+    def __init__(self, rpc_url: str, batch_size: int = 100, pool=None, hedging: HedgingPolicy = None):
+        self.rpc_url = rpc_url
+        self.batch_size = batch_size
+        self.pool = pool
+        self.hedging = hedging
+        self.cache = get_rpc_cache() if pool else None
+        self._ids = itertools.count(1)
+
+    async def _post(self, payload):
+        if self.pool is None:
+            return await self._post_to(self.rpc_url, payload)
+        key = hedge_key(payload) if self.hedging else None
+        if key is not None and len(self.pool.endpoints) > 1:
+            return await self.hedging.run(self.pool, key, lambda endpoint: self._post_to_endpoint(endpoint, payload))
+        return await self._post_to_endpoint(self.pool.pick(), payload)
+
+    async def _post_to_endpoint(self, endpoint, payload):
+        start = time.monotonic()
+        try:
+            result = await self._post_to(endpoint.url, payload)
+        except Exception:
+            self.pool.record(endpoint, time.monotonic() - start, False)
+            raise
+        self.pool.record(endpoint, time.monotonic() - start, True)
+        return result
+
+    async def _post_to(self, url: str, payload):
+        # Every call goes through the endpoint's rate limiter; a batch costs one token per call
+        cost = len(payload) if isinstance(payload, list) else 1
+        async with get_scheduler(url, redact_url(url)).slot_async(cost=cost) as slot:
+            async with _get_session(url).post(url, json=payload) as response:
+                if response.status == 429:
+                    slot.throttled(parse_retry_after(response.headers.get("Retry-After")))
+                response.raise_for_status()
+                result = await response.json(content_type=None)
+            if is_throttle_response(result):
+                slot.throttled()
+            return result
+
+    async def request(self, method: str, params: List[Any]) -> Any:
+        if self.cache is not None:
+            cached = self.cache.get(self.pool.chain_id, method, params)
+            if cached is not MISS:
+                return cached
+        response = await self._post({"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params})
+        if response.get("error"):
+            raise RpcError(method, response["error"])
+        if self.cache is not None:
+            self.cache.observe(self.pool.chain_id, method, params, response.get("result"))
+        return response.get("result")
+
+    async def batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """Send `calls` as JSON-RPC batches of at most `batch_size`, returning results in order."""
+        if self.cache is None:
+            return await self._batch(calls)
+        results = [self.cache.get(self.pool.chain_id, method, params) for method, params in calls]
+        missing = [i for i, result in enumerate(results) if result is MISS]
+        fetched = await self._batch([calls[i] for i in missing])
+        for i, result in zip(missing, fetched):
+            method, params = calls[i]
+            self.cache.observe(self.pool.chain_id, method, params, result)
+            results[i] = result
+        return results
+
+    async def _batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        results: List[Any] = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                for i, (method, params) in enumerate(chunk)
+            ]
+            response = await self._post(payload)
+            if not isinstance(response, list):
+                raise RpcError("batch", response.get("error", response))
+            by_id = {item.get("id"): item for item in response}
+            for i, (method, _) in enumerate(chunk):
+                item = by_id.get(i, {"error": {"message": "missing from batch response"}})
+                if item.get("error"):
+                    raise RpcError(method, item["error"])
+                results.append(item.get("result"))
+        return results
+
+    async def block_number(self) -> int:
+        return int(await self.request("eth_blockNumber", []), 16)
+
+    async def get_block(self, block_identifier, full_transactions: bool = False) -> Dict:
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        block = await self.request("eth_getBlockByNumber", [block_identifier, full_transactions])
+        if block is None:
+            raise RpcError("eth_getBlockByNumber", {"message": f"block {block_identifier} not found"})
+        return block_formatter(block)
+
+    async def get_block_headers(self, block_nums: List[int]) -> Dict[int, Dict]:
+        """`hash`, `parentHash` (hex strings) and `timestamp` (int) of each block, in one batch."""
+        block_nums = list(block_nums)
+        blocks = await self.batch([("eth_getBlockByNumber", [hex(b), False]) for b in block_nums])
+        headers = {}
+        for block_num, block in zip(block_nums, blocks):
+            if block is None:
+                raise RpcError("eth_getBlockByNumber", {"message": f"block {block_num} not found"})
+            headers[block_num] = {
+                "hash": block["hash"],
+                "parentHash": block["parentHash"],
+                "timestamp": int(block["timestamp"], 16),
+            }
+        return headers
+
+    async def get_block_timestamps(self, block_nums: List[int]) -> Dict[int, int]:
+        headers = await self.get_block_headers(block_nums)
+        return {block_num: header["timestamp"] for block_num, header in headers.items()}
+
+    async def get_logs(self, from_block: int, to_block: int, address, event_topics: list, raw: bool = False,
+                       pin_to_block: bool = False) -> List[Dict]:
+        """
+        Same filter shape as `Blockchain.get_logs`: any of `event_topics` as topic0.
+        With `raw` the node's hex-string entries are returned untouched. With
+        `pin_to_block` the header of `to_block` is asked first in the same batch, so
+        the same endpoint answers both: one that has not seen `to_block` yet raises
+        RpcError instead of returning logs that miss the last blocks.
+        """
+        params = [{
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+            "address": address,
+            "topics": [["0x" + bytes(topic).hex() for topic in event_topics]],
+        }]
+        if pin_to_block:
+            # Straight to the endpoint: a cached header would say nothing about it
+            header, logs = await self._batch([("eth_getBlockByNumber", [hex(to_block), False]), ("eth_getLogs", params)])
+            if header is None:
+                raise RpcError("eth_getLogs", {"message": f"block {to_block} not found on the endpoint serving the logs"})
+        else:
+            logs = await self.request("eth_getLogs", params)
+        if raw:
+            return logs
+        return [log_entry_formatter(log) for log in logs]
+
+    async def eth_call(self, transaction: Dict, block_identifier="latest") -> HexBytes:
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        return HexBytes(await self.request("eth_call", [transaction, block_identifier]))
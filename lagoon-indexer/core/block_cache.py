@@ -0,0 +1,136 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from core.timestamp_oracle import TimestampOracle, get_timestamp_oracle
+
+
+class BlockTimestampCache:
+    """
+    LRU cache of block number -> block timestamp for a single chain.
+    Shared by every vault task indexing that chain, so a block is fetched
+    at most once no matter how many vaults emitted events in it. With an
+    `oracle`, misses are derived from the block number where possible.
+    """
+    def __init__(self, chain_id: int, max_size: int = 50_000, oracle: Optional[TimestampOracle] = None):
+        self.chain_id = chain_id
+        self.max_size = max_size
+        self.oracle = oracle
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[int, asyncio.Future] = {}
+
+    def get_many(self, blockchain, block_numbers: Iterable[int]) -> Dict[int, int]:
+        """
+        Return the timestamps of the given blocks. Missing blocks are fetched
+        from `blockchain` with a single batched header request.
+        """
+        wanted = set(int(b) for b in block_numbers)
+        found: Dict[int, int] = {}
+        with self._lock:
+            for block_number in wanted:
+                ts = self._entries.get(block_number)
+                if ts is not None:
+                    self._entries.move_to_end(block_number)
+                    found[block_number] = ts
+            missing = sorted(wanted - found.keys())
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            if self.oracle:
+                fetched = self.oracle.get_timestamps(blockchain.getBlockTimestamps, missing)
+            else:
+                fetched = blockchain.getBlockTimestamps(missing)
+            found.update(fetched)
+            self.put_many(fetched)
+        return found
+
+    async def get_many_async(self, blockchain, block_numbers: Iterable[int]) -> Dict[int, int]:
+        """
+        Async variant of `get_many` using `blockchain.aio`. Blocks already being
+        fetched by another vault task are awaited instead of requested twice.
+        """
+        wanted = set(int(b) for b in block_numbers)
+        found: Dict[int, int] = {}
+        pending: Dict[int, asyncio.Future] = {}
+        with self._lock:
+            for block_number in wanted:
+                ts = self._entries.get(block_number)
+                if ts is not None:
+                    self._entries.move_to_end(block_number)
+                    found[block_number] = ts
+                elif block_number in self._inflight:
+                    pending[block_number] = self._inflight[block_number]
+            missing = sorted(wanted - found.keys() - pending.keys())
+            self.hits += len(found) + len(pending)
+            self.misses += len(missing)
+            loop = asyncio.get_running_loop()
+            owned = {block_number: loop.create_future() for block_number in missing}
+            self._inflight.update(owned)
+
+        if missing:
+            try:
+                if self.oracle:
+                    fetched = await self.oracle.get_timestamps_async(blockchain.aio.get_block_timestamps, missing)
+                else:
+                    fetched = await blockchain.aio.get_block_timestamps(missing)
+                self.put_many(fetched)
+                found.update(fetched)
+                for block_number, future in owned.items():
+                    future.set_result(fetched[block_number])
+            finally:
+                # On failure or cancellation hand the waiters an error so they retry themselves
+                for block_number, future in owned.items():
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"Timestamp fetch for block {block_number} failed"))
+                        future.exception()  # Mark retrieved, no "never retrieved" warning
+                with self._lock:
+                    for block_number in owned:
+                        self._inflight.pop(block_number, None)
+
+        for block_number, future in pending.items():
+            found[block_number] = await future
+        return found
+
+    def put_many(self, timestamps: Dict[int, int]):
+        with self._lock:
+            for block_number, ts in timestamps.items():
+                self._entries[block_number] = ts
+                self._entries.move_to_end(block_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict_from(self, block_number: int):
+        """Forget every block from `block_number` on, e.g. after a reorg replaced them."""
+        with self._lock:
+            for cached in [b for b in self._entries if b >= block_number]:
+                del self._entries[cached]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        stats = {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+        if self.oracle:
+            stats["oracle"] = self.oracle.stats()
+        return stats
+
+
+_caches: Dict[int, BlockTimestampCache] = {}
+_caches_lock = threading.Lock()
+
+def get_block_timestamp_cache(chain_id: int) -> BlockTimestampCache:
+    """Return the process-wide timestamp cache for `chain_id`."""
+    with _caches_lock:
+        if chain_id not in _caches:
+            max_size = int(os.getenv("BLOCK_TS_CACHE_SIZE", "50000"))
+            _caches[chain_id] = BlockTimestampCache(chain_id, max_size, get_timestamp_oracle(chain_id))
+        return _caches[chain_id]
@@ -1,25 +1,107 @@
-from typing import Dict
+import os
+import time
+import requests
+from typing import Any, Dict, List, Sequence, Tuple
+from eth_abi.exceptions import DecodingError
 from web3 import Web3
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
 from web3.middleware import geth_poa_middleware
 from constants.abi.erc20 import ERC20_ABI
 from constants.abi.lagoon import LAGOON_ABI
 from constants.abi.weth9 import WETH9_ABI
 from constants.abi.optimismMintableERC20 import WLD_ABI
 from constants.abi.safe import SAFE_ABI
-from utils.rpc import get_rpc_url
+from constants.abi.multicall3 import MULTICALL3_ABI, MULTICALL3_ADDRESS
+from utils.rpc import RpcEndpointPool, PooledHTTPProvider, get_endpoint_pool, get_ws_url, is_throttle_response, redact_url
+from utils.rate_limiter import get_scheduler, parse_retry_after
+from utils.rpc_cache import MISS, get_rpc_cache
+from core.async_rpc import AsyncRpcClient
+from core.hedging import hedging_enabled, get_hedging_policy
+from core.ws_subscription import eth_subscribe, eth_subscribe_many
 
 class Blockchain:
-    def __init__(self, rpc_url, chain_id, is_PoA=False):
-        provider = Web3.HTTPProvider(rpc_url)
+    def __init__(self, rpc_url, chain_id, is_PoA=False, pool: RpcEndpointPool = None):
+        # With a pool, requests are spread over its healthy endpoints and `rpc_url` is only the preferred one
+        provider = PooledHTTPProvider(pool) if pool else Web3.HTTPProvider(rpc_url)
+        self.rpc_url = rpc_url
+        self.pool = pool
         self.node = Web3(provider)
+        self.session = requests.Session()
+        self.batch_size = int(os.getenv("RPC_BATCH_SIZE", "100"))
+        self.multicall_batch_size = int(os.getenv("MULTICALL_BATCH_SIZE", "200"))
+        # Local cache of immutable results (old blocks, receipts, traces, pinned eth_call)
+        self.cache = get_rpc_cache() if pool else None
+        # Async provider mode: get_logs, get_block, block_number and eth_call
+        # awaitable on a pooled keep-alive HTTP session. Reads are hedged when RPC_HEDGING is on
+        hedging = get_hedging_policy(chain_id) if pool and hedging_enabled() else None
+        self.aio = AsyncRpcClient(rpc_url, self.batch_size, pool, hedging)
         if is_PoA:
             self.node.middleware_onion.inject(geth_poa_middleware, layer=0)
         self.chain_id = chain_id
+        # Streaming mode: eth_subscribe endpoint for newHeads / logs, None when not configured
+        self.ws_url = get_ws_url(chain_id)
 
     def getBlockTimestamp(self, block_num: int) -> int:
         block = self.node.eth.get_block(block_num)
         return block['timestamp']
 
+    def getBlockTimestamps(self, block_nums: List[int]) -> Dict[int, int]:
+        """
+        Fetch the timestamps of several blocks using JSON-RPC batch requests
+        of at most RPC_BATCH_SIZE headers each. Cached headers are not requested.
+        """
+        timestamps = {}
+        block_nums = list(block_nums)
+        if self.cache is not None:
+            for block_num in block_nums:
+                block = self.cache.get(self.chain_id, "eth_getBlockByNumber", [hex(block_num), False])
+                if block is not MISS:
+                    timestamps[block_num] = int(block["timestamp"], 16)
+            block_nums = [b for b in block_nums if b not in timestamps]
+        for start in range(0, len(block_nums), self.batch_size):
+            chunk = block_nums[start:start + self.batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": i, "method": "eth_getBlockByNumber", "params": [hex(block_num), False]}
+                for i, block_num in enumerate(chunk)
+            ]
+            results = self._post(payload)
+            if not isinstance(results, list):
+                raise ValueError(f"Batch request rejected by RPC: {results}")
+            for item in results:
+                if item.get("error") or not item.get("result"):
+                    raise ValueError(f"eth_getBlockByNumber failed for block {chunk[item.get('id', 0)]}: {item.get('error')}")
+                block_num = chunk[item["id"]]
+                timestamps[block_num] = int(item["result"]["timestamp"], 16)
+                if self.cache is not None:
+                    self.cache.observe(self.chain_id, "eth_getBlockByNumber", [hex(block_num), False], item["result"])
+        return timestamps
+
+    def _post(self, payload):
+        if self.pool is None:
+            return self._post_to(self.rpc_url, payload)
+        endpoint = self.pool.pick()
+        start = time.monotonic()
+        try:
+            results = self._post_to(endpoint.url, payload)
+        except Exception:
+            self.pool.record(endpoint, time.monotonic() - start, False)
+            raise
+        self.pool.record(endpoint, time.monotonic() - start, True)
+        return results
+
+    def _post_to(self, url: str, payload):
+        cost = len(payload) if isinstance(payload, list) else 1
+        with get_scheduler(url, redact_url(url)).slot(cost=cost) as slot:
+            response = self.session.post(url, json=payload, timeout=30)
+            if response.status_code == 429:
+                slot.throttled(parse_retry_after(response.headers.get("Retry-After")))
+            response.raise_for_status()
+            results = response.json()
+            if is_throttle_response(results):
+                slot.throttled()
+            return results
+
     def getLatestBlockNumber(self) -> int:
         return self.node.eth.block_number
 
@@ -57,6 +139,36 @@ class Blockchain:
         decode_return = self.node.codec.decode(abi_types, output_data[1])
         return decode_return[0] if len(decode_return) == 1 else decode_return
 
+    def multicall(self, calls: Sequence[Tuple[Any, str, Sequence]], block_identifier="latest") -> List[Any]:
+        """
+        Run contract reads through Multicall3 `aggregate3`, MULTICALL_BATCH_SIZE per eth_call.
+        `calls` are (contract, function name, args). Results come back in order, each the
+        decoded return value (as `contract.functions.<name>(*args).call()` would give it),
+        or None for a call that reverted or returned nothing decodable.
+        """
+        multicall = self.node.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+        results: List[Any] = []
+        for start in range(0, len(calls), self.multicall_batch_size):
+            chunk = calls[start:start + self.multicall_batch_size]
+            call3 = [
+                (contract.address, True, contract.encodeABI(fn_name=function_name, args=list(args)))
+                for contract, function_name, args in chunk
+            ]
+            returned = multicall.functions.aggregate3(call3).call(block_identifier=block_identifier)
+            for (contract, function_name, _), (success, data) in zip(chunk, returned):
+                results.append(self._decode_call_result(contract, function_name, data) if success else None)
+        return results
+
+    def _decode_call_result(self, contract, function_name: str, data: bytes):
+        function_abi = self.get_function_abi(contract, function_name)
+        abi_types = [self.get_abi_type(output) for output in function_abi['outputs']]
+        try:
+            decoded = self.node.codec.decode(abi_types, data)
+        except DecodingError:
+            return None  # e.g. no code at the target
+        decoded = map_abi_data(BASE_RETURN_NORMALIZERS, abi_types, decoded)
+        return decoded[0] if len(decoded) == 1 else tuple(decoded)
+
     def get_logs(self, from_block: int, to_block: int, lagoon_address: str, event_topics: list):
         return self.node.eth.get_logs({
             "fromBlock": from_block,
@@ -65,6 +177,26 @@ class Blockchain:
             "topics": [event_topics]
         })
     
+    def subscribe_new_heads(self, on_subscribed=None):
+        """Async iterator over raw newHeads headers. Raises ConnectionError when the socket drops."""
+        if not self.ws_url:
+            raise ValueError(f"No WebSocket RPC configured for chain_id {self.chain_id}")
+        return eth_subscribe(self.ws_url, ["newHeads"], on_subscribed=on_subscribed)
+
+    def subscribe_heads_and_logs(self, addresses: List[str], event_topics: list, on_subscribed=None):
+        """
+        Async iterator over ("newHeads", raw header) and ("logs", raw log) items from one
+        WebSocket, in the order the node sent them. Logs are the eth_getLogs entries (hex
+        strings) emitted by `addresses` with any of `event_topics` as topic0.
+        """
+        if not self.ws_url:
+            raise ValueError(f"No WebSocket RPC configured for chain_id {self.chain_id}")
+        log_filter = {"address": addresses, "topics": [["0x" + bytes(topic).hex() for topic in event_topics]]}
+        return _tag_subscriptions(
+            eth_subscribe_many(self.ws_url, [["newHeads"], ["logs", log_filter]], on_subscribed=on_subscribed),
+            ("newHeads", "logs"),
+        )
+
     def get_erc20_contract(self, address: str):
         return self.node.eth.contract(address=Web3.to_checksum_address(address), abi=ERC20_ABI)
     
@@ -92,18 +224,18 @@ class Blockchain:
             abi=SAFE_ABI
         )
 
+SUPPORTED_CHAIN_IDS = (480, 31337, 8453, 1, 11155111, 10)
+
+async def _tag_subscriptions(notifications, names: Tuple[str, ...]):
+    async for index, result in notifications:
+        yield names[index], result
+
 def getEnvNode(chain_id: int) -> Blockchain:
-    if chain_id == 480:
-        return Blockchain(get_rpc_url(480), 480)
-    elif chain_id == 31337:
-        return Blockchain(get_rpc_url(31337), 31337)
-    elif chain_id == 8453:
-        return Blockchain(get_rpc_url(8453), 8453)
-    elif chain_id == 1:
-        return Blockchain(get_rpc_url(1), 1)
-    elif chain_id == 11155111:
-        return Blockchain(get_rpc_url(11155111), 11155111)
-    elif chain_id == 10:
-        return Blockchain(get_rpc_url(10), 10)
-    else:
+    """
+    Build a node on the chain's long-lived endpoint pool. Cheap: endpoint health
+    is probed in the background, not on construction.
+    """
+    if chain_id not in SUPPORTED_CHAIN_IDS:
         raise Exception('RPC unavailable for that chain_id')
+    pool = get_endpoint_pool(chain_id)
+    return Blockchain(pool.best_url(), chain_id, pool=pool)
@@ -0,0 +1,120 @@
+import os
+import asyncio
+import traceback
+from typing import Optional
+
+from core.blockchain import getEnvNode
+from utils.rate_limiter import PRIORITY_TAIL, rpc_priority
+from utils.rpc import get_ws_url
+from utils.rpc_cache import get_rpc_cache
+
+
+class ChainHeadTracker:
+    """
+    Single source of the chain head for every vault task of a chain.
+
+    Follows `newHeads` over WebSocket when a WS endpoint is configured, and polls
+    eth_blockNumber every `poll_interval` otherwise (or while the subscription is
+    down). Vault loops read `latest()` instead of querying the node themselves and
+    park in `wait_for_head` until the head moves past what they have seen.
+    While a log stream is live it sets `stream_head`, the last block it published,
+    and the vaults follow that instead, so they read streamed blocks from memory.
+    """
+    def __init__(self, chain_id: int, poll_interval: float = 2.0, ws_url: Optional[str] = None, ws_retry: float = 30.0):
+        self.chain_id = chain_id
+        self.poll_interval = poll_interval
+        self.ws_url = ws_url
+        self.ws_retry = ws_retry
+        self.head: Optional[int] = None
+        self.stream_head: Optional[int] = None  # Last block published by a live log stream, None without one
+        self.updates = 0
+        self.blockchain = None
+        self.rpc_cache = get_rpc_cache()
+        self._condition = asyncio.Condition()
+
+    async def _set_head(self, head: int):
+        if self.head is not None and head <= self.head:
+            return
+        if self.rpc_cache is not None:
+            # newHeads never goes through eth_blockNumber, which is where the cache learns the head
+            self.rpc_cache.note_head(self.chain_id, head)
+        async with self._condition:
+            self.head = head
+            self.updates += 1
+            self._condition.notify_all()
+
+    async def _poll_once(self):
+        if self.blockchain is None:
+            self.blockchain = getEnvNode(self.chain_id)
+        with rpc_priority(PRIORITY_TAIL):
+            await self._set_head(await self.blockchain.aio.block_number())
+
+    async def _poll_for(self, duration: Optional[float]):
+        loop = asyncio.get_running_loop()
+        until = None if duration is None else loop.time() + duration
+        while until is None or loop.time() < until:
+            try:
+                await self._poll_once()
+            except Exception as e:
+                print(f"[{self.chain_id}] Head poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self):
+        """Track the head forever. Meant to run as a task owned by `launch_forever`."""
+        if not self.ws_url:
+            await self._poll_for(None)
+        while True:
+            try:
+                if self.blockchain is None:
+                    self.blockchain = getEnvNode(self.chain_id)
+                async for header in self.blockchain.subscribe_new_heads():
+                    await self._set_head(int(header["number"], 16))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{self.chain_id}] newHeads subscription dropped ({e}), polling for {self.ws_retry}s")
+                traceback.print_exc()
+            await self._poll_for(self.ws_retry)
+
+    async def follow_stream(self, stream_head: Optional[int]):
+        """Make the vaults follow the log stream's last published block, or the chain head again with None."""
+        async with self._condition:
+            self.stream_head = stream_head
+            self._condition.notify_all()
+
+    def _visible_head(self) -> Optional[int]:
+        return self.stream_head if self.stream_head is not None else self.head
+
+    async def latest(self) -> int:
+        if self._visible_head() is None:
+            await self._poll_once()
+        return self._visible_head()
+
+    async def wait_for_head(self, above: int, timeout: float) -> Optional[int]:
+        """Wait until the head is past `above`, at most `timeout` seconds. Returns the current head."""
+        async with self._condition:
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self._visible_head() is not None and self._visible_head() > above),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                pass
+            return self._visible_head()
+
+    def stats(self):
+        return {
+            "head": self.head,
+            "stream_head": self.stream_head,
+            "updates": self.updates,
+            "source": "newHeads" if self.ws_url else "polling",
+        }
+
+
+def make_head_tracker(chain_id: int) -> ChainHeadTracker:
+    return ChainHeadTracker(
+        chain_id,
+        poll_interval=float(os.getenv("HEAD_POLL_INTERVAL", "2")),
+        ws_url=get_ws_url(chain_id),
+        ws_retry=float(os.getenv("HEAD_WS_RETRY", "30")),
+    )
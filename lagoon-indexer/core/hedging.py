@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# Idempotent reads that may safely be sent twice
+HEDGED_METHODS = {
+    "eth_getLogs",
+    "eth_getBlockByNumber",
+    "eth_getBlockByHash",
+    "eth_getTransactionReceipt",
+    "eth_call",
+}
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("RPC_HEDGING", "0").lower() in ("1", "true", "yes")
+
+
+def hedge_key(payload) -> Optional[str]:
+    """Latency bucket of a JSON-RPC payload, or None if it must not be hedged."""
+    if isinstance(payload, list):
+        methods = {item["method"] for item in payload}
+        if len(methods) == 1 and methods <= HEDGED_METHODS:
+            return f"batch:{methods.pop()}"
+        return None
+    return payload["method"] if payload["method"] in HEDGED_METHODS else None
+
+
+class HedgingPolicy:
+    """
+    Per-chain hedging of idempotent RPC reads over an endpoint pool.
+
+    If a request has not answered after the `percentile` latency observed for its
+    method, a duplicate is sent to a second healthy endpoint. The first successful
+    answer wins and the other request is cancelled. Hedges are capped at
+    `max_ratio` of requests so a slow provider cannot double our traffic.
+    """
+    def __init__(self, chain_id: int, percentile: float = 95.0, initial_delay: float = 0.5, min_delay: float = 0.05,
+                 max_delay: float = 5.0, max_ratio: float = 0.1, window: int = 500):
+        self.chain_id = chain_id
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_ratio = max_ratio
+        self.window = window
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, key: str) -> float:
+        with self._lock:
+            samples = self._latencies.get(key)
+            if not samples or len(samples) < 20:
+                return self.initial_delay
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def observe(self, key: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def _may_fire(self) -> bool:
+        return self.fired < self.max_ratio * self.requests
+
+    async def run(self, pool, key: str, send: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Run `send(endpoint)` on an endpoint from `pool`, hedging it on a second
+        endpoint once the delay for `key` has passed without an answer.
+        """
+        self.requests += 1
+        start = time.monotonic()
+        primary = pool.pick()
+        tasks = {asyncio.ensure_future(send(primary)): False}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay(key))
+            if not done:
+                secondary = pool.pick(exclude=[primary])
+                if secondary is not primary and secondary.healthy and self._may_fire():
+                    self.fired += 1
+                    tasks[asyncio.ensure_future(send(secondary))] = True
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task]:
+                            self.won += 1
+                        self.observe(key, time.monotonic() - start)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The losing (or abandoned) request is cancelled, not awaited
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.fired,
+            "hedges_won": self.won,
+            "delays_ms": {key: round(self.delay(key) * 1000, 1) for key in list(self._latencies)},
+        }
+
+
+_policies: Dict[int, HedgingPolicy] = {}
+_policies_lock = threading.Lock()
+
+def get_hedging_policy(chain_id: int) -> HedgingPolicy:
+    """Return the process-wide hedging policy for `chain_id`."""
+    with _policies_lock:
+        if chain_id not in _policies:
+            _policies[chain_id] = HedgingPolicy(
+                chain_id,
+                percentile=float(os.getenv("RPC_HEDGE_PERCENTILE", "95")),
+                initial_delay=float(os.getenv("RPC_HEDGE_INITIAL_DELAY", "0.5")),
+                min_delay=float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05")),
+                max_ratio=float(os.getenv("RPC_HEDGE_MAX_RATIO", "0.1")),
+            )
+        return _policies[chain_id]
@@ -0,0 +1,69 @@
+import bisect
+from datetime import datetime
+from decimal import Context, Decimal, ROUND_HALF_UP
+from typing import List, Optional, Tuple
+
+from db.db import Database
+from db.query.lagoon_db_utils import LagoonDbUtils
+
+# vault_snapshots.share_price is NUMERIC(78,18): points keep the value the database stores
+SHARE_PRICE_QUANTUM = Decimal("1e-18")
+_NUMERIC_CONTEXT = Context(prec=78)
+
+
+class SharePriceSeries:
+    """
+    Share price snapshots of one vault as a timestamp-sorted array, so the point
+    nearest to a timestamp is found by bisection instead of a query.
+
+    The array is loaded once from vault_snapshots and kept in step with it: points
+    added while a unit of work is open stay pending until it commits, and `begin`
+    drops those of a rolled back range. `invalidate` forces a reload after rows
+    were deleted (reorg rollback, vault reset).
+    """
+    def __init__(self, vault_id: str):
+        self.vault_id = vault_id
+        self.loaded = False
+        self.timestamps: List[datetime] = []
+        self.prices: List[Decimal] = []
+        self.pending: List[Tuple[datetime, Decimal]] = []
+
+    def begin(self, db: Database):
+        """Start a range: forget uncommitted points, load the series if needed."""
+        self.pending = []
+        if not self.loaded:
+            rows = LagoonDbUtils.get_share_price_series(db, self.vault_id)
+            self.timestamps = [row['snapshot_ts'] for row in rows]
+            self.prices = [Decimal(row['share_price']) for row in rows]
+            self.loaded = True
+
+    def invalidate(self):
+        self.loaded = False
+        self.timestamps, self.prices, self.pending = [], [], []
+
+    def nearest(self, db: Database, ts: datetime) -> Optional[Tuple[datetime, Decimal]]:
+        """Snapshot (timestamp, share price) nearest to `ts`, the earlier one on a tie. None without snapshots."""
+        if not self.loaded:
+            self.begin(db)
+        candidates = list(self.pending)
+        index = bisect.bisect_left(self.timestamps, ts)
+        for i in (index - 1, index):
+            if 0 <= i < len(self.timestamps):
+                candidates.append((self.timestamps[i], self.prices[i]))
+        if not candidates:
+            return None
+        return min(candidates, key=lambda point: (abs((point[0] - ts).total_seconds()), point[0]))
+
+    def add(self, db: Database, ts: datetime, share_price: Decimal):
+        """Record the snapshot being written; it joins the series once its unit of work commits."""
+        price = Decimal(share_price).quantize(SHARE_PRICE_QUANTUM, rounding=ROUND_HALF_UP, context=_NUMERIC_CONTEXT)
+        self.pending.append((ts, price))
+        if len(self.pending) == 1:
+            db.on_commit(self._commit_pending)
+
+    def _commit_pending(self):
+        for ts, price in self.pending:
+            index = bisect.bisect_right(self.timestamps, ts)
+            self.timestamps.insert(index, ts)
+            self.prices.insert(index, price)
+        self.pending = []
@@ -0,0 +1,184 @@
+import os
+import threading
+from bisect import bisect_right, insort
+from typing import Awaitable, Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+# Chains producing blocks at a fixed interval, so timestamps are affine in the block number
+FIXED_BLOCK_TIME_CHAIN_IDS = {
+    480,  # Worldchain
+    8453,  # Base
+    10,  # Optimism
+}
+
+
+class TimestampOracle:
+    """
+    Block timestamps derived from the block number on fixed-block-time chains.
+
+    Real headers are kept as anchors. Between two anchors whose timestamps differ
+    by a whole number of seconds per block (the block time, which may change at
+    rare upgrades), every block's timestamp is computed instead of fetched.
+    Blocks outside such spans are resolved by fetching a few samples (the ends of
+    the request, then the middle of any span that does not line up) until
+    everything is covered, so a span with a block time change costs a few
+    bisection rounds rather than a header per block. Every `verify_every` derived
+    timestamps one is fetched and checked; on a mismatch the anchors are dropped
+    and the request falls back to real fetches.
+    """
+    def __init__(self, chain_id: int, verify_every: int = 1000):
+        self.chain_id = chain_id
+        self.verify_every = verify_every
+        self.derived = 0
+        self.fetched = 0
+        self.verify_failures = 0
+        self._since_verify = 0
+        self._anchors: Dict[int, int] = {}
+        self._keys: List[int] = []  # Sorted anchor block numbers
+        self._lock = threading.Lock()
+
+    def _consistent(self, a: int, b: int) -> bool:
+        elapsed = self._anchors[b] - self._anchors[a]
+        return elapsed > 0 and elapsed % (b - a) == 0
+
+    def _derive(self, blocks: List[int]) -> Tuple[Dict[int, int], List[int]]:
+        """Timestamps of the blocks covered by anchors, and the (sorted) blocks that are not."""
+        found, uncovered = {}, []
+        with self._lock:
+            for block_number in blocks:
+                i = bisect_right(self._keys, block_number)
+                below = self._keys[i - 1] if i > 0 else None
+                if below == block_number:
+                    found[block_number] = self._anchors[below]
+                elif below is not None and i < len(self._keys) and self._consistent(below, self._keys[i]):
+                    above = self._keys[i]
+                    block_time = (self._anchors[above] - self._anchors[below]) // (above - below)
+                    found[block_number] = self._anchors[below] + block_time * (block_number - below)
+                else:
+                    uncovered.append(block_number)
+        return found, uncovered
+
+    def _samples(self, uncovered: List[int]) -> List[int]:
+        """Blocks to fetch next: the ends beyond the anchors, the middle of each span that does not line up."""
+        if not self._keys:
+            return sorted({uncovered[0], uncovered[-1]})
+        groups: Dict[int, List[int]] = {}
+        with self._lock:
+            for block_number in uncovered:
+                groups.setdefault(bisect_right(self._keys, block_number), []).append(block_number)
+            last = len(self._keys)
+        samples = set()
+        for i, group in groups.items():
+            if i == 0:
+                samples.add(group[0])
+            elif i == last:
+                samples.add(group[-1])
+            else:
+                samples.add(group[len(group) // 2])
+        return sorted(samples)
+
+    def _learn(self, timestamps: Dict[int, int]):
+        """Add fetched headers as anchors, dropping the ones made redundant by their neighbours."""
+        with self._lock:
+            for block_number, ts in timestamps.items():
+                if block_number not in self._anchors:
+                    insort(self._keys, block_number)
+                self._anchors[block_number] = ts
+            keys = self._keys
+            kept = [keys[0]] if keys else []
+            for i in range(1, len(keys) - 1):
+                if not (self._consistent(kept[-1], keys[i]) and self._consistent(keys[i], keys[i + 1])):
+                    kept.append(keys[i])
+            if len(keys) > 1:
+                kept.append(keys[-1])
+            for block_number in set(keys) - set(kept):
+                del self._anchors[block_number]
+            self._keys = kept
+
+    def _reset(self, timestamps: Dict[int, int]):
+        with self._lock:
+            self._anchors = dict(timestamps)
+            self._keys = sorted(timestamps)
+
+    def _resolve(self, blocks: List[int]) -> Generator[List[int], Dict[int, int], Dict[int, int]]:
+        """
+        Resolution steps shared by the sync and async entry points: yields the
+        blocks to fetch, receives their timestamps, returns the timestamps of `blocks`.
+        """
+        found, uncovered = self._derive(blocks)
+        fetched: Dict[int, int] = {}
+        verify: Optional[int] = None
+        self._since_verify += len(found)
+        if found and self._since_verify >= self.verify_every:
+            verify = max(found)
+            self._since_verify = 0
+
+        while uncovered or verify is not None:
+            request = self._samples(uncovered) if uncovered else []
+            if verify is not None and verify not in request:
+                request.append(verify)
+            result = yield request
+            fetched.update(result)
+            self.fetched += len(result)
+
+            if verify is not None:
+                if result[verify] != found[verify]:
+                    self.verify_failures += 1
+                    print(f"[{self.chain_id}] Derived timestamp of block {verify} was off by "
+                          f"{result[verify] - found[verify]}s, fetching blocks instead")
+                    self._reset(fetched)
+                    # Whatever was derived can no longer be trusted
+                    uncovered = sorted(set(blocks) - fetched.keys())
+                    found = {}
+                verify = None
+            self._learn(result)
+            derived, uncovered = self._derive(uncovered)
+            found.update(derived)
+
+        self.derived += len(found.keys() - fetched.keys())
+        found.update(fetched)
+        return {block_number: found[block_number] for block_number in blocks}
+
+    def get_timestamps(self, fetch: Callable[[List[int]], Dict[int, int]], block_numbers: Iterable[int]) -> Dict[int, int]:
+        """Timestamps of `block_numbers`, calling `fetch` (block numbers -> timestamps) for the samples it needs."""
+        steps = self._resolve(sorted(set(block_numbers)))
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(fetch(request))
+        except StopIteration as done:
+            return done.value
+
+    async def get_timestamps_async(self, fetch: Callable[[List[int]], Awaitable[Dict[int, int]]],
+                                   block_numbers: Iterable[int]) -> Dict[int, int]:
+        """Async variant of `get_timestamps` for an async `fetch`."""
+        steps = self._resolve(sorted(set(block_numbers)))
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(await fetch(request))
+        except StopIteration as done:
+            return done.value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "anchors": len(self._keys),
+            "derived": self.derived,
+            "fetched": self.fetched,
+            "verify_failures": self.verify_failures,
+        }
+
+
+_oracles: Dict[int, TimestampOracle] = {}
+_oracles_lock = threading.Lock()
+
+def get_timestamp_oracle(chain_id: int) -> Optional[TimestampOracle]:
+    """Return the process-wide oracle for `chain_id`, None if its block time is not fixed or the oracle is off."""
+    if chain_id not in FIXED_BLOCK_TIME_CHAIN_IDS or os.getenv("BLOCK_TS_ORACLE", "1").lower() in ("0", "false", "no"):
+        return None
+    with _oracles_lock:
+        if chain_id not in _oracles:
+            _oracles[chain_id] = TimestampOracle(
+                chain_id,
+                verify_every=int(os.getenv("BLOCK_TS_VERIFY_EVERY", "1000")),
+            )
+        return _oracles[chain_id]
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict
+
+from db.db import Database
+from db.query.lagoon_db_utils import LagoonDbUtils
+
+
+class UserIdResolver:
+    """
+    LRU cache of address -> user_id for a single chain, shared by every vault
+    task indexing that chain. `resolve` looks a whole range's owners up at once:
+    cached addresses cost nothing, the rest take one bulk upsert and one select.
+    Users created inside a unit of work are only cached once it commits, so a
+    rolled back range never leaves ids of rows that do not exist.
+    """
+    def __init__(self, chain_id: int, max_size: int = 100_000):
+        self.chain_id = chain_id
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Database, first_seen: Dict[str, datetime]) -> Dict[str, str]:
+        """
+        Return the user_id of every address in `first_seen` (lowercase address ->
+        timestamp of its first event, used as created_at for new users).
+        """
+        found: Dict[str, str] = {}
+        with self._lock:
+            for address in first_seen:
+                user_id = self._entries.get(address)
+                if user_id is not None:
+                    self._entries.move_to_end(address)
+                    found[address] = user_id
+            missing = {address: ts for address, ts in first_seen.items() if address not in found}
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            fetched = LagoonDbUtils.get_or_create_user_ids(db, self.chain_id, missing)
+            found.update(fetched)
+            db.on_commit(lambda: self.put_many(fetched))
+        return found
+
+    def put_many(self, user_ids: Dict[str, str]):
+        with self._lock:
+            for address, user_id in user_ids.items():
+                self._entries[address] = user_id
+                self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_resolvers: Dict[int, UserIdResolver] = {}
+_resolvers_lock = threading.Lock()
+
+def get_user_id_resolver(chain_id: int) -> UserIdResolver:
+    """Return the process-wide user id resolver for `chain_id`."""
+    with _resolvers_lock:
+        if chain_id not in _resolvers:
+            _resolvers[chain_id] = UserIdResolver(chain_id, int(os.getenv("USER_ID_CACHE_SIZE", "100000")))
+        return _resolvers[chain_id]
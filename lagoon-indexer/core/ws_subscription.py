@@ -0,0 +1,54 @@
+import itertools
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+import aiohttp
+
+from core.async_rpc import RpcError
+
+_ids = itertools.count(1)
+
+
+async def eth_subscribe(ws_url: str, params: List[Any], heartbeat: float = 30.0,
+                        on_subscribed: Optional[Callable[[str], None]] = None) -> AsyncIterator[Any]:
+    """
+    Open a WebSocket to `ws_url`, `eth_subscribe` with `params` (e.g. ["newHeads"]
+    or ["logs", {...}]) and yield each notification's result. `on_subscribed` is
+    called once the node has acknowledged the subscription. Raises
+    ConnectionError when the socket closes, so callers can resubscribe and
+    reconcile whatever they missed.
+    """
+    on_all_subscribed = (lambda ids: on_subscribed(ids[0])) if on_subscribed else None
+    async for _, result in eth_subscribe_many(ws_url, [params], heartbeat, on_all_subscribed):
+        yield result
+
+
+async def eth_subscribe_many(ws_url: str, params_list: List[List[Any]], heartbeat: float = 30.0,
+                             on_subscribed: Optional[Callable[[List[str]], None]] = None) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Several `eth_subscribe` on one WebSocket, yielding (index in `params_list`, result)
+    for each notification in the order the node sent them. `on_subscribed` gets the
+    subscription ids once the node has acknowledged all of them.
+    """
+    request_ids = {next(_ids): index for index in range(len(params_list))}
+    subscriptions = {}  # Subscription id -> index in params_list
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(ws_url, heartbeat=heartbeat) as ws:
+            for request_id, index in request_ids.items():
+                await ws.send_json({"jsonrpc": "2.0", "id": request_id, "method": "eth_subscribe", "params": params_list[index]})
+            async for message in ws:
+                if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = message.json()
+                if data.get("id") in request_ids:
+                    if data.get("error"):
+                        raise RpcError("eth_subscribe", data["error"])
+                    subscriptions[data["result"]] = request_ids[data["id"]]
+                    if on_subscribed and len(subscriptions) == len(request_ids):
+                        on_subscribed(sorted(subscriptions, key=subscriptions.get))
+                    continue
+                if data.get("method") == "eth_subscription" and data["params"]["subscription"] in subscriptions:
+                    yield subscriptions[data["params"]["subscription"]], data["params"]["result"]
+    names = ", ".join(params[0] for params in params_list)
+    raise ConnectionError(f"Subscription {names} closed by {ws_url.split('//')[-1].split('/')[0]}")
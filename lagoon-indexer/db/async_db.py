@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+import pandas as pd
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+
+
+@lru_cache(maxsize=1024)
+def to_asyncpg_query(query: str) -> str:
+    """Rewrite a psycopg2-style query (`%s` placeholders, `%%` literals) for asyncpg (`$1`, `$2`...)."""
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group(0) == "%%" else f"${next(counter)}", query)
+
+
+def _row_to_dict(record: asyncpg.Record) -> Dict[str, Any]:
+    # Same value types as psycopg2 hands back, so query modules behave alike on both drivers
+    return {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in record.items()}
+
+
+async def _init_connection(connection: asyncpg.Connection):
+    for json_type in ("json", "jsonb"):
+        await connection.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncDatabase:
+    """
+    asyncpg connection pool with the query helpers of `Database`, for the API.
+
+    Queries keep the psycopg2 `%s` placeholder style so SQL is shared with the
+    sync code. Every call borrows a pooled connection for the duration of the
+    query; waiting longer than `acquire_timeout` for one raises
+    `asyncio.TimeoutError`. Acquire waits and timeouts are counted in `stats()`.
+    """
+    def __init__(self, pool: asyncpg.Pool, acquire_timeout: float):
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.acquires = 0
+        self.acquire_timeouts = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.queries = 0
+
+    @classmethod
+    async def create(cls, host, port, db_name, user, password, min_size: int = 1, max_size: int = 10,
+                     statement_cache_size: int = 100, acquire_timeout: float = 10.0) -> "AsyncDatabase":
+        pool = await asyncpg.create_pool(
+            host=host,
+            port=int(port) if port else None,
+            database=db_name,
+            user=user,
+            password=password,
+            min_size=min_size,
+            max_size=max_size,
+            statement_cache_size=statement_cache_size,
+            init=_init_connection,
+        )
+        return cls(pool, acquire_timeout)
+
+    async def close(self):
+        await self.pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        start = time.monotonic()
+        try:
+            connection = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        wait = time.monotonic() - start
+        self.acquires += 1
+        self.acquire_wait_total += wait
+        self.acquire_wait_max = max(self.acquire_wait_max, wait)
+        try:
+            yield connection
+        finally:
+            await self.pool.release(connection)
+
+    async def queryResponse(self, query, params=None) -> Optional[List[Dict[str, Any]]]:
+        async with self.connection() as connection:
+            self.queries += 1
+            try:
+                records = await connection.fetch(to_asyncpg_query(query), *(params or ()))
+            except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                print(e)
+                return None
+        return [_row_to_dict(record) for record in records]
+
+    async def frameResponse(self, query, params=None) -> pd.DataFrame:
+        return pd.DataFrame(await self.queryResponse(query, params))
+
+    async def execute(self, query, params=None) -> bool:
+        async with self.connection() as connection:
+            self.queries += 1
+            try:
+                await connection.execute(to_asyncpg_query(query), *(params or ()))
+            except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                print(e)
+                return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "max_size": self.pool.get_max_size(),
+            "queries": self.queries,
+            "acquires": self.acquires,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait_avg_ms": round(self.acquire_wait_total / self.acquires * 1000, 2) if self.acquires else None,
+            "acquire_wait_max_ms": round(self.acquire_wait_max * 1000, 2),
+        }
+
+
+_async_db: Optional[AsyncDatabase] = None
+
+async def init_async_db(db_name: str = '') -> AsyncDatabase:
+    """Create the process-wide pool from the DB_* and API_DB_POOL_* environment."""
+    global _async_db
+    if _async_db is None:
+        _async_db = await AsyncDatabase.create(
+            host=os.getenv('DB_HOST'),
+            port=os.getenv('DB_PORT'),
+            db_name=db_name or os.getenv('DB_NAME'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            min_size=int(os.getenv("API_DB_POOL_MIN", "1")),
+            max_size=int(os.getenv("API_DB_POOL_MAX", "10")),
+            statement_cache_size=int(os.getenv("API_DB_STATEMENT_CACHE", "100")),
+            acquire_timeout=float(os.getenv("API_DB_ACQUIRE_TIMEOUT", "10")),
+        )
+    return _async_db
+
+def get_async_db() -> AsyncDatabase:
+    if _async_db is None:
+        raise RuntimeError("Async database pool not initialized, call init_async_db() first")
+    return _async_db
+
+async def close_async_db():
+    global _async_db
+    if _async_db is not None:
+        await _async_db.close()
+        _async_db = None
@@ -1,9 +1,50 @@
-from typing import List
+from typing import Any, Callable, Dict, List, Sequence
+import io
 import os
+import json
+import hashlib
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.extras import Json, execute_values
 import pandas as pd
 
+# Smaller batches are a single multi-row INSERT: one round trip instead of COPY + INSERT ... SELECT
+COPY_MIN_ROWS = int(os.getenv("COPY_MIN_ROWS", "1000"))
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _copy_value(value: Any) -> str:
+    """One field in COPY text format: `\\N` for NULL, the type's text input otherwise."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Decimal):
+        return format(value, "f")  # Never scientific notation: exact NUMERIC(78,0) input
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).translate(_COPY_ESCAPES)
+
+def _insert_value(value: Any) -> Any:
+    """A value psycopg2 can adapt in a multi-row INSERT."""
+    if isinstance(value, (dict, list)):
+        return Json(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+class UnitOfWorkAborted(Exception):
+    """A statement failed inside a unit of work; the whole unit was rolled back."""
+
 class Database:
     def __init__(self, host, port, db_name, user, password):
         self.connection = psycopg2.connect(
@@ -13,6 +54,67 @@ class Database:
             user=user,
             password=password
         )
+        self._unit_depth = 0
+        self._after_commit: List[Callable[[], None]] = []
+        self._staging_tables = set()  # copyRows staging tables created in this session
+        self._staged_in_unit = set()  # staging tables holding rows in the open unit of work
+
+    @contextmanager
+    def unit_of_work(self, synchronous_commit: bool = True):
+        """
+        Run the block as one transaction: helpers called inside join it instead of
+        committing, and it commits exactly once on exit, or rolls back if anything
+        raises. Nested units join the outermost one. `synchronous_commit=False` lets
+        the commit return before its WAL is flushed: a crash may lose the last units,
+        never half of one. Callbacks registered with `on_commit` run after the commit.
+        """
+        if self._unit_depth:
+            self._unit_depth += 1
+            try:
+                yield self
+            finally:
+                self._unit_depth -= 1
+            return
+        self._unit_depth = 1
+        try:
+            if not synchronous_commit:
+                with self.connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL synchronous_commit = off")
+            yield self
+        except BaseException:
+            self._after_commit.clear()
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+            callbacks, self._after_commit = self._after_commit, []
+            for callback in callbacks:
+                callback()
+        finally:
+            self._unit_depth = 0
+            self._staged_in_unit.clear()
+
+    @property
+    def in_unit_of_work(self) -> bool:
+        return self._unit_depth > 0
+
+    def on_commit(self, callback: Callable[[], None]):
+        """Run `callback` once the current unit of work commits (right away outside one); dropped on rollback."""
+        if self._unit_depth:
+            self._after_commit.append(callback)
+        else:
+            callback()
+
+    def commit(self):
+        """Commit, unless inside a unit of work, which commits once when it ends."""
+        if not self._unit_depth:
+            self.connection.commit()
+
+    def rollback(self):
+        """Roll back the open transaction; inside a unit of work this aborts the whole unit."""
+        self.connection.rollback()
+        if self._unit_depth:
+            raise UnitOfWorkAborted("Statement failed inside a unit of work, transaction rolled back")
 
     def closeConnection(self):
         if self.connection is not None:
@@ -27,7 +129,7 @@ class Database:
                 cursor.execute(query)
         except Exception as e:
             print(e)
-            self.connection.rollback()
+            self.rollback()
             return
         raw_response = cursor.fetchall()
         if raw:
@@ -41,7 +143,7 @@ class Database:
                 row_dict[col_name] = row[i]
             result.append(row_dict)
         if commit:
-            self.connection.commit()
+            self.commit()
         cursor.close()
         return result
 
@@ -54,9 +156,9 @@ class Database:
             cursor.execute(query, params)
         except Exception as e:
             print(e)
-            self.connection.rollback()
+            self.rollback()
             return False
-        self.connection.commit()
+        self.commit()
         cursor.close()
         return True
 
@@ -67,26 +169,74 @@ class Database:
                     cursor.execute(query)
                 except Exception as e:
                     print(e)
-                    self.connection.rollback()
+                    self.rollback()
                     return False
-            self.connection.commit()
+            self.commit()
             return True
 
     def insertDf(self, df: pd.DataFrame, table_name: str):
         if len(df) == 0:
             return
+        return self.copyRows(table_name, df.astype(object).where(df.notna(), None).to_dict(orient="records"))
+
+    def copyRows(self, table_name: str, rows: Sequence[Dict[str, Any]], skip_conflicts: bool = False) -> bool:
+        """
+        Bulk insert `rows` (dicts keyed by column). Batches under COPY_MIN_ROWS are one
+        multi-row INSERT; larger ones are COPYed into a per-session staging table and moved
+        in with one INSERT ... SELECT. `skip_conflicts` adds ON CONFLICT DO NOTHING.
+        Decimals, UUIDs, datetimes and JSON values go through the columns' text input.
+        """
+        if not rows:
+            return True
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        column_list = ",".join(f'"{column}"' for column in columns)
+        on_conflict = "ON CONFLICT DO NOTHING" if skip_conflicts else ""
+
         with self.connection.cursor() as cursor:
-            insert_query = f"""INSERT INTO "{table_name}" ({','.join(df.columns)}) VALUES %s"""
-            values = df.to_records(index=False).tolist()
             try:
-                execute_values(cursor, insert_query, values)
-                self.connection.commit()
+                if len(rows) < COPY_MIN_ROWS:
+                    execute_values(
+                        cursor,
+                        f'INSERT INTO "{table_name}" ({column_list}) VALUES %s {on_conflict}',
+                        [tuple(_insert_value(row.get(column)) for column in columns) for row in rows],
+                        page_size=len(rows),
+                    )
+                else:
+                    self._copy_through_staging(cursor, table_name, columns, column_list, rows, on_conflict)
+                self.commit()
                 return True
             except Exception as e:
                 print(e)
-                self.connection.rollback()
+                self.rollback()
                 return False
 
+    def _copy_through_staging(self, cursor, table_name: str, columns: List[str], column_list: str,
+                              rows: Sequence[Dict[str, Any]], on_conflict: str):
+        staging = f"_copy_{table_name}_{hashlib.md5(column_list.encode()).hexdigest()[:8]}"
+        if staging in self._staged_in_unit:
+            # Loaded earlier in this unit of work, which has not committed yet
+            cursor.execute(f'DELETE FROM "{staging}"')
+        elif staging not in self._staging_tables:
+            # Same column types as the target, no constraints: the target checks them on the final INSERT.
+            # ON COMMIT DELETE ROWS empties it at every commit, without rewriting its file like TRUNCATE
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS "{staging}" ON COMMIT DELETE ROWS '
+                f'AS SELECT {column_list} FROM "{table_name}" WITH NO DATA'
+            )
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row.get(column)) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY "{staging}" ({column_list}) FROM STDIN', buffer)
+        cursor.execute(f'INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM "{staging}" {on_conflict}')
+
+        if self._unit_depth:
+            self._staged_in_unit.add(staging)
+        # A rolled back CREATE leaves no table behind: only remember it once committed
+        self.on_commit(lambda: self._staging_tables.add(staging))
+
     def getColumns(self, table):
         col_query = f"""
             SELECT column_name
@@ -137,6 +287,23 @@ def getEnvDb(db_name: str = '') -> Database:
         password=os.getenv('DB_PASSWORD')
     )
 
+_writer_executors: Dict[int, ThreadPoolExecutor] = {}
+_writer_executors_lock = threading.Lock()
+
+def get_writer_executor(chain_id: int) -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool running the blocking DB writes of `chain_id`'s vault
+    tasks, DB_WRITER_THREADS at a time. Apart from the default executor, so other
+    to_thread work (registration, replays) and the writers cannot starve each other.
+    """
+    with _writer_executors_lock:
+        if chain_id not in _writer_executors:
+            _writer_executors[chain_id] = ThreadPoolExecutor(
+                max_workers=int(os.getenv("DB_WRITER_THREADS", "4")),
+                thread_name_prefix=f"db-writer-{chain_id}",
+            )
+        return _writer_executors[chain_id]
+
 def getEnvDbUrl(db_name: str = '') -> str:
     db_name = db_name if db_name else os.getenv('DB_NAME')
     return f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{db_name}"
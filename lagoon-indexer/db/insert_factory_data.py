@@ -5,7 +5,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 from db import getEnvDb
 from utils.lagoon_db_date_utils import LagoonDbDateUtils
 from web3 import Web3
-from utils.rpc import get_rpc_url
+from utils.rpc import get_w3
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -36,9 +36,10 @@ def get_factory_metadata(tx_hash: str, chain_id: int) -> dict:
         - "silo": address of the silo (created via CREATE)
         - "block_number": block number of the transaction
     """
-    # Resolve RPC URL and set up Web3 provider
-    rpc_url = get_rpc_url(chain_id)
-    web3 = Web3(Web3.HTTPProvider(rpc_url))
+    # Pooled provider: the trace and the transaction are served from the RPC cache once seen
+    web3 = get_w3(chain_id)
+    # Transaction first: its block is what lets the RPC cache keep the trace once final
+    block_number = web3.eth.get_transaction(tx_hash).blockNumber
 
     # Perform a call trace of the transaction using `debug_traceTransaction`
     trace = web3.provider.make_request("debug_traceTransaction", [
@@ -92,7 +93,7 @@ def get_factory_metadata(tx_hash: str, chain_id: int) -> dict:
     return {
         "vault": vault_address,
         "silo": silo_address,
-        "block_number": web3.eth.get_transaction(tx_hash).blockNumber
+        "block_number": block_number
     }
 
 def insert_factory_data(creation_tx_hash: str, chain_id: int):
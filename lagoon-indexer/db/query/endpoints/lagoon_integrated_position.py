@@ -1,7 +1,6 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
 from .pagination_utils import PaginationUtils
-import os
 
 def get_integrated_position_data_query(offset: int = 0, limit: int = 20) -> str:
     """
@@ -123,23 +122,23 @@ def get_integrated_position_data_query(offset: int = 0, limit: int = 20) -> str:
     """
 
 
-def get_integrated_position(address: str, offset: int, limit: int, chain_id: int) -> Dict[str, Any]:
+async def get_integrated_position(address: str, offset: int, limit: int, chain_id: int) -> Dict[str, Any]:
     """
     Endpoint: returns paginated integrated positions for ALL vaults in `chain_id`
     for the given `address`. No per-vault loop. Rows appear with zeros when the
     user has no activity (thanks to LEFT JOINs + COALESCE).
     """
-    db = getEnvDb(os.getenv('DB_NAME'))
+    db = get_async_db()
     lowercase_address = address.lower()
 
     # Try to resolve a user_id; if none, pass NULL so CTEs return 0 rows (LEFT JOIN keeps vault rows).
-    user_df = db.frameResponse(
+    user_df = await db.frameResponse(
         "SELECT user_id FROM users WHERE address = %s AND chain_id = %s",
         (lowercase_address, chain_id)
     )
     user_id = user_df.iloc[0]['user_id'] if not user_df.empty else None
 
-    result = PaginationUtils.get_custom_paginated_results(
+    result = await PaginationUtils.get_custom_paginated_results(
         db=db,
         count_query=PaginationUtils.get_integrated_position_count_query(),     # expects (chain_id,)
         data_query=get_integrated_position_data_query,        # expects (chain_id, user_id, user_id)
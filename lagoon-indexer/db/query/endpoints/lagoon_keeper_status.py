@@ -1,9 +1,22 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
-from db.query.lagoon_db_utils import LagoonDbUtils
-import os
+from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
 
-def update_keeper_status(
+async def update_bot_status(db, vault_id: str, last_processed_block: int, last_processed_timestamp: str) -> bool:
+    """Async `LagoonDbUtils.update_bot_status`; the timestamp string is parsed by Postgres as before."""
+    query = """
+        UPDATE bot_status
+        SET
+            last_processed_block = %s,
+            last_processed_timestamp = %s::text::timestamp,
+            in_sync = %s,
+            updated_at = %s
+        WHERE vault_id = %s
+    """
+    now_ts = LagoonDbDateUtils.get_datetime_formatted_now()
+    return await db.execute(query, (last_processed_block, last_processed_timestamp, False, now_ts, vault_id))
+
+async def update_keeper_status(
     chain_id: int,
     vault_address: str,
     last_processed_block: int,
@@ -23,13 +36,13 @@ def update_keeper_status(
     """
     try:
         # Initialize database connection
-        db = getEnvDb(os.getenv('DB_NAME'))
+        db = get_async_db()
 
         # 1) Check vault exists
         vaults_query = """
             SELECT v.vault_id FROM vaults v JOIN tokens t ON v.vault_token_id = t.token_id WHERE t.address = %s
         """
-        vaults_df = db.frameResponse(vaults_query, (vault_address,))
+        vaults_df = await db.frameResponse(vaults_query, (vault_address,))
         if vaults_df.empty:
             return {
                 "success": False,
@@ -42,7 +55,7 @@ def update_keeper_status(
         chains_query = """
             SELECT 1 FROM chains WHERE chain_id = %s
         """
-        chains_df = db.frameResponse(chains_query, (chain_id,))
+        chains_df = await db.frameResponse(chains_query, (chain_id,))
         if chains_df.empty:
             return {
                 "success": False,
@@ -50,7 +63,7 @@ def update_keeper_status(
             }
 
         # 3) Update bot_status table
-        LagoonDbUtils.update_bot_status(db, vault_id, last_processed_block, last_processed_timestamp)
+        await update_bot_status(db, vault_id, last_processed_block, last_processed_timestamp)
 
         return {
             "success": True,
@@ -1,8 +1,7 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
-import os
 
-def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
+async def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
     """
     Get pending deposit and redeem requests that need to be settled.
     Get settled deposit requests owners for claiming shares on behalf.
@@ -12,7 +11,7 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
         pendingRedeem: bool
         settledDeposit: list of controllers
     """
-    db = getEnvDb(os.getenv('DB_NAME'))
+    db = get_async_db()
     
     vaults_query = """
         SELECT v.vault_id, v.price_oracle_address, v.safe_address, dt.address as underlying_token_address, vt.address as vault_address
@@ -93,7 +92,7 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
 
     vaults_txs = []
 
-    vaults_df = db.frameResponse(vaults_query, (chain_id,))
+    vaults_df = await db.frameResponse(vaults_query, (chain_id,))
 
     for row in vaults_df.itertuples(index=False):
         vault_id = row.vault_id
@@ -106,7 +105,7 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
             "underlying_token_address": row.underlying_token_address,
         }
 
-        keeper_bot_enabled_df = db.frameResponse(bot_enabled_query, (vault["vault_address"], chain_id))
+        keeper_bot_enabled_df = await db.frameResponse(bot_enabled_query, (vault["vault_address"], chain_id))
         if keeper_bot_enabled_df.empty or not keeper_bot_enabled_df.iloc[0].keeper_bot_enabled:
             vaults_txs.append({
                 "status": "paused",
@@ -116,7 +115,7 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
             })
             continue
 
-        indexer_state_df = db.frameResponse(indexer_state_query, (vault_id,))
+        indexer_state_df = await db.frameResponse(indexer_state_query, (vault_id,))
         if indexer_state_df.empty:
             vaults_txs.append({
                 "status": "error",
@@ -126,7 +125,7 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
             })
             continue
 
-        bot_status_df = db.frameResponse(bot_status_query, (vault_id,))
+        bot_status_df = await db.frameResponse(bot_status_query, (vault_id,))
         if bot_status_df.empty:
             vaults_txs.append({
                 "status": "error",
@@ -156,10 +155,10 @@ def get_keepers_pending_txs_metadata(chain_id: int = 480) -> Dict[str, Any]:
             })
             continue
         
-        initial_update_df = db.frameResponse(initial_update_query, (chain_id, vault_id))
-        deposit_df = db.frameResponse(deposit_query, (chain_id, vault_id))
-        redeem_df = db.frameResponse(redeem_query, (chain_id, vault_id))
-        settled_deposit_df = db.frameResponse(settled_deposit_query, (chain_id, vault_id))
+        initial_update_df = await db.frameResponse(initial_update_query, (chain_id, vault_id))
+        deposit_df = await db.frameResponse(deposit_query, (chain_id, vault_id))
+        redeem_df = await db.frameResponse(redeem_query, (chain_id, vault_id))
+        settled_deposit_df = await db.frameResponse(settled_deposit_query, (chain_id, vault_id))
 
         vault_txs = {
             "initialUpdate": initial_update_df.empty,
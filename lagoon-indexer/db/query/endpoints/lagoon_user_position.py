@@ -1,7 +1,6 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
 from .pagination_utils import PaginationUtils
-import os
 
 def get_user_position_data_query(offset: int = 0, limit: int = 20) -> str:
     """Custom data query for user positions with calculated fields."""
@@ -60,18 +59,18 @@ def get_user_position_data_query(offset: int = 0, limit: int = 20) -> str:
         LIMIT {limit}
     """
 
-def get_user_position(address: str, offset: int, limit: int, chain_id: int = 480) -> Dict[str, Any]:
+async def get_user_position(address: str, offset: int, limit: int, chain_id: int = 480) -> Dict[str, Any]:
     """
     Get user positions across all vaults by constructing data on the fly from multiple tables.
     """
-    db = getEnvDb(os.getenv('DB_NAME'))
+    db = get_async_db()
     lowercase_address = address.lower()
 
     print(f"DEBUG: Looking for user {lowercase_address} on chain {chain_id}")
 
     # First, check if user exists
     user_check_query = "SELECT user_id FROM users WHERE address = %s AND chain_id = %s"
-    user_df = db.frameResponse(user_check_query, (lowercase_address, chain_id))
+    user_df = await db.frameResponse(user_check_query, (lowercase_address, chain_id))
     
     print(f"DEBUG: User check result: {len(user_df)} rows found")
     if not user_df.empty:
@@ -86,7 +85,7 @@ def get_user_position(address: str, offset: int, limit: int, chain_id: int = 480
         }
 
     # Use the enhanced PaginationUtils for custom queries
-    result = PaginationUtils.get_custom_paginated_results(
+    result = await PaginationUtils.get_custom_paginated_results(
         db=db,
         count_query=PaginationUtils.get_user_position_count_query,
         data_query=get_user_position_data_query,
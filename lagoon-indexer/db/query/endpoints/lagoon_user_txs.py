@@ -1,8 +1,6 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
 from .pagination_utils import PaginationUtils
-import os
-from db.query.lagoon_db_utils import LagoonDbUtils
 
 
 def get_data_query(table: str, owner_join_column: bool = False, offset: int = 0, limit: int = 20) -> str:
@@ -61,11 +59,18 @@ def get_data_query(table: str, owner_join_column: bool = False, offset: int = 0,
             LIMIT {limit}
         """
 
-def get_user_txs(address: str, offset: int, limit: int, chain_id: int) -> Dict[str, Any]:
-    db = getEnvDb(os.getenv('DB_NAME'))
+async def get_vaults_and_silos_from_factory(db, chain_id: int):
+    """Async `LagoonDbUtils.get_vaults_and_silos_from_factory`."""
+    df = await db.frameResponse("SELECT vault_address, silo_address FROM factory WHERE chain_id = %s", (chain_id,))
+    if df.empty:
+        raise ValueError(f"No vaults or silos found for chain {chain_id}")
+    return df
+
+async def get_user_txs(address: str, offset: int, limit: int, chain_id: int) -> Dict[str, Any]:
+    db = get_async_db()
     lowercase_address = address.lower()
     contract_addresses = []
-    vaults_and_silos = LagoonDbUtils.get_vaults_and_silos_from_factory(db, chain_id)
+    vaults_and_silos = await get_vaults_and_silos_from_factory(db, chain_id)
     for index, row in vaults_and_silos.iterrows():
         contract_addresses.append(row['vault_address'].lower())
         contract_addresses.append(row['silo_address'].lower())
@@ -103,7 +108,7 @@ def get_user_txs(address: str, offset: int, limit: int, chain_id: int) -> Dict[s
     }
 
     # Use the generic pagination function
-    result = PaginationUtils.get_paginated_results(
+    result = await PaginationUtils.get_paginated_results(
         db=db,
         tables_config=tables_config,
         count_query_params={},  # Not used in this case, params are in table config
@@ -1,15 +1,14 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any, Optional
-import os
 import json
 
-def get_vault_metadata(vault_id: str) -> Optional[Dict[str, Any]]:
+async def get_vault_metadata(vault_id: str) -> Optional[Dict[str, Any]]:
     """
     Get vault metadata for a specific vault_id.
     Returns the metadata JSONB field or None if vault not found.
     Metadata structure is kept nested: { "structure": { "mother": "...", "children": [...] } }
     """
-    db = getEnvDb(os.getenv('DB_NAME'))
+    db = get_async_db()
     
     # First, get vault info even if metadata doesn't exist
     vault_query = """
@@ -22,7 +21,7 @@ def get_vault_metadata(vault_id: str) -> Optional[Dict[str, Any]]:
         WHERE v.vault_id = %s
     """
     
-    vault_result = db.queryResponse(vault_query, (vault_id,))
+    vault_result = await db.queryResponse(vault_query, (vault_id,))
     
     if not vault_result or len(vault_result) == 0:
         return None
@@ -41,7 +40,7 @@ def get_vault_metadata(vault_id: str) -> Optional[Dict[str, Any]]:
         WHERE vm.vault_id = %s
     """
     
-    metadata_result = db.queryResponse(metadata_query, (vault_id,))
+    metadata_result = await db.queryResponse(metadata_query, (vault_id,))
     
     metadata = None
     created_at = None
@@ -1,7 +1,6 @@
-from db.db import getEnvDb
+from db.async_db import get_async_db
 from typing import Dict, Any
 from .pagination_utils import PaginationUtils
-import os
 
 RANGE_TO_INTERVAL = {
     "24h":  "24 hours",
@@ -52,16 +51,16 @@ def get_vault_snapshots_data_query(offset: int = 0, limit: int = 20, interval: s
         LIMIT {limit}
     """
 
-def get_vault_snapshots(offset: int, limit: int, chain_id: int, ranges: str) -> Dict[str, Any]:
+async def get_vault_snapshots(offset: int, limit: int, chain_id: int, ranges: str) -> Dict[str, Any]:
     """
     Get vault snapshots for a specific vault.
     """
-    db = getEnvDb(os.getenv('DB_NAME'))
+    db = get_async_db()
 
     interval = RANGE_TO_INTERVAL.get(ranges, None)
 
     # Use the enhanced PaginationUtils for custom queries
-    result = PaginationUtils.get_custom_paginated_results(
+    result = await PaginationUtils.get_custom_paginated_results(
         db=db,
         count_query=lambda: PaginationUtils.get_vault_snapshots_count_query(interval),
         data_query=lambda off, lim: get_vault_snapshots_data_query(off, lim, interval),
@@ -1,11 +1,11 @@
 from typing import Dict, Any, List, Callable, Tuple, Union
-from db.db import Database
+from db.async_db import AsyncDatabase
 from utils.converters import convert_numpy_types
 
 class PaginationUtils:
     @staticmethod
-    def get_paginated_results(
-        db: Database,
+    async def get_paginated_results(
+        db: AsyncDatabase,
         tables_config: Dict[str, Dict[str, Any]],
         count_query_params: Dict[str, Any],
         data_query_params: Dict[str, Any],
@@ -16,7 +16,7 @@ class PaginationUtils:
         Generic pagination function that can be used for any endpoint.
         
         Args:
-            db: Database connection
+            db: Pooled async database
             tables_config: Dictionary with table configurations
                 {
                     "table_name": {
@@ -44,7 +44,7 @@ class PaginationUtils:
                 count_query = count_query(table_name, config["owner_join_column"])
             
             count_params = config["count_query_params"]
-            count_df = db.frameResponse(count_query, count_params)
+            count_df = await db.frameResponse(count_query, count_params)
             
             if not count_df.empty:
                 total_count += int(count_df.iloc[0]['count'])
@@ -55,7 +55,7 @@ class PaginationUtils:
                 data_query = data_query(table_name, config["owner_join_column"], offset, limit)
             
             data_params = config["data_query_params"]
-            data_df = db.frameResponse(data_query, data_params)
+            data_df = await db.frameResponse(data_query, data_params)
             
             if not data_df.empty:
                 results = data_df.to_dict(orient="records")
@@ -76,8 +76,8 @@ class PaginationUtils:
         }
 
     @staticmethod
-    def get_custom_paginated_results(
-        db: Database,
+    async def get_custom_paginated_results(
+        db: AsyncDatabase,
         count_query: Union[str, Callable],
         data_query: Union[str, Callable],
         count_query_params: Tuple,
@@ -90,7 +90,7 @@ class PaginationUtils:
         Custom pagination function for complex queries that don't fit the standard table pattern.
         
         Args:
-            db: Database connection
+            db: Pooled async database
             count_query: SQL query string or callable that returns count query
             data_query: SQL query string or callable that returns data query
             count_query_params: Parameters for the count query
@@ -108,7 +108,7 @@ class PaginationUtils:
         else:
             count_query_str = count_query
             
-        count_df = db.frameResponse(count_query_str, count_query_params)
+        count_df = await db.frameResponse(count_query_str, count_query_params)
         
         total_count = 0
         if not count_df.empty:
@@ -128,7 +128,7 @@ class PaginationUtils:
         else:
             data_query_str = data_query
             
-        data_df = db.frameResponse(data_query_str, data_query_params)
+        data_df = await db.frameResponse(data_query_str, data_query_params)
         
         results = []
         if not data_df.empty:
@@ -1,38 +1,45 @@
 from db.db import Database
 import uuid
+import json
 from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
 from datetime import timedelta, datetime
-from typing import Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from decimal import Decimal
 from math import pow
 from db.query.lagoon_events import LagoonEvents
 
 class LagoonDbUtils:
     @staticmethod
-    def get_user_id(db: Database, address: str, chain_id: int, current_event_ts: datetime) -> str:
-        """
-        Retrieve the user_id for a given address and chain_id. If no user_id is found, creates the user and returns the user_id.
-        """
+    def get_or_create_user_ids(db: Database, chain_id: int, first_seen: Dict[str, datetime]) -> Dict[str, str]:
+        """
+        Retrieve the user_id of every address in `first_seen` (lowercase address -> timestamp of
+        its first event) on chain_id, creating the missing users in one insert. Concurrent
+        writers creating the same user agree on the row that wins the unique (address, chain_id).
+        Inside a unit of work the new rows stay locked until it commits, so concurrent ranges
+        sharing new users serialize on them; inserting in address order keeps that from deadlocking.
+        """
+        if not first_seen:
+            return {}
+        addresses = sorted(first_seen)
+        timestamps = [first_seen[address] for address in addresses]
         query = """
-        SELECT user_id FROM users WHERE address = %s AND chain_id = %s
+        INSERT INTO users (user_id, address, chain_id, created_at, updated_at)
+        SELECT gen.user_id::uuid, gen.address, %s, gen.ts, gen.ts
+        FROM unnest(%s::text[], %s::text[], %s::timestamp[]) AS gen(user_id, address, ts)
+        ORDER BY gen.address
+        ON CONFLICT (address, chain_id) DO NOTHING
         """
-        result = db.queryResponse(query, (address, chain_id))
-        
-        if result and 'user_id' in result[0]:
-            return result[0]['user_id']
-        else:
-            user_id = str(uuid.uuid4())
-            query = """
-            INSERT INTO users (user_id, address, chain_id, created_at, updated_at) 
-            VALUES (%s, %s, %s, %s, %s) 
-            RETURNING user_id
-            """
-            result = db.queryResponse(query, (user_id, address, chain_id, current_event_ts, current_event_ts))                
-            if result and 'user_id' in result[0]:
-                return result[0]['user_id']
-            else:
-                raise Exception(f"Failed to create user for address {address} on chain {chain_id}. Insert returned: {result}")
-            
+        db.execute(query, (chain_id, [str(uuid.uuid4()) for _ in addresses], addresses, timestamps))
+        query = """
+        SELECT address, user_id FROM users WHERE chain_id = %s AND address = ANY(%s)
+        """
+        result = db.queryResponse(query, (chain_id, addresses)) or []
+        user_ids = {row['address']: str(row['user_id']) for row in result}
+        missing = set(addresses) - user_ids.keys()
+        if missing:
+            raise Exception(f"Failed to create users for addresses {sorted(missing)} on chain {chain_id}")
+        return user_ids
+
     @staticmethod
     def get_last_processed_block(db: Database, vault_id: str, default_block: int) -> int:
         """
@@ -112,6 +119,60 @@ class LagoonDbUtils:
         formatted_ts = LagoonDbDateUtils.get_datetime_formatted_now()
         db.execute(query, (last_block, formatted_ts, formatted_ts, is_syncing, vault_id))
 
+    @staticmethod
+    def update_backfill_shards(db: Database, vault_id: str, shards: Optional[List[Dict]]):
+        """
+        Record the per-shard progress of a running backfill for a given vault_id.
+        None clears it once the backfill is done.
+        """
+        query = """
+        UPDATE indexer_state
+        SET
+            backfill_shards = %s,
+            updated_at = %s
+        WHERE vault_id = %s
+        """
+        formatted_ts = LagoonDbDateUtils.get_datetime_formatted_now()
+        db.execute(query, (json.dumps(shards) if shards is not None else None, formatted_ts, vault_id))
+
+    @staticmethod
+    def get_vault_id(db: Database, chain_id: int, vault_address: str) -> Optional[str]:
+        """
+        Retrieve the vault_id of an already registered vault, None if it is not registered.
+        """
+        query = """
+        SELECT v.vault_id FROM vaults v
+        JOIN tokens t ON t.token_id = v.vault_token_id
+        WHERE v.chain_id = %s AND LOWER(t.address) = LOWER(%s)
+        """
+        result = db.queryResponse(query, (chain_id, vault_address))
+        return str(result[0]['vault_id']) if result else None
+
+    @staticmethod
+    def reset_vault_index(db: Database, vault_id: str):
+        """
+        Drop everything indexed for a vault (events and their tables, checkpoints) and put
+        the event-driven vault columns back to their registration values, so it can be
+        indexed again from its genesis block. Fee rates are kept as registered.
+        """
+        now_ts = LagoonDbDateUtils.get_datetime_formatted_now()
+        queries = [
+            ("DELETE FROM events WHERE vault_id = %s", (vault_id,)),
+            ("DELETE FROM block_hashes WHERE vault_id = %s", (vault_id,)),
+            ("""
+            UPDATE vaults SET status = 'open', total_assets = 0, high_water_mark = 0, updated_at = %s
+            WHERE vault_id = %s
+            """, (now_ts, vault_id)),
+            ("""
+            UPDATE indexer_state
+            SET last_processed_block = NULL, backfill_shards = NULL, is_syncing = TRUE, sync_started_at = %s, updated_at = %s
+            WHERE vault_id = %s
+            """, (now_ts, now_ts, vault_id)),
+        ]
+        with db.unit_of_work(), db.connection.cursor() as cur:
+            for query, params in queries:
+                cur.execute(query, params)
+
     @staticmethod
     def update_bot_status(db: Database, vault_id: str, last_processed_block: int, last_processed_timestamp: str):
         """
@@ -145,28 +206,54 @@ class LagoonDbUtils:
         db.execute(query, (True, now_ts, vault_id))
 
     @staticmethod
-    def get_delta_hours_and_apy_12h_ago(db: Database, vault_id: str, current_share_price: Decimal, current_event_ts: datetime) -> Tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
+    def get_share_price_series(db: Database, vault_id: str) -> List[Dict]:
+        """
+        Retrieve every (snapshot_ts, share_price) of a vault, oldest first.
+        """
+        query = """
+        SELECT snapshot_ts, share_price FROM vault_snapshots
+        WHERE vault_id = %s
+        ORDER BY snapshot_ts
+        """
+        return db.queryResponse(query, (vault_id,)) or []
+
+    @staticmethod
+    def get_nearest_share_price(db: Database, vault_id: str, ts: datetime) -> Optional[Tuple[datetime, Decimal]]:
+        """
+        Retrieve the (snapshot_ts, share_price) snapshot nearest to ts, the earlier one on a tie.
+        Two index probes on (vault_id, snapshot_ts), one on each side of ts.
+        """
+        query = """
+        (SELECT snapshot_ts, share_price FROM vault_snapshots
+         WHERE vault_id = %s AND snapshot_ts <= %s ORDER BY snapshot_ts DESC LIMIT 1)
+        UNION ALL
+        (SELECT snapshot_ts, share_price FROM vault_snapshots
+         WHERE vault_id = %s AND snapshot_ts > %s ORDER BY snapshot_ts ASC LIMIT 1)
+        """
+        result = db.queryResponse(query, (vault_id, ts, vault_id, ts))
+        if not result:
+            return None
+        nearest = min(result, key=lambda row: (abs((row['snapshot_ts'] - ts).total_seconds()), row['snapshot_ts']))
+        return nearest['snapshot_ts'], Decimal(nearest['share_price'])
+
+    @staticmethod
+    def get_delta_hours_and_apy_12h_ago(db: Database, vault_id: str, current_share_price: Decimal, current_event_ts: datetime,
+                                        share_prices=None) -> Tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
         """
         Calculate APY based on the share price from approximately 12 hours ago.
+        The nearest snapshot comes from `share_prices` (a SharePriceSeries) when given, else from the DB.
 
         Returns:
             delta_hours (Optional[Decimal]): Hours between the snapshot and now.
             apy (Optional[Decimal]): Annualized yield based on share price change.
         """
-        query = """
-        SELECT events.event_timestamp, share_price FROM vault_snapshots 
-        JOIN events ON vault_snapshots.event_id = events.event_id 
-        WHERE vault_snapshots.vault_id = %s
-        ORDER BY ABS(EXTRACT(EPOCH FROM events.event_timestamp - %s)) ASC
-        LIMIT 1;
-        """
-        formatted_past_ts = LagoonDbDateUtils.format_timestamp(current_event_ts - timedelta(hours=12))
-        result = db.queryResponse(query, (vault_id, formatted_past_ts))
-        if result and 'share_price' in result[0] and 'event_timestamp' in result[0]:
-            share_price_12h_ago = Decimal(result[0]['share_price'])
-            snapshot_ts = result[0]['event_timestamp']
-            if isinstance(snapshot_ts, str):
-                snapshot_ts = LagoonDbDateUtils.get_datetime_from_str(snapshot_ts)
+        past_ts = current_event_ts - timedelta(hours=12)
+        if share_prices is not None:
+            nearest = share_prices.nearest(db, past_ts)
+        else:
+            nearest = LagoonDbUtils.get_nearest_share_price(db, vault_id, past_ts)
+        if nearest:
+            snapshot_ts, share_price_12h_ago = nearest
             delta_hours = (current_event_ts - snapshot_ts).total_seconds() / 3600
             if share_price_12h_ago > 0 and delta_hours > 0:
                 apy = (pow(float(current_share_price / share_price_12h_ago), float(8760 / delta_hours)) - 1) * 100
@@ -261,7 +348,8 @@ class LagoonDbUtils:
             return None, None
     
     @staticmethod
-    def handle_vault_snapshot(db: Database, vault_id: str, total_assets: Decimal, total_shares: Decimal, share_price: Decimal, current_event_ts: datetime) -> Tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
+    def handle_vault_snapshot(db: Database, vault_id: str, total_assets: Decimal, total_shares: Decimal, share_price: Decimal, current_event_ts: datetime,
+                              share_prices=None) -> Tuple[Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal], Optional[Decimal]]:
         """
         Handle the vault snapshot for a given vault_id.
         """
@@ -269,7 +357,8 @@ class LagoonDbUtils:
             db, 
             vault_id, 
             share_price, 
-            current_event_ts
+            current_event_ts,
+            share_prices
         )
 
         if prev_snapshot_ts is None:
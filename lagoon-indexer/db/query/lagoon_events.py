@@ -1,55 +1,59 @@
 from db.db import Database
 from datetime import datetime
-from pandas import DataFrame
+from typing import Dict, List
 from decimal import Decimal
-from .lagoon_ev_helpers import LagoonEventsHelpers
 
 class LagoonEvents:
     @staticmethod
-    def insert_lagoon_events(db: Database, event_df: DataFrame, table_name: str):
-        filtered_cols = [c for c in event_df.columns]
-        cleaned_df = event_df[filtered_cols]
-        db.insertDf(cleaned_df, table_name)
+    def insert_lagoon_events(db: Database, rows: List[Dict], table_name: str) -> bool:
+        # Rows written again (retried ranges, deterministic event ids) are skipped, not failed
+        return db.copyRows(table_name, rows, skip_conflicts=True)
 
     @staticmethod
-    def update_settled_deposit_requests(db: Database, vault_id: str, settled_timestamp: str):
-        query = """
-        UPDATE deposit_requests
-        SET status = 'settled', updated_at = %s, settled_at = %s
-        WHERE vault_id = %s
-          AND status = 'pending'
-          AND updated_at <= %s
-        RETURNING user_id, event_id;
+    def get_request_lifecycle_rows(db: Database, table_name: str, vault_id: str, request_ids: List[int], user_ids: List[str]) -> List[Dict]:
         """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (settled_timestamp, settled_timestamp, vault_id, settled_timestamp))
-            results = cur.fetchall()
-            updated_user_ids = [row[0] for row in results]
-            updated_event_ids = [row[1] for row in results]
-        conn.commit()
-        wallets, txs_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(db, updated_user_ids, updated_event_ids)
-        return wallets, txs_hashes
+        Requests of `table_name` (deposit_requests or redeem_requests) a range's transitions may
+        change: every open (pending / settled) one, plus any with one of `request_ids` or
+        `user_ids`. Each comes with the block and log index of the event that created it.
+        """
+        referral_column = "r.referral_address" if table_name == 'deposit_requests' else "NULL::varchar"
+        query = f"""
+        SELECT r.event_id, r.user_id, r.request_id, r.status::text AS status, r.updated_at, r.settled_at,
+               {referral_column} AS referral_address, e.block_number, e.log_index
+        FROM {table_name} r
+        JOIN events e ON e.event_id = r.event_id
+        WHERE r.vault_id = %s
+          AND (r.status IN ('pending', 'settled') OR r.request_id = ANY(%s::bigint[]) OR r.user_id = ANY(%s::uuid[]))
+        ORDER BY e.block_number, e.log_index
+        """
+        with db.connection.cursor() as cur:
+            cur.execute(query, (vault_id, request_ids, user_ids))
+            columns = [d[0] for d in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
 
     @staticmethod
-    def update_canceled_deposit_request(db: Database, vault_id: str, request_id: int, cancel_timestamp: str):
-        query = """
-        UPDATE deposit_requests
-        SET status = 'canceled', updated_at = %s
-        WHERE vault_id = %s
-          AND request_id = %s
-          AND updated_at <= %s
-        RETURNING user_id, event_id;
+    def update_request_lifecycle(db: Database, table_name: str, rows: List[Dict]):
         """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (cancel_timestamp, vault_id, request_id, cancel_timestamp))
-            results = cur.fetchall()
-            updated_user_ids = [row[0] for row in results]
-            updated_event_ids = [row[1] for row in results]
-        conn.commit()
-        wallets, txs_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(db, updated_user_ids, updated_event_ids)
-        return wallets, txs_hashes
+        Write the new status, updated_at, settled_at (and referral_address for deposits) of
+        `rows` in one UPDATE ... FROM (VALUES ...), in the order given.
+        """
+        if not rows:
+            return
+        status_type = 'deposit_request_status' if table_name == 'deposit_requests' else 'redeem_request_status'
+        referral_set = ", referral_address = v.referral_address" if table_name == 'deposit_requests' else ""
+        values = ",".join(["(%s::uuid, %s, %s::timestamp, %s::timestamp, %s::varchar)"] * len(rows))
+        query = f"""
+        UPDATE {table_name} r
+        SET status = v.status::{status_type}, updated_at = v.updated_at, settled_at = v.settled_at{referral_set}
+        FROM (VALUES {values}) AS v(event_id, status, updated_at, settled_at, referral_address)
+        WHERE r.event_id = v.event_id;
+        """
+        params = []
+        for row in rows:
+            params.extend((row['event_id'], row['status'], row['updated_at'], row['settled_at'], row['referral_address']))
+        with db.connection.cursor() as cur:
+            cur.execute(query, params)
+        db.commit()
 
     @staticmethod
     def update_vault_rates(db: Database, vault_id: str, management_rate: int, performance_rate: int, update_timestamp: str):
@@ -61,7 +65,7 @@ class LagoonEvents:
         conn = db.connection
         with conn.cursor() as cur:
             cur.execute(query, (management_rate, performance_rate, update_timestamp, vault_id))
-        conn.commit()
+        db.commit()
 
     @staticmethod
     def update_vault_status(db: Database, vault_id: str, status: str, update_timestamp: str):
@@ -73,7 +77,7 @@ class LagoonEvents:
         conn = db.connection
         with conn.cursor() as cur:
             cur.execute(query, (status, update_timestamp, vault_id))
-        conn.commit()
+        db.commit()
 
     @staticmethod
     def update_vault_continue_indexing(db: Database, vault_address: str, chain_id: int, continue_indexing: bool):
@@ -85,70 +89,8 @@ class LagoonEvents:
         conn = db.connection
         with conn.cursor() as cur:
             cur.execute(query, (continue_indexing, vault_address, chain_id))
-        conn.commit()
-
-    @staticmethod
-    def update_settled_redeem_requests(db: Database, vault_id: str, settled_timestamp: str):
-        query = """
-        UPDATE redeem_requests
-        SET status = 'settled', updated_at = %s, settled_at = %s
-        WHERE vault_id = %s
-          AND status = 'pending'
-          AND updated_at <= %s
-        RETURNING user_id, event_id;
-        """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (settled_timestamp, settled_timestamp, vault_id, settled_timestamp))
-            results = cur.fetchall()
-            updated_user_ids = [row[0] for row in results]
-            updated_event_ids = [row[1] for row in results]
-        conn.commit()
-        wallets, txs_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(db, updated_user_ids, updated_event_ids)
-        return wallets, txs_hashes
+        db.commit()
 
-    @staticmethod
-    def update_completed_deposit(db: Database, vault_id: str, user_id: str, timestamp: datetime):
-        query = """
-        UPDATE deposit_requests
-        SET status = 'completed', updated_at = %s
-        WHERE vault_id = %s
-          AND user_id = %s
-          AND status = 'settled'
-          AND settled_at <= %s
-        RETURNING user_id, event_id;
-        """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (timestamp, vault_id, user_id, timestamp))
-            results = cur.fetchall()
-            updated_user_ids = [row[0] for row in results]
-            updated_event_ids = [row[1] for row in results]
-        conn.commit()
-        wallets, txs_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(db, updated_user_ids, updated_event_ids)
-        return wallets, txs_hashes
-    
-    @staticmethod
-    def update_completed_redeem(db: Database, vault_id: str, user_id: str, timestamp: datetime):
-        query = """
-        UPDATE redeem_requests
-        SET status = 'completed', updated_at = %s
-        WHERE vault_id = %s
-          AND user_id = %s
-          AND status = 'settled'
-          AND settled_at <= %s
-        RETURNING user_id, event_id;
-        """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (timestamp, vault_id, user_id, timestamp))
-            results = cur.fetchall()
-            updated_user_ids = [row[0] for row in results]
-            updated_event_ids = [row[1] for row in results]
-        conn.commit()
-        wallets, txs_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(db, updated_user_ids, updated_event_ids)
-        return wallets, txs_hashes
-        
     @staticmethod
     def update_vault_total_assets(db: Database, vault_id: str, total_assets: Decimal, update_timestamp: datetime):
         query = """
@@ -159,7 +101,7 @@ class LagoonEvents:
         conn = db.connection
         with conn.cursor() as cur:
             cur.execute(query, (total_assets, update_timestamp, vault_id))
-        conn.commit()
+        db.commit()
 
     @staticmethod
     def update_vault_high_water_mark(db: Database, vault_id: str, high_water_mark: Decimal, update_timestamp: datetime):
@@ -171,20 +113,4 @@ class LagoonEvents:
         conn = db.connection
         with conn.cursor() as cur:
             cur.execute(query, (high_water_mark, update_timestamp, vault_id))
-        conn.commit()
-
-    @staticmethod
-    def update_deposit_request_referral(db: Database, vault_id: str, user_id: str, referral_user_id: str):
-        """
-        Update the referral address for a given deposit request.
-        No ts is required for update since it's an immediate action to the deposit request.
-        """
-        query = """
-        UPDATE deposit_requests
-        SET referral_address = %s
-        WHERE vault_id = %s
-          AND user_id = %s;
-        """
-        conn = db.connection
-        with conn.cursor() as cur:
-            cur.execute(query, (referral_user_id, vault_id, user_id))
\ No newline at end of file
+        db.commit()
@@ -0,0 +1,118 @@
+from db.db import Database
+from datetime import datetime
+from typing import Dict, List, Optional
+from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
+
+# vaults columns set by events, snapshotted with each checkpoint so a rollback can restore them
+VAULT_STATE_COLUMNS = {
+    'total_assets': 'numeric',
+    'status': 'vault_status',
+    'management_rate': 'integer',
+    'performance_rate': 'integer',
+    'high_water_mark': 'numeric',
+    'updated_at': 'timestamp',
+}
+
+class LagoonReorg:
+    @staticmethod
+    def record_block_hash(db: Database, vault_id: str, block_number: int, block_hash: str, block_timestamp: datetime, keep_depth: int):
+        """
+        Record the hash of a checkpoint block together with the vault state after it,
+        and drop checkpoints older than `keep_depth` blocks (keeping the newest of those
+        as the rollback anchor).
+        """
+        state = ", ".join(f"'{column}', {column}" for column in VAULT_STATE_COLUMNS)
+        query = f"""
+        INSERT INTO block_hashes (vault_id, block_number, block_hash, block_timestamp, vault_state, created_at)
+        SELECT %s, %s, %s, %s, jsonb_build_object({state}), %s
+        FROM vaults WHERE vault_id = %s
+        ON CONFLICT (vault_id, block_number) DO UPDATE SET
+            block_hash = EXCLUDED.block_hash,
+            block_timestamp = EXCLUDED.block_timestamp,
+            vault_state = EXCLUDED.vault_state,
+            created_at = EXCLUDED.created_at
+        """
+        now_ts = LagoonDbDateUtils.get_datetime_formatted_now()
+        db.execute(query, (vault_id, block_number, block_hash, block_timestamp, now_ts, vault_id))
+        prune_query = """
+        DELETE FROM block_hashes
+        WHERE vault_id = %s
+          AND block_number < (
+            SELECT MAX(block_number) FROM block_hashes WHERE vault_id = %s AND block_number <= %s
+          )
+        """
+        db.execute(prune_query, (vault_id, vault_id, block_number - keep_depth))
+
+    @staticmethod
+    def get_block_hash(db: Database, vault_id: str, block_number: int) -> Optional[str]:
+        """
+        Retrieve the recorded hash of a checkpoint block, None if it was not recorded.
+        """
+        query = """
+        SELECT block_hash FROM block_hashes WHERE vault_id = %s AND block_number = %s
+        """
+        result = db.queryResponse(query, (vault_id, block_number))
+        return result[0]['block_hash'] if result else None
+
+    @staticmethod
+    def get_block_hashes(db: Database, vault_id: str) -> List[Dict]:
+        """
+        Retrieve the recorded checkpoints of a vault, newest first.
+        """
+        query = """
+        SELECT block_number, block_hash, block_timestamp
+        FROM block_hashes
+        WHERE vault_id = %s
+        ORDER BY block_number DESC
+        """
+        return db.queryResponse(query, (vault_id,)) or []
+
+    @staticmethod
+    def rollback_to_block(db: Database, vault_id: str, block_number: int, block_timestamp: datetime):
+        """
+        Undo everything indexed for a vault after checkpoint `block_number` in one transaction:
+        events past it (and their rows in the event tables, by cascade), request status
+        transitions made after its timestamp, vault columns (restored from the checkpoint)
+        and later checkpoints. The indexer resumes from `block_number`.
+        """
+        restore = ", ".join(
+            f"{column} = (s.vault_state->>'{column}')::{cast}" for column, cast in VAULT_STATE_COLUMNS.items()
+        )
+        now_ts = LagoonDbDateUtils.get_datetime_formatted_now()
+        queries = [
+            ("DELETE FROM events WHERE vault_id = %s AND block_number > %s", (vault_id, block_number)),
+            # completed -> settled, then settled -> pending, each only if it happened after the checkpoint
+            ("""
+            UPDATE deposit_requests SET status = 'settled', updated_at = settled_at
+            WHERE vault_id = %s AND status = 'completed' AND updated_at > %s
+            """, (vault_id, block_timestamp)),
+            ("""
+            UPDATE deposit_requests d SET status = 'pending', settled_at = NULL, updated_at = e.event_timestamp
+            FROM events e
+            WHERE e.event_id = d.event_id AND d.vault_id = %s
+              AND ((d.status = 'settled' AND d.settled_at > %s) OR (d.status = 'canceled' AND d.updated_at > %s))
+            """, (vault_id, block_timestamp, block_timestamp)),
+            ("""
+            UPDATE redeem_requests SET status = 'settled', updated_at = settled_at
+            WHERE vault_id = %s AND status = 'completed' AND updated_at > %s
+            """, (vault_id, block_timestamp)),
+            ("""
+            UPDATE redeem_requests r SET status = 'pending', settled_at = NULL, updated_at = e.event_timestamp
+            FROM events e
+            WHERE e.event_id = r.event_id AND r.vault_id = %s AND r.status = 'settled' AND r.settled_at > %s
+            """, (vault_id, block_timestamp)),
+            (f"""
+            UPDATE vaults v SET {restore}
+            FROM block_hashes s
+            WHERE s.vault_id = v.vault_id AND v.vault_id = %s AND s.block_number = %s
+            """, (vault_id, block_number)),
+            ("DELETE FROM block_hashes WHERE vault_id = %s AND block_number > %s", (vault_id, block_number)),
+            ("""
+            UPDATE indexer_state
+            SET last_processed_block = %s, last_processed_timestamp = %s, updated_at = %s
+            WHERE vault_id = %s
+            """, (block_number, now_ts, now_ts, vault_id)),
+        ]
+        with db.unit_of_work(), db.connection.cursor() as cur:
+            for query, params in queries:
+                cur.execute(query, params)
@@ -3,11 +3,10 @@ import os
 import sys
 import uuid
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from constants.abi.lagoon import LAGOON_ABI
-from constants.abi.erc20 import ERC20_ABI
-from utils.rpc import get_w3
+from core.blockchain import getEnvNode
 from utils.chain_metadata import get_chain_metadata
 from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
+from db.query.lagoon_db_utils import LagoonDbUtils
 
 def insert_chain(db, chain_id: int):
     metadata = get_chain_metadata(chain_id)
@@ -43,13 +42,20 @@ def insert_chain(db, chain_id: int):
         conn.commit()
     print(f"{name} chain inserted (or already exists).")
 
-def insert_token(db, chain_id, token_address):
-    w3 = get_w3(chain_id)
-    token_contract = w3.eth.contract(address=token_address, abi=ERC20_ABI)
-    
-    symbol = token_contract.functions.symbol().call()
-    name = token_contract.functions.name().call()
-    decimals = token_contract.functions.decimals().call()
+def fetch_token_metadata(node, token_address):
+    """symbol, name and decimals of an ERC20, as multicall entries to run with other reads."""
+    token_contract = node.get_erc20_contract(token_address)
+    return [(token_contract, "symbol", []), (token_contract, "name", []), (token_contract, "decimals", [])]
+
+def get_token_id(db, chain_id, token_address):
+    existing = db.queryResponse(
+        "SELECT token_id FROM tokens WHERE chain_id = %s AND address = %s", (chain_id, token_address)
+    )
+    return existing[0]['token_id'] if existing else None
+
+def insert_token(db, chain_id, token_address, metadata):
+    """Insert a token from its (symbol, name, decimals) metadata and return its token_id."""
+    symbol, name, decimals = metadata
 
     token_id = str(uuid.uuid4())
     created_at = LagoonDbDateUtils.get_datetime_formatted_now()
@@ -90,27 +96,45 @@ def insert_token(db, chain_id, token_address):
     return final_token_id
 
 def insert_vault(db, chain_id, lagoon_address):
+    existing_vault_id = LagoonDbUtils.get_vault_id(db, chain_id, lagoon_address)
+    if existing_vault_id:
+        print(f"Vault {lagoon_address} already registered.")
+        return existing_vault_id
+
     vault_id = str(uuid.uuid4())
-    vault_token_id = insert_token(db, chain_id, lagoon_address)
-    
-    w3 = get_w3(chain_id)
-    vault_contract = w3.eth.contract(address=lagoon_address, abi=LAGOON_ABI)
-    
-    deposit_token_address = vault_contract.functions.asset().call()
-    deposit_token_id = insert_token(db, chain_id, deposit_token_address)
+    node = getEnvNode(chain_id)
+    vault_contract = node.get_lagoon_contract(lagoon_address)
+
+    # Every vault read in one multicall, then the deposit token's metadata in a second one
+    vault_token_calls = fetch_token_metadata(node, lagoon_address)
+    vault_calls = [
+        (vault_contract, "asset", []),
+        (vault_contract, "feeRates", []),
+        (vault_contract, "getRolesStorage", []),
+        (vault_contract, "owner", []),
+    ]
+    results = node.multicall(vault_token_calls + vault_calls)
+    vault_token_metadata = results[:len(vault_token_calls)]
+    deposit_token_address, fee_rates, roles_storage, administrator_address = results[len(vault_token_calls):]
+    if None in vault_token_metadata or None in (deposit_token_address, roles_storage, administrator_address):
+        raise ValueError(f"Could not read vault {lagoon_address} on chain {chain_id}: {results}")
+    name = vault_token_metadata[1]
+
+    vault_token_id = get_token_id(db, chain_id, lagoon_address) or insert_token(db, chain_id, lagoon_address, vault_token_metadata)
+    deposit_token_id = get_token_id(db, chain_id, deposit_token_address)
+    if deposit_token_id is None:
+        deposit_token_metadata = node.multicall(fetch_token_metadata(node, deposit_token_address))
+        if None in deposit_token_metadata:
+            raise ValueError(f"Could not read token {deposit_token_address} on chain {chain_id}")
+        deposit_token_id = insert_token(db, chain_id, deposit_token_address, deposit_token_metadata)
 
-    name = vault_contract.functions.name().call()
-    
-    # Fetch fee rates from the contract
     # feeRates() returns a tuple: (managementRate: uint16, performanceRate: uint16)
-    try:
-        fee_rates = vault_contract.functions.feeRates().call()
-        # fee_rates is a tuple: (managementRate, performanceRate)
-        management_rate = int(fee_rates[0])  # managementRate is uint16
-        performance_rate = int(fee_rates[1])  # performanceRate is uint16
+    if fee_rates is not None:
+        management_rate = int(fee_rates[0])
+        performance_rate = int(fee_rates[1])
         print(f"Fetched fee rates from contract: management_rate={management_rate}, performance_rate={performance_rate}")
-    except Exception as e:
-        print(f"Warning: Could not fetch fee rates from contract {lagoon_address}: {e}. Defaulting to 0.")
+    else:
+        print(f"Warning: Could not fetch fee rates from contract {lagoon_address}. Defaulting to 0.")
         management_rate = 0
         performance_rate = 0
     
@@ -122,14 +146,12 @@ def insert_vault(db, chain_id, lagoon_address):
     min_deposit = 0 #TODO
     max_deposit = None #TODO
     
-    roles_storage = vault_contract.functions.getRolesStorage().call()
     whitelist_manager_address = roles_storage[0]
     fee_receiver_address = roles_storage[1]
     safe_address = roles_storage[2]
     fee_registry_address = roles_storage[3]
     price_oracle_address = roles_storage[4]
 
-    administrator_address = vault_contract.functions.owner().call()
     created_at = LagoonDbDateUtils.get_datetime_formatted_now()
     query = """
     INSERT INTO vaults (
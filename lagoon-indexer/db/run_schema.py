@@ -45,6 +45,7 @@ def drop_all_schema_objects():
         users,
         chains,
         indexer_state,
+        block_hashes,
         bot_status,
         vault_metadata,
         factory,
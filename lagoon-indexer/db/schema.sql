@@ -122,6 +122,7 @@ CREATE TABLE IF NOT EXISTS events (
 CREATE TABLE IF NOT EXISTS vault_snapshots (
   event_id UUID PRIMARY KEY REFERENCES events(event_id) ON DELETE CASCADE,
   vault_id UUID NOT NULL REFERENCES vaults(vault_id) ON DELETE CASCADE,
+  snapshot_ts TIMESTAMP NOT NULL, -- Timestamp of the snapshot event, copied from events for the share price series.
   total_assets NUMERIC(78,0) NOT NULL,
   total_shares NUMERIC(78,0),
   share_price NUMERIC(78,18),
@@ -219,9 +220,21 @@ CREATE TABLE IF NOT EXISTS indexer_state (
   indexer_version VARCHAR(20),
   is_syncing BOOLEAN,
   sync_started_at TIMESTAMP,
+  backfill_shards JSONB, -- Per-shard progress while a sharded backfill runs, NULL otherwise
   updated_at TIMESTAMP
 );
 
+-- Block Hashes -- indexer checkpoints within the reorg window, used to find and undo forks
+CREATE TABLE IF NOT EXISTS block_hashes (
+  vault_id UUID NOT NULL REFERENCES vaults(vault_id) ON DELETE CASCADE,
+  block_number BIGINT NOT NULL,
+  block_hash VARCHAR(66) NOT NULL,
+  block_timestamp TIMESTAMP NOT NULL,
+  vault_state JSONB, -- vaults columns set by events, as of this block
+  created_at TIMESTAMP,
+  PRIMARY KEY (vault_id, block_number)
+);
+
 -- Bot Status
 CREATE TABLE IF NOT EXISTS bot_status (
   vault_id UUID PRIMARY KEY REFERENCES vaults(vault_id) ON DELETE CASCADE,
@@ -256,7 +269,7 @@ CREATE INDEX IF NOT EXISTS idx_bot_status_in_sync ON bot_status(in_sync);
 CREATE INDEX IF NOT EXISTS idx_bot_status_last_processed_time ON bot_status(last_processed_timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_events_txhash ON events(transaction_hash);
 CREATE INDEX IF NOT EXISTS idx_user_positions_vault_user ON user_positions(vault_id, user_id);
-CREATE INDEX IF NOT EXISTS idx_vault_snapshots_vault_id ON vault_snapshots(vault_id);
+CREATE INDEX IF NOT EXISTS idx_vault_snapshots_vault_id_snapshot_ts ON vault_snapshots(vault_id, snapshot_ts);
 CREATE INDEX IF NOT EXISTS idx_vaults_id ON vaults(vault_id);
 CREATE INDEX IF NOT EXISTS idx_settlements_type_epoch ON settlements(settlement_type, epoch_id);
 CREATE INDEX IF NOT EXISTS idx_vaults_vault_token_id ON vaults(vault_token_id);
@@ -11,23 +11,20 @@ from lagoon_indexer import LagoonIndexer
 from db.register_indexer import register_indexer
 from db.query.lagoon_db_utils import LagoonDbUtils
 from db.db import getEnvDb
+from core.block_cache import BlockTimestampCache, get_block_timestamp_cache
+from core.user_id_resolver import get_user_id_resolver
+from core.async_rpc import close_sessions
+from core.head_tracker import ChainHeadTracker, make_head_tracker
+from utils.rpc import get_endpoint_pool, get_ws_url
+from utils.rpc_cache import get_rpc_cache
+from utils.rate_limiter import set_rpc_service
+from utils.range_controller import get_range_controller
+from core.hedging import hedging_enabled, get_hedging_policy
+from lagoon_event_decoder import TRACKED_EVENTS, get_lagoon_event_decoder
+from lagoon_log_coordinator import ChainLogCoordinator, make_chain_log_coordinator
+from lagoon_log_stream import streaming_enabled, make_chain_log_stream
 
-events_to_track = [
-    "DepositRequest", 
-    "RedeemRequest", 
-    "SettleDeposit", 
-    "SettleRedeem", 
-    "Deposit", 
-    "Withdraw", 
-    "DepositRequestCanceled", 
-    "Transfer", 
-    "NewTotalAssetsUpdated",
-    "RatesUpdated",
-    "Referral",
-    "StateUpdated",
-    "Paused",
-    "Unpaused"
-]
+events_to_track = list(TRACKED_EVENTS)
 
 async def run_indexer(
     chain_id: int,
@@ -37,9 +34,14 @@ async def run_indexer(
     sleep_time: int,
     range: int,
     real_time: bool,
-    run_time: int
+    run_time: int,
+    block_ts_cache: BlockTimestampCache,
+    log_coordinator: ChainLogCoordinator,
+    backfill_shards: int,
+    head_tracker: ChainHeadTracker
 ) -> None:
-    vault_id = register_indexer(chain_id, lagoon_address)
+    # Sync web3 and DB calls (token metadata multicalls): keep them off the chain's event loop
+    vault_id = await asyncio.to_thread(register_indexer, chain_id, lagoon_address)
 
     indexer = LagoonIndexer(
         chain_id=chain_id,
@@ -51,6 +53,10 @@ async def run_indexer(
         event_names=events_to_track,
         real_time=real_time,
         vault_id=vault_id,
+        block_ts_cache=block_ts_cache,
+        log_coordinator=log_coordinator,
+        backfill_shards=backfill_shards,
+        head_tracker=head_tracker,
     )
 
     start_time = time.time()
@@ -60,9 +66,9 @@ async def run_indexer(
     while True:
         try:
             if await indexer.fetcher_loop() == 1:
-                # If up to date, sleep briefly before checking again
+                # If up to date, wait for the chain head to move before checking again
                 if real_time and sleep_time > 0:
-                    await asyncio.sleep(sleep_time)
+                    await indexer.wait_for_new_head()
                 continue
         except Exception as e:
             print(f"[{chain_id}] Error in fetcher loop: {e}")
@@ -70,6 +76,38 @@ async def run_indexer(
             print(f"[{chain_id}] Sleeping {sleep_time}s before retrying...")
             await asyncio.sleep(sleep_time)
 
+async def replay_chain(chain_id: int, range: int) -> None:
+    """Rebuild the indexed data of every active vault of the chain from the local log archive."""
+    db = getEnvDb(os.getenv('DB_NAME'))
+    deployments = LagoonDbUtils.get_active_deployments_from_chain_id(db, chain_id)
+    indexers = []
+    for deployment in deployments:
+        vault = deployment["vault_address"]
+        vault_id = LagoonDbUtils.get_vault_id(db, chain_id, vault)
+        if vault_id is None:
+            print(f"[{chain_id}] Vault {vault} is not registered, run the indexer once before replaying it")
+            continue
+        indexers.append(LagoonIndexer(
+            chain_id=chain_id,
+            lagoon_address=vault,
+            silo_address=deployment["silo_address"],
+            genesis_block_number=deployment["genesis_block_number"],
+            sleep_time=0,
+            range=range,
+            event_names=events_to_track,
+            real_time=False,
+            vault_id=vault_id,
+            offline=True,
+        ))
+    db.closeConnection()
+
+    start_time = time.time()
+    results = await asyncio.gather(*(asyncio.to_thread(indexer.replay_archive) for indexer in indexers), return_exceptions=True)
+    for indexer, result in zip(indexers, results):
+        if isinstance(result, Exception):
+            print(f"[{chain_id}] Replay of {indexer.lagoon} failed: {result}")
+    print(f"[{chain_id}] Replayed {len(indexers)} vaults in {time.time() - start_time:.1f}s")
+
 def make_completion_handler(chain_id: int, vault: str):
     def handler(t):
         if t.cancelled():
@@ -88,10 +126,24 @@ async def launch_forever(
     sleep_time: int,
     range: int,
     real_time: bool,
-    run_time: int
+    run_time: int,
+    backfill_shards: int
 ) -> None:
     print(f"[{chain_id}] Launching indexer loop...")
     running_tasks = {}  # Track running tasks by vault address
+    block_ts_cache = get_block_timestamp_cache(chain_id)  # Shared by all vault tasks of this chain
+    log_coordinator = make_chain_log_coordinator(
+        chain_id, get_lagoon_event_decoder(tuple(events_to_track)).topics, get_range_controller(chain_id, range)
+    )
+    head_tracker = make_head_tracker(chain_id)  # One head poll/subscription for all vault tasks of this chain
+    head_task = asyncio.create_task(head_tracker.run())
+    head_task.add_done_callback(make_completion_handler(chain_id, "head tracker"))
+    log_stream = None
+    if streaming_enabled() and get_ws_url(chain_id):
+        # Real-time logs over eth_subscribe, served to the vault tasks through the coordinator
+        log_stream = make_chain_log_stream(chain_id, log_coordinator.topics, log_coordinator, head_tracker)
+        stream_task = asyncio.create_task(log_stream.run())
+        stream_task.add_done_callback(make_completion_handler(chain_id, "log stream"))
     
     while True:
         try:
@@ -100,6 +152,7 @@ async def launch_forever(
             
             # Get current active vault addresses
             active_vaults = {deployment["vault_address"] for deployment in deployments}
+            log_coordinator.set_active(active_vaults)
             
             # Stop tasks for vaults that are no longer active
             vaults_to_stop = set(running_tasks.keys()) - active_vaults
@@ -135,7 +188,11 @@ async def launch_forever(
                         sleep_time,
                         range,
                         real_time,
-                        run_time
+                        run_time,
+                        block_ts_cache,
+                        log_coordinator,
+                        backfill_shards,
+                        head_tracker
                     )
                 )
                 
@@ -147,11 +204,23 @@ async def launch_forever(
             print(f"[{chain_id}] Indexer launcher crashed: {e}")
             traceback.print_exc()
 
+        print(f"[{chain_id}] Block timestamp cache: {block_ts_cache.stats()}")
+        print(f"[{chain_id}] User id cache: {get_user_id_resolver(chain_id).stats()}")
+        print(f"[{chain_id}] Log coordinator: {log_coordinator.stats()}")
+        print(f"[{chain_id}] Head tracker: {head_tracker.stats()}")
+        if log_stream:
+            print(f"[{chain_id}] Log stream: {log_stream.stats()}")
+        print(f"[{chain_id}] RPC endpoints: {get_endpoint_pool(chain_id).stats()}")
+        if hedging_enabled():
+            print(f"[{chain_id}] RPC hedging: {get_hedging_policy(chain_id).stats()}")
+        if get_rpc_cache():
+            print(f"[{chain_id}] RPC cache: {get_rpc_cache().stats()}")
         print(f"[{chain_id}] Restarting in 5 seconds...\n")
         await asyncio.sleep(5)  # Wait before checking for new deployments again
 
 async def main() -> None:
     load_dotenv()
+    set_rpc_service("indexer")
 
     chain_ids = os.getenv("SUPPORTED_CHAINS", "")
     if not chain_ids:
@@ -164,9 +233,15 @@ async def main() -> None:
     parser.add_argument('--range', type=int, required=True, help='Block range to process per iteration')
     parser.add_argument('--real_time', type=int, choices=[0, 1], required=True, help='1 = real-time, 0 = one-shot')
     parser.add_argument('--run_time', type=int, required=True, help='Indexer run time in seconds before recycle')
+    parser.add_argument('--backfill_shards', type=int, default=1, help='Concurrent shards for historical backfill (1 = sequential)')
+    parser.add_argument('--replay', type=int, choices=[0, 1], default=0, help='1 = rebuild all indexed data from LOG_ARCHIVE_DIR, no RPC, then exit')
 
     args = parser.parse_args()
 
+    if args.replay:
+        await asyncio.gather(*(replay_chain(chain_id, args.range) for chain_id in chain_ids))
+        return
+
     tasks = [
         asyncio.create_task(
             launch_forever(
@@ -175,12 +250,16 @@ async def main() -> None:
                 range=args.range,
                 real_time=bool(args.real_time),
                 run_time=args.run_time,
+                backfill_shards=args.backfill_shards,
             )
         )
         for chain_id in chain_ids
     ]
 
-    await asyncio.gather(*tasks)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await close_sessions()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,176 @@
+import os
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_abi.codec import ABICodec
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3._utils.abi import build_strict_registry
+from web3._utils.events import get_event_data
+from constants.abi.lagoon import LAGOON_ABI
+
+# Lagoon events the indexer tracks
+TRACKED_EVENTS = (
+    "DepositRequest",
+    "RedeemRequest",
+    "SettleDeposit",
+    "SettleRedeem",
+    "Deposit",
+    "Withdraw",
+    "DepositRequestCanceled",
+    "Transfer",
+    "NewTotalAssetsUpdated",
+    "RatesUpdated",
+    "Referral",
+    "StateUpdated",
+    "Paused",
+    "Unpaused",
+)
+
+
+class DecodedLagoonLog:
+    """
+    Slotted decoded log. Supports the item access `EventFormatter` uses
+    (event['args'], event['blockNumber'], ...) without building a dict per log.
+    """
+    __slots__ = (
+        'event_name', 'args', 'address', 'blockNumber', 'blockHash',
+        'logIndex', 'transactionIndex', 'transactionHash', 'blockTimestamp',
+    )
+
+    def __init__(self, event_name, args, address, blockNumber, blockHash, logIndex, transactionIndex, transactionHash):
+        self.event_name = event_name
+        self.args = args
+        self.address = address
+        self.blockNumber = blockNumber
+        self.blockHash = blockHash
+        self.logIndex = logIndex
+        self.transactionIndex = transactionIndex
+        self.transactionHash = transactionHash
+        self.blockTimestamp = None
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+
+def _abi_type(abi_input: Dict) -> str:
+    if abi_input['type'] == 'tuple':
+        return f"({','.join(_abi_type(c) for c in abi_input['components'])})"
+    return abi_input['type']
+
+def _topic_decoder(codec: ABICodec, abi_type: str) -> Callable[[bytes], Any]:
+    """Word decoder for one indexed input. Addresses and uints skip eth_abi entirely."""
+    if abi_type == 'address':
+        return lambda word: '0x' + word[12:].hex()
+    if abi_type.startswith('uint'):
+        return lambda word: int.from_bytes(word, 'big')
+    return lambda word: codec.decode([abi_type], word)[0]
+
+
+class _FastEventSpec:
+    """Precomputed type signatures of one event for `LagoonEventDecoder.decode_raw`."""
+    def __init__(self, codec: ABICodec, event_name: str, event_abi: Dict):
+        self.event_name = event_name
+        indexed = [i for i in event_abi['inputs'] if i['indexed']]
+        not_indexed = [i for i in event_abi['inputs'] if not i['indexed']]
+        self.topic_fields = [(i['name'], _topic_decoder(codec, _abi_type(i))) for i in indexed]
+        self.data_names = [i['name'] for i in not_indexed]
+        self.data_types = [_abi_type(i) for i in not_indexed]
+        # Struct inputs come back as tuples; web3 names their members, so do we
+        self.struct_names = {
+            pos: [c['name'] for c in i['components']]
+            for pos, i in enumerate(not_indexed) if i['type'] == 'tuple'
+        }
+
+
+class LagoonEventDecoder:
+    """
+    topic0 -> event decoder table for the tracked Lagoon events.
+    Built once per process so decoding a log is a single dict lookup
+    instead of a scan over every tracked event type.
+    """
+    def __init__(self, event_names: Tuple[str, ...]):
+        self.codec = ABICodec(build_strict_registry())
+        abis = {entry['name']: entry for entry in LAGOON_ABI if entry.get('type') == 'event'}
+        self.decoders: Dict[bytes, Tuple[str, Dict]] = {}
+        for event_name in event_names:
+            event_abi = abis[event_name]
+            self.decoders[bytes(event_abi_to_log_topic(event_abi))] = (event_name, event_abi)
+        self.topics: List[bytes] = list(self.decoders.keys())
+        self.fast_specs: Dict[str, _FastEventSpec] = {
+            '0x' + topic.hex(): _FastEventSpec(self.codec, event_name, event_abi)
+            for topic, (event_name, event_abi) in self.decoders.items()
+        }
+
+    def decode(self, log: Dict) -> Optional[Dict]:
+        """
+        Decode a formatted log into a plain dict with an extra `event_name` key.
+        Returns None for logs whose topic0 is not tracked.
+        """
+        if not log['topics']:
+            return None
+        decoder = self.decoders.get(bytes(log['topics'][0]))
+        if decoder is None:
+            return None
+        event_name, event_abi = decoder
+        event = dict(get_event_data(self.codec, event_abi, log))
+        event['event_name'] = event_name
+        return event
+
+    def decode_raw(self, log: Dict) -> Optional[DecodedLagoonLog]:
+        """
+        Fast path for raw `eth_getLogs` entries (hex strings, as returned by the
+        node). Bypasses web3's process_log and log formatters: indexed words are
+        sliced directly and the data section is decoded with one eth_abi call.
+        Addresses are returned lowercase, since every consumer lowercases them.
+        """
+        topics = log['topics']
+        if not topics:
+            return None
+        spec = self.fast_specs.get(topics[0].lower())
+        if spec is None:
+            return None
+        if len(topics) - 1 != len(spec.topic_fields):
+            raise ValueError(f"{spec.event_name}: expected {len(spec.topic_fields)} indexed topics, got {len(topics) - 1}")
+
+        args = {
+            name: decode(bytes.fromhex(topic[2:]))
+            for (name, decode), topic in zip(spec.topic_fields, topics[1:])
+        }
+        if spec.data_types:
+            values = self.codec.decode(spec.data_types, bytes.fromhex(log['data'][2:]))
+            for pos, (name, value) in enumerate(zip(spec.data_names, values)):
+                struct_names = spec.struct_names.get(pos)
+                args[name] = dict(zip(struct_names, value)) if struct_names else value
+
+        return DecodedLagoonLog(
+            spec.event_name,
+            args,
+            log['address'].lower(),
+            int(log['blockNumber'], 16),
+            HexBytes(log['blockHash']),
+            int(log['logIndex'], 16),
+            int(log['transactionIndex'], 16),
+            HexBytes(log['transactionHash']),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_lagoon_event_decoder(event_names: Tuple[str, ...]) -> LagoonEventDecoder:
+    """Return the process-wide decoder for `event_names`."""
+    return LagoonEventDecoder(event_names)
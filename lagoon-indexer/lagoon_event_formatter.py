@@ -34,14 +34,13 @@ class EventFormatter:
         }
 
     @staticmethod
-    def format_DepositRequest_data(db: Database, event: Dict, vault_id: str, chain_id: int) -> Tuple[Dict, Dict]:
+    def format_DepositRequest_data(event: Dict, vault_id: str, user_ids: Dict[str, str]) -> Tuple[Dict, Dict]:
         event_data = EventFormatter._format_Event_data(event, vault_id, 'deposit_request')
-        current_event_ts = LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
         deposit_data = {
             'request_id': int(event['args']['requestId']),
             'event_id': event_data['event_id'],
             'vault_id': event_data['vault_id'],
-            'user_id': LagoonDbUtils.get_user_id(db, event['args']['owner'].lower(), chain_id, current_event_ts),
+            'user_id': user_ids[event['args']['owner'].lower()],
             'sender_address': event['args']['sender'].lower(),
             'controller_address': event['args']['controller'].lower(),
             'referral_address': event['args'].get('referral', '').lower() if event['args'].get('referral') else None,
@@ -53,14 +52,13 @@ class EventFormatter:
         return event_data, deposit_data
 
     @staticmethod
-    def format_RedeemRequest_data(db: Database, event: Dict, vault_id: str, chain_id: int) -> Tuple[Dict, Dict]:
+    def format_RedeemRequest_data(event: Dict, vault_id: str, user_ids: Dict[str, str]) -> Tuple[Dict, Dict]:
         event_data = EventFormatter._format_Event_data(event, vault_id, 'redeem_request')
-        current_event_ts = LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
         redeem_data = {
             'request_id': int(event['args']['requestId']),
             'event_id': event_data['event_id'],
             'vault_id': event_data['vault_id'],
-            'user_id': LagoonDbUtils.get_user_id(db, event['args']['owner'].lower(), chain_id, current_event_ts),
+            'user_id': user_ids[event['args']['owner'].lower()],
             'sender_address': event['args']['sender'].lower(),
             'controller_address': event['args']['controller'].lower(),
             'shares': Decimal(event['args']['shares']),
@@ -71,7 +69,7 @@ class EventFormatter:
         return event_data, redeem_data
     
     @staticmethod
-    def format_Settlement_data(db: Database, event: Dict, vault_id: str, settlement_type: str) -> Tuple[Dict, Dict]:
+    def format_Settlement_data(db: Database, event: Dict, vault_id: str, settlement_type: str, share_prices=None) -> Tuple[Dict, Dict]:
         event_type = 'settle_' + settlement_type
         event_data = EventFormatter._format_Event_data(event, vault_id, event_type)
         settle_data = {
@@ -90,11 +88,13 @@ class EventFormatter:
             total_assets, 
             total_shares, 
             share_price, 
-            current_event_ts
+            current_event_ts,
+            share_prices
         )
         snapshot_data = {
             'event_id': event_data['event_id'],
             'vault_id': event_data['vault_id'],
+            'snapshot_ts': event_data['event_timestamp'],
             'total_assets': total_assets,
             'total_shares': total_shares,
             'share_price': share_price,
@@ -156,13 +156,12 @@ class EventFormatter:
         return event_data, new_total_assets_updated_data
 
     @staticmethod
-    def format_Return_data(db: Database, event: Dict, vault_id: str, chain_id: int, return_type: str) -> Tuple[Dict, Dict]:
+    def format_Return_data(event: Dict, vault_id: str, user_ids: Dict[str, str], return_type: str) -> Tuple[Dict, Dict]:
         event_data = EventFormatter._format_Event_data(event, vault_id, return_type)
-        current_event_ts = LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
         return_data = {
             'event_id': event_data['event_id'],
             'vault_id': event_data['vault_id'],
-            'user_id': LagoonDbUtils.get_user_id(db, event['args']['owner'].lower(), chain_id, current_event_ts),
+            'user_id': user_ids[event['args']['owner'].lower()],
             'return_type': return_type,
             'assets': Decimal(event['args']['assets']),
             'shares': Decimal(event['args']['shares']),
@@ -1,22 +1,33 @@
 import os
 import sys
-import pandas as pd
 from typing import List, Dict
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from db.db import Database
-from db.query.lagoon_db_utils import LagoonDbUtils
 from db.query.lagoon_events import LagoonEvents
 from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
 from lagoon_event_formatter import EventFormatter
+from lagoon_request_lifecycle import RequestLifecycle, RequestLifecycleChanges
+from core.share_price_series import SharePriceSeries
+from core.user_id_resolver import UserIdResolver, get_user_id_resolver
+
+# Events that only insert rows nothing else reads while a range is processed, so a run of
+# them can be written in any order, one multi-row write per table
+INSERT_ONLY_EVENTS = ('DepositRequest', 'RedeemRequest', 'Transfer')
+# Events whose `owner` is stored as a user_id
+USER_EVENTS = ('DepositRequest', 'RedeemRequest', 'Deposit', 'Withdraw', 'Referral')
 
 class EventProcessor:
-    def __init__(self, db: Database, lagoon: str, vault_id: str, chain_id: int):
+    def __init__(self, db: Database, lagoon: str, vault_id: str, chain_id: int, user_id_resolver: UserIdResolver = None):
         self.db = db
         self.lagoon = lagoon
         self.vault_id = vault_id
         self.chain_id = chain_id
+        self.user_id_resolver = user_id_resolver or get_user_id_resolver(chain_id)
+        self.user_ids: Dict[str, str] = {}  # Owners of the range being stored, see resolve_user_ids
+        self.lifecycle = RequestLifecycle(db, vault_id)  # Request transitions waiting for apply_lifecycle
+        self.share_prices = SharePriceSeries(vault_id)  # Share price snapshots for the settlements' APY lookups
         self.EVENT_TABLES = {
             'DepositRequest': 'deposit_requests',
             'Referral': 'deposit_requests',
@@ -38,42 +49,88 @@ class EventProcessor:
     def save_to_db_batch(self, event_name: str, event_data_list: List[Dict]):
         if not event_data_list:
             return
-        df = pd.DataFrame(event_data_list)
         table_name = 'events' if event_name == 'events' else self.EVENT_TABLES.get(event_name)
 
         if table_name:
-            LagoonEvents.insert_lagoon_events(self.db, df, table_name)
+            # A failed write must stop the range before its checkpoint moves past the lost rows
+            if not LagoonEvents.insert_lagoon_events(self.db, event_data_list, table_name):
+                raise RuntimeError(f"Failed to save {len(event_data_list)} {event_name} events to {table_name}")
             print(f"Saved {len(event_data_list)} {event_name} events to {table_name}.")
 
-    async def store_DepositRequest_events(self, events: List[Dict]):
+    def begin_range(self, events: List[Dict]):
+        """Start storing a range: drop transitions and share prices left by a failed attempt, resolve its owners."""
+        self.lifecycle = RequestLifecycle(self.db, self.vault_id)
+        self.share_prices.begin(self.db)
+        self.resolve_user_ids(events)
+
+    def resolve_user_ids(self, events: List[Dict]):
+        """
+        Resolve the user_id of every owner in `events` in one go, before they are formatted.
+        New users are created with the timestamp of their first event in the range.
+        """
+        first_seen = {}
+        for event in events:
+            if event['event_name'] in USER_EVENTS:
+                owner = event['args']['owner'].lower()
+                if owner not in first_seen:
+                    first_seen[owner] = LagoonDbDateUtils.get_datetime_from_str(event['blockTimestamp'])
+        self.user_ids = self.user_id_resolver.resolve(self.db, first_seen)
+
+    def apply_lifecycle(self) -> RequestLifecycleChanges:
+        """Apply the request transitions recorded by the store_* methods, once per range."""
+        return self.lifecycle.apply()
+
+    def store_insert_run(self, events: List[Dict]):
+        """
+        Store a run of consecutive INSERT_ONLY_EVENTS of any types: their `events` rows
+        in one write, then one write per request / transfer table.
+        """
+        event_rows = []
+        rows_by_name: Dict[str, List[Dict]] = {}
+        for event in events:
+            name = event['event_name']
+            if name == 'DepositRequest':
+                event_data, row = EventFormatter.format_DepositRequest_data(event, self.vault_id, self.user_ids)
+            elif name == 'RedeemRequest':
+                event_data, row = EventFormatter.format_RedeemRequest_data(event, self.vault_id, self.user_ids)
+            elif name == 'Transfer':
+                event_data, row = EventFormatter.format_Transfer_data(event, self.vault_id)
+            else:
+                raise ValueError(f"{name} is not an insert-only event")
+            event_rows.append(event_data)
+            rows_by_name.setdefault(name, []).append(row)
+
+        self.save_to_db_batch('events', event_rows)
+        for name, rows in rows_by_name.items():
+            self.save_to_db_batch(name, rows)
+
+    def store_DepositRequest_events(self, events: List[Dict]):
         event_rows = []
         deposit_rows = []
         tasks = []
         for event in events:
-            event_data, deposit_data = EventFormatter.format_DepositRequest_data(self.db, event, self.vault_id, self.chain_id)
+            event_data, deposit_data = EventFormatter.format_DepositRequest_data(event, self.vault_id, self.user_ids)
             event_rows.append(event_data)
             deposit_rows.append(deposit_data)
             
         self.save_to_db_batch('events', event_rows)
         self.save_to_db_batch('DepositRequest', deposit_rows)
 
-    async def store_RedeemRequest_events(self, events: List[Dict]):
+    def store_RedeemRequest_events(self, events: List[Dict]):
         event_rows = []
         redeem_rows = []
         for event in events:
-            event_data, redeem_data = EventFormatter.format_RedeemRequest_data(self.db, event, self.vault_id, self.chain_id)
+            event_data, redeem_data = EventFormatter.format_RedeemRequest_data(event, self.vault_id, self.user_ids)
             event_rows.append(event_data)
             redeem_rows.append(redeem_data)
 
         self.save_to_db_batch('events', event_rows)
         self.save_to_db_batch('RedeemRequest', redeem_rows)
 
-    async def store_Settlement_events(self, events: List[Dict], settlement_type: str):
+    def store_Settlement_events(self, events: List[Dict], settlement_type: str):
         if settlement_type == 'deposit':
-            update_func = LagoonEvents.update_settled_deposit_requests
             event_table = 'SettleDeposit'
         elif settlement_type == 'redeem':
-            update_func = LagoonEvents.update_settled_redeem_requests
             event_table = 'SettleRedeem'
         else:
             raise ValueError(f"Invalid settlement type: {settlement_type}")
@@ -81,20 +138,22 @@ class EventProcessor:
         event_data_list = []
         settle_data_list = []
         snapshot_data_list = []
-        wallets = []
         for event in events:
-            event_data, settle_data, snapshot_data = EventFormatter.format_Settlement_data(self.db, event, self.vault_id, settlement_type)
+            event_data, settle_data, snapshot_data = EventFormatter.format_Settlement_data(
+                self.db, event, self.vault_id, settlement_type, self.share_prices
+            )
             event_data_list.append(event_data)
             settle_data_list.append(settle_data)
             snapshot_data_list.append(snapshot_data)
-
-            # UPDATE the matching DepositRequest status
-            wallets, txs_hashes = update_func(
+            self.share_prices.add(
                 self.db,
-                self.vault_id,
-                event_data['event_timestamp']
+                LagoonDbDateUtils.get_datetime_from_str(snapshot_data['snapshot_ts']),
+                snapshot_data['share_price']
             )
 
+            # Settle the matching pending requests
+            self.lifecycle.settle(settlement_type, event_data)
+
         self.save_to_db_batch('events', event_data_list)
         self.save_to_db_batch(event_table, settle_data_list)
         # INSERT a new vault_snapshot
@@ -119,23 +178,18 @@ class EventProcessor:
         
         self.save_to_db_batch('events', event_data_list)
 
-    async def store_DepositRequestCanceled_events(self, events: List[Dict]):
+    def store_DepositRequestCanceled_events(self, events: List[Dict]):
         event_data_list = []
         for event in events:
             event_data, deposit_request_canceled_data = EventFormatter.format_DepositRequestCanceled_data(event, self.vault_id)
             event_data_list.append(event_data)
 
-            # UPDATE the matching DepositRequest status
-            wallet, tx_hash = LagoonEvents.update_canceled_deposit_request(
-                self.db,
-                self.vault_id,
-                deposit_request_canceled_data['request_id'],
-                event_data['event_timestamp']
-            )
+            # Cancel the matching DepositRequest
+            self.lifecycle.cancel_deposit(deposit_request_canceled_data['request_id'], event_data)
 
         self.save_to_db_batch('events', event_data_list)
 
-    async def store_Transfer_events(self, events: List[Dict]):
+    def store_Transfer_events(self, events: List[Dict]):
         event_data_list = []
         transfer_data_list = []
         for event in events:
@@ -164,40 +218,30 @@ class EventProcessor:
 
         self.save_to_db_batch('events', event_data_list)
 
-    async def store_Withdraw_events(self, events: List[Dict]):
+    def store_Withdraw_events(self, events: List[Dict]):
         event_data_list = []
         return_data_list = []
         for event in events:
-            event_data, return_data = EventFormatter.format_Return_data(self.db, event, self.vault_id, self.chain_id, 'withdraw')
+            event_data, return_data = EventFormatter.format_Return_data(event, self.vault_id, self.user_ids, 'withdraw')
             event_data_list.append(event_data)
             return_data_list.append(return_data)
             
-            # UPDATE the matching RedeemRequest status
-            wallets, txs_hashes = LagoonEvents.update_completed_redeem(
-                self.db,
-                self.vault_id,
-                return_data['user_id'],
-                LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
-            )
+            # Complete the matching RedeemRequest
+            self.lifecycle.complete('redeem', return_data['user_id'], event_data)
 
         self.save_to_db_batch('events', event_data_list)
         self.save_to_db_batch('Withdraw', return_data_list)
 
-    async def store_Deposit_events(self, events: List[Dict]):
+    def store_Deposit_events(self, events: List[Dict]):
         event_data_list = []
         return_data_list = []
         for event in events:
-            event_data, return_data = EventFormatter.format_Return_data(self.db, event, self.vault_id, self.chain_id, 'deposit')
+            event_data, return_data = EventFormatter.format_Return_data(event, self.vault_id, self.user_ids, 'deposit')
             event_data_list.append(event_data)
             return_data_list.append(return_data)
             
-            # UPDATE the matching DepositRequest status
-            wallets, txs_hashes = LagoonEvents.update_completed_deposit(
-                self.db,
-                self.vault_id,
-                return_data['user_id'],
-                LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
-            )
+            # Complete the matching DepositRequest
+            self.lifecycle.complete('deposit', return_data['user_id'], event_data)
 
         self.save_to_db_batch('events', event_data_list)
         self.save_to_db_batch('Deposit', return_data_list)
@@ -210,14 +254,8 @@ class EventProcessor:
             event_data_list.append(event_data)
             deposit_request_referral_data_list.append(referral_data)
 
-            # UPDATE the matching DepositRequest referral address
-            current_event_ts = LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp'])
-            LagoonEvents.update_deposit_request_referral(
-                self.db,
-                self.vault_id,
-                LagoonDbUtils.get_user_id(self.db, referral_data['owner_address'].lower(), self.chain_id, current_event_ts),
-                referral_data['referral_address']
-            )
+            # Set the referral address of the owner's DepositRequests
+            self.lifecycle.refer(self.user_ids[referral_data['owner_address']], referral_data['referral_address'], event_data)
 
         self.save_to_db_batch('events', event_data_list)
 
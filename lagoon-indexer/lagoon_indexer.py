@@ -3,20 +3,30 @@ import sys
 import time
 import random
 import asyncio
+import functools
 import traceback
+import contextvars
 from typing import List, Dict, Tuple
 from datetime import datetime
+from hexbytes import HexBytes
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db.db import getEnvDb
+from db.db import getEnvDb, get_writer_executor
 from core.blockchain import getEnvNode
+from core.block_cache import BlockTimestampCache, get_block_timestamp_cache
+from core.head_tracker import ChainHeadTracker
 from db.query.lagoon_db_utils import LagoonDbUtils
+from db.query.lagoon_reorg import LagoonReorg
 from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
-from eth_utils import event_abi_to_log_topic
-from utils.indexer_status import is_up_to_date, get_indexer_status
+from utils.indexer_status import is_up_to_date, get_block_gap, get_indexer_status
+from utils.range_controller import AdaptiveRangeController, get_range_controller, is_range_limit_error
+from utils.rate_limiter import PRIORITY_BACKFILL, PRIORITY_TAIL, rpc_priority
 
-from lagoon_event_processor import EventProcessor
+from lagoon_event_processor import EventProcessor, INSERT_ONLY_EVENTS
+from lagoon_event_decoder import get_lagoon_event_decoder
+from lagoon_log_coordinator import ChainLogCoordinator
+from lagoon_log_archive import make_log_archive
 
 
 # -----------------------------
@@ -47,9 +57,20 @@ async def retry_async(call, *, max_attempts=6, base_delay=0.5, max_delay=6.0, ji
             delay *= (1.0 + jitter * (2 * random.random() - 1))
             await asyncio.sleep(max(0.0, delay))
     raise last_exc
+
+
+class ReorgDetected(Exception):
+    """The chain no longer contains a block this vault has indexed (or is indexing)."""
+    def __init__(self, block_number: int):
+        super().__init__(f"Reorg detected at block {block_number}")
+        self.block_number = block_number
+
+
 class LagoonIndexer:
     def __init__(self, chain_id: int, lagoon_address: str, silo_address: str, genesis_block_number: int, 
-                 sleep_time: int, range: int, event_names: list, real_time: bool = True, vault_id: str = None):
+                 sleep_time: int, range: int, event_names: list, real_time: bool = True, vault_id: str = None,
+                 block_ts_cache: BlockTimestampCache = None, log_coordinator: ChainLogCoordinator = None,
+                 backfill_shards: int = 1, head_tracker: ChainHeadTracker = None, offline: bool = False):
         self.first_lagoon_block = genesis_block_number-1 # -1 To process the first block
         self.lagoon = lagoon_address
         self.silo = silo_address
@@ -59,80 +80,144 @@ class LagoonIndexer:
         self.sleep_time = sleep_time
         self.range = range
         self.real_time = real_time
+        self.backfill_shards = backfill_shards
         self.event_names = event_names
 
-        self.blockchain = getEnvNode(chain_id)
-        self.lagoon_contract = self.blockchain.get_lagoon_contract(lagoon_address)
+        self.blockchain = None if offline else getEnvNode(chain_id)  # Offline (archive replay) makes no RPC call
+        self.block_ts_cache = block_ts_cache or get_block_timestamp_cache(chain_id)
+        self.decoder = get_lagoon_event_decoder(tuple(event_names))
+        self.log_coordinator = log_coordinator  # Shares eth_getLogs calls with the chain's other vaults
+        self.head_tracker = head_tracker  # Chain head shared by the chain's vaults, None to query it directly
+        self.last_seen_head = 0
+        self.last_block_hash = None  # Hash of the last checkpoint block, the parent the next range must build on
+        self.archive = make_log_archive(chain_id, lagoon_address)  # Raw logs of committed ranges, for offline replays
         self.db = getEnvDb(os.getenv('DB_NAME'))
+        self.writer_executor = get_writer_executor(chain_id)  # Bounded per chain, see run_write
         self.event_processor = EventProcessor(self.db, self.lagoon, self.vault_id, self.chain_id)
 
         self.MAX_FETCH_SPAN = int(os.getenv("MAX_FETCH_SPAN", "0"))  # RPC client fetch limit. 0 means no splitting
+        self.PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", "2"))  # Fetched ranges allowed to wait for the writer
+        self.BACKFILL_SHARD_BUFFER = int(os.getenv("BACKFILL_SHARD_BUFFER", "8"))  # Fetched ranges buffered per backfill shard
+        self.REORG_DEPTH = int(os.getenv("REORG_DEPTH", "64"))  # Blocks of checkpoint hashes kept to undo reorgs. 0 disables
+        self.BACKFILL_ASYNC_COMMIT = os.getenv("BACKFILL_ASYNC_COMMIT", "1") == "1"  # Backfill ranges commit without waiting for the WAL flush
+        self.HEAD_LAG_BLOCKS = int(os.getenv("RPC_MAX_LAG_BLOCKS", "20"))  # How far behind the head a pool endpoint may serve
+
+    @staticmethod
+    def format_block_ts(timestamp: int) -> str:
+        return LagoonDbDateUtils.format_timestamp(datetime.fromtimestamp(timestamp))
+
+    async def get_latest_block_number(self) -> int:
+        if self.head_tracker:
+            head = await self.head_tracker.latest()
+        else:
+            head = await self.blockchain.aio.block_number()
+        self.last_seen_head = max(self.last_seen_head, head)
+        return head
+
+    async def run_write(self, func, *args):
+        """
+        Run a blocking DB write on the chain's writer pool, like asyncio.to_thread (context
+        included) but never queued behind the default executor's other work.
+        """
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.writer_executor, call)
 
-    def get_block_ts(self, event: Dict) -> str:
-        block_number = int(event['blockNumber'])
-        ts = datetime.fromtimestamp(self.blockchain.getBlockTimestamp(block_number))
-        return LagoonDbDateUtils.format_timestamp(ts)
+    async def wait_for_new_head(self):
+        """
+        Idle until there is something new to index: the next head from the tracker
+        (at most `sleep_time`), or a plain `sleep_time` without one.
+        """
+        if self.head_tracker:
+            await self.head_tracker.wait_for_head(self.last_seen_head, self.sleep_time)
+        else:
+            await asyncio.sleep(self.sleep_time)
 
-    def get_latest_block_number(self) -> int:
-        return self.blockchain.getLatestBlockNumber()
+    @property
+    def range_controller(self) -> AdaptiveRangeController:
+        # Per chain: eth_getLogs go to any endpoint of the pool, whichever node `self.blockchain` prefers
+        return get_range_controller(self.chain_id, self.range)
 
-    def fetch_events(self, from_block: int, to_block: int) -> List[Dict]:
+    async def get_logs_adaptive(self, from_block: int, to_block: int) -> List[Dict]:
+        """
+        Raw eth_getLogs for the tracked topics, feeding latency and result counts
+        back to the range controller. Provider range/size errors shrink the window
+        and the range is refetched in halves right away instead of via retry_async.
+        With the log coordinator, the controller is fed by the coordinator's own
+        multi-vault calls instead, since this vault's share says little about them.
+        """
+        controller = self.range_controller
+        # Near the head the pool may pick an endpoint a few blocks behind, which answers with
+        # no logs for blocks it has not seen: there the logs come with the proof that it has `to_block`
+        pin_to_block = to_block > self.last_seen_head - self.HEAD_LAG_BLOCKS
+        start = time.monotonic()
+        try:
+            if self.log_coordinator:
+                logs = await self.log_coordinator.get_logs(self.blockchain.aio, self.lagoon, from_block, to_block, pin_to_block)
+            else:
+                logs = await self.blockchain.aio.get_logs(
+                    from_block, to_block, self.lagoon, self.decoder.topics, raw=True, pin_to_block=pin_to_block
+                )
+        except Exception as e:
+            if to_block <= from_block or not is_range_limit_error(e):
+                raise
+            if self.log_coordinator:
+                # The coordinator already reported its failed call
+                retry_range = controller.next_range(to_block - from_block - 1)
+            else:
+                retry_range = controller.on_limit_error(to_block - from_block, e)
+            mid = min(from_block + retry_range, from_block + (to_block - from_block) // 2)
+            left = await self.get_logs_adaptive(from_block, mid)
+            return left + await self.get_logs_adaptive(mid + 1, to_block)
+        if not self.log_coordinator:
+            controller.on_success(to_block - from_block, time.monotonic() - start, len(logs))
+        return logs
+
+    def decode_logs(self, logs: List[Dict]) -> List[Dict]:
+        """
+        Decode raw logs through the precompiled topic0 dispatch table, skipping the ones that fail.
+        """
+        events = []
+        for log in logs:
+            try:
+                event = self.decoder.decode_raw(log)
+            except Exception as e:
+                print(f"Failed to process log {log.get('transactionHash')}:{log.get('logIndex')}: {e}")
+                continue
+            if event:
+                events.append(event)
+        return events
+
+    async def fetch_events(self, from_block: int, to_block: int) -> Tuple[List[Dict], List[Dict]]:
         """
         Fetches events of specified type within the given block range.
+        Returns the decoded events and the raw logs they came from.
         """
         try:
-            event_objects = [self.lagoon_contract.events[event_name] for event_name in self.event_names]
-            event_topics = [event_abi_to_log_topic(event_obj().abi) for event_obj in event_objects]
-            
-            # Get logs for all event topics
-            logs = self.blockchain.get_logs(from_block, to_block, self.lagoon, event_topics)
-            
-            # Process each log with the appropriate event object
-            events = []
-            for log in logs:
-                # Find the matching event object for this log by checking the first topic
-                log_topic = log['topics'][0] if log['topics'] else None
-                if not log_topic:
-                    continue
-                
-                # Find the matching event object for this log
-                for i, event_obj in enumerate(event_objects):
-                    if event_topics[i] == log_topic:
-                        try:
-                            processed_event = event_obj().process_log(log)
-                            if processed_event:
-                                # Convert AttributeDict to regular dict to allow item assignment
-                                event_dict = dict(processed_event)
-                                event_dict['event_name'] = event_obj.event_name
-                                event_dict['blockTimestamp'] = self.get_block_ts(processed_event)
-                                events.append(event_dict)
-                                break
-                        except Exception as e:
-                            print(f"Failed to process log with {event_obj.event_name}: {e}")
-                            continue
-            
-            return events
+            # Get logs for all tracked event topics
+            logs = await self.get_logs_adaptive(from_block, to_block)
+            events = self.decode_logs(logs)
+            return events, logs
         except Exception as e:
             print(f"Error fetching events: {e}")
             raise
 
 
-    async def _fetch_events_for_type(self, from_block: int, to_block: int) -> List[Dict]:
+    async def _fetch_events_for_type(self, from_block: int, to_block: int) -> Tuple[List[Dict], List[Dict]]:
         """
         Fetch with retries; optionally split large ranges to avoid provider limits.
         """
         async def _call():
             # optional range splitting
             if self.MAX_FETCH_SPAN and (to_block - from_block) > self.MAX_FETCH_SPAN:
-                print(f"Spliting fetch range to {from_block}-{mid} and {mid + 1}-{to_block}")
                 mid = from_block + (to_block - from_block) // 2
+                print(f"Spliting fetch range to {from_block}-{mid} and {mid + 1}-{to_block}")
                 left, right = await asyncio.gather(
                     self._fetch_events_for_type(from_block, mid),
                     self._fetch_events_for_type(mid + 1, to_block),
                 )
-                return left + right
-            # single shot
-            return await asyncio.to_thread(self.fetch_events, from_block, to_block)
+                return left[0] + right[0], left[1] + right[1]
+            # single shot, awaited on the event loop (no thread hop)
+            return await self.fetch_events(from_block, to_block)
 
         def _on_retry(attempt, err):
             print(f"[retry] attempt {attempt} failed: {err}")
@@ -149,99 +234,350 @@ class LagoonIndexer:
             on_retry=_on_retry
         )
 
-    async def fetch_and_store(self, from_block: int, range: int):
+    async def fetch_range(self, from_block: int, to_block: int) -> Dict:
         """
-        Fetch events for all configured types, process them in strict chain order,
-        and atomically commit both data and checkpoint in a single DB transaction.
+        Fetch stage: events of all configured types for the range, with their
+        block timestamps resolved, in strict chain order, plus the range boundary
+        hashes. Only ranges within REORG_DEPTH of the head get a boundary (None
+        otherwise): deeper blocks are final, so backfills skip the header checks
+        and keep taking timestamps from the cache / oracle. With an archive, the
+        raw logs and block timestamps to archive are kept as well.
         """
-        to_block = from_block + range
         print(f"Fetching events {from_block} to {to_block} for {len(self.event_names)} types")
-
-        # 1) concurrent fetches with retry
-        tasks = [self._fetch_events_for_type(from_block, to_block)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # 2) if any hard failure, abort (let fetcher_loop retry same range later)
-        for r in results:
-            if isinstance(r, Exception):
-                raise r
-
-        # 3) flatten + sort
-        all_events: List[Dict] = [e for group in results for e in group]
-        all_events.sort(key=lambda e: (int(e['blockNumber']), int(e['logIndex'])))
-
-        # 4) ordered processing with buffered writes
-        buffers: Dict[str, List[Dict]] = {event_name: [] for event_name in self.event_names}
-
-        async def flush(name: str):
-            """
-            Flush one buffer through the appropriate store_* method.
-            Clear only on success to keep at-least-once semantics safe.
-            """
-            if not buffers[name]:
-                return
-            batch = buffers[name][:]  # copy
-            try:
-                if name == 'DepositRequest':
-                    await self.event_processor.store_DepositRequest_events(batch)
-                elif name == 'RedeemRequest':
-                    await self.event_processor.store_RedeemRequest_events(batch)
-                elif name == 'SettleDeposit':
-                    await self.event_processor.store_Settlement_events(batch, 'deposit')
-                elif name == 'SettleRedeem':
-                    await self.event_processor.store_Settlement_events(batch, 'redeem')
-                elif name == 'DepositRequestCanceled':
-                    await self.event_processor.store_DepositRequestCanceled_events(batch)
-                elif name == 'Transfer':
-                    await self.event_processor.store_Transfer_events(batch)
-                elif name == 'NewTotalAssetsUpdated':
-                    self.event_processor.store_NewTotalAssetsUpdated_events(batch)
-                elif name == 'RatesUpdated':
-                    self.event_processor.store_RatesUpdated_events(batch)
-                elif name == 'Withdraw':
-                    await self.event_processor.store_Withdraw_events(batch)
-                elif name == 'Deposit':
-                    await self.event_processor.store_Deposit_events(batch)
-                elif name == 'Referral':
-                    self.event_processor.store_Referral_events(batch)
-                elif name == 'StateUpdated':
-                    self.event_processor.store_StateUpdated_events(batch)
-                elif name == 'Paused':
-                    self.event_processor.store_Paused_events(batch)
-                elif name == 'Unpaused':
-                    self.event_processor.store_Unpaused_events(batch)
-                # if success then clear
-                buffers[name].clear()
-            except Exception as e:
-                print(f"Error flushing {name} batch: {e}")
-                traceback.print_exc()
-                self.blockchain = getEnvNode(self.chain_id)
-                # keep buffer content for next retry
-
-        # 5) Stage events into buffers
-        for event in all_events:
+        events, logs = await self._fetch_events_for_type(from_block, to_block)
+        events.sort(key=lambda e: (int(e['blockNumber']), int(e['logIndex'])))
+        near_head = self.REORG_DEPTH > 0 and to_block > self.last_seen_head - self.REORG_DEPTH
+        # The boundary headers seed the timestamp cache, so its blocks are not fetched twice
+        boundary = await self.get_range_boundary(from_block, to_block, events) if near_head else None
+
+        # Resolve all distinct block timestamps of the range in one batch
+        timestamps = await self.block_ts_cache.get_many_async(self.blockchain, {int(e['blockNumber']) for e in events})
+        for event in events:
+            event['blockTimestamp'] = self.format_block_ts(timestamps[int(event['blockNumber'])])
+
+        fetched = {
+            "from_block": from_block,
+            "to_block": to_block,
+            "events": events,
+            "boundary": boundary,
+        }
+        if self.archive:
+            fetched["logs"] = logs
+            fetched["timestamps"] = timestamps
+        return fetched
+
+    async def get_range_boundary(self, from_block: int, to_block: int, events: List[Dict]) -> Dict:
+        """
+        Headers of the range ends and of every block carrying events, read after the
+        logs. Raises ReorgDetected if a log came from a block the chain no longer has,
+        otherwise returns the parent hash of `from_block` and the hash and timestamp
+        of `to_block`, consistent with the events.
+        """
+        event_blocks = {int(e['blockNumber']) for e in events}
+        # The endpoint asked may lag the one that served the logs by a block or two: retry "not found"
+        headers = await retry_async(
+            lambda: self.blockchain.aio.get_block_headers(sorted(event_blocks | {from_block, to_block})),
+            max_attempts=3,
+        )
+        self.block_ts_cache.put_many({block_number: header['timestamp'] for block_number, header in headers.items()})
+        for event in events:
+            block_number = int(event['blockNumber'])
+            if HexBytes(headers[block_number]['hash']) != HexBytes(event['blockHash']):
+                raise ReorgDetected(block_number)
+        return {
+            "parent_hash": headers[from_block]['parentHash'],
+            "hash": headers[to_block]['hash'],
+            "timestamp": headers[to_block]['timestamp'],
+        }
+
+    def store_range(self, events: List[Dict]):
+        """
+        Write stage: store the range's events as order-preserving runs. Consecutive
+        insert-only events (requests, transfers) are written together, one multi-row
+        write per table; every other event changes state that later events read, so
+        it is applied on its own, in block order, after the run before it. Request
+        lifecycle transitions are collected on the way and applied together at the end.
+        Synchronous, so the pipeline can run it off the event loop. Raises on a
+        failed write so the range and its checkpoint are not committed.
+        """
+        transitions = {
+            'SettleDeposit': lambda batch: self.event_processor.store_Settlement_events(batch, 'deposit'),
+            'SettleRedeem': lambda batch: self.event_processor.store_Settlement_events(batch, 'redeem'),
+            'DepositRequestCanceled': self.event_processor.store_DepositRequestCanceled_events,
+            'NewTotalAssetsUpdated': self.event_processor.store_NewTotalAssetsUpdated_events,
+            'RatesUpdated': self.event_processor.store_RatesUpdated_events,
+            'Withdraw': self.event_processor.store_Withdraw_events,
+            'Deposit': self.event_processor.store_Deposit_events,
+            'Referral': self.event_processor.store_Referral_events,
+            'StateUpdated': self.event_processor.store_StateUpdated_events,
+            'Paused': self.event_processor.store_Paused_events,
+            'Unpaused': self.event_processor.store_Unpaused_events,
+        }
+        run: List[Dict] = []
+        self.event_processor.begin_range(events)
+
+        def flush_run():
+            if run:
+                self.event_processor.store_insert_run(run)
+                run.clear()
+
+        for event in events:
             name = event['event_name']
-            if name not in buffers:
+            if name not in self.event_names:
                 # Log and skip unknown event types
                 print(f"Skipping unknown event type: {name}")
                 continue
-            buffers[name].append(event)
-            await flush(name)
+            if name in INSERT_ONLY_EVENTS:
+                run.append(event)
+                continue
+            flush_run()
+            transitions[name]([event])
+        flush_run()
+        self.event_processor.apply_lifecycle()
+
+    def write_range(self, fetched: Dict, latest_block: int, backfill_shards: List[Dict] = None, archive: bool = True):
+        """
+        Store one range from `fetch_range` and advance the checkpoint to its last block in
+        a single DB transaction. Its `boundary` must chain onto the last checkpoint, else
+        ReorgDetected is raised before anything is written; its hash is recorded as the
+        new checkpoint. `backfill_shards`, when given, is recorded as the backfill progress
+        alongside. The range is appended to the archive (if any) right before the commit.
+        """
+        from_block, to_block, events, boundary = fetched['from_block'], fetched['to_block'], fetched['events'], fetched['boundary']
+        if boundary and self.last_block_hash and boundary['parent_hash'] != self.last_block_hash:
+            raise ReorgDetected(from_block - 1)
+
+        # A range behind the head is backfill: it may be replayed from the checkpoint, so its
+        # commit need not wait for the WAL flush (optional, BACKFILL_ASYNC_COMMIT)
+        is_syncing = not is_up_to_date(to_block, latest_block)
+        synchronous_commit = not (is_syncing and self.BACKFILL_ASYNC_COMMIT)
+        try:
+            # One transaction for the whole range: the store_* helpers join it instead of committing
+            with self.db.unit_of_work(synchronous_commit=synchronous_commit):
+                # Do NOT advance checkpoint if this raises
+                self.store_range(events)
+
+                # If we got here, everything for this range has been stored successfully
+                LagoonDbUtils.update_last_processed_block(self.db, self.vault_id, to_block, is_syncing)
+                print(f"Updated last processed block to {to_block} in DB.")
+                if backfill_shards is not None:
+                    LagoonDbUtils.update_backfill_shards(self.db, self.vault_id, backfill_shards)
+                if boundary:
+                    LagoonReorg.record_block_hash(
+                        self.db, self.vault_id, to_block, boundary['hash'], self.format_block_ts(boundary['timestamp']), self.REORG_DEPTH
+                    )
+
+                bot_last_processed_block = LagoonDbUtils.get_bot_last_processed_block(self.db, self.vault_id, self.first_lagoon_block)
+                print(f"Bot last processed block: {bot_last_processed_block}")
+                if (bot_last_processed_block <= to_block):
+                    LagoonDbUtils.update_bot_in_sync(self.db, self.vault_id)
+                    print(f"Updated bot status to in sync in DB.")
+                else:
+                    print(f"Indexer is {bot_last_processed_block - to_block} blocks away towards bot syncing.")
+
+                if archive and self.archive:
+                    self.archive.append(from_block, to_block, fetched['logs'], fetched['timestamps'], boundary)
+            print(f"Transaction committed successfully for blocks {from_block} to {to_block}")
+            self.last_block_hash = boundary['hash'] if boundary else None
+
+        except Exception as e:
+            print(f"Transaction rolled back due to error: {e}")
+            raise e
+
+    async def run_pipeline(self, last_processed_block: int, latest_block: int) -> int:
+        """
+        Index from `last_processed_block` up to `latest_block` with overlapping stages:
+        the fetch stage (logs, decoding, block timestamps) runs up to PIPELINE_DEPTH
+        ranges ahead of the write stage, which commits each range and its checkpoint
+        in order on a worker thread. On any error the fetch stage is cancelled and
+        the exception raised, so the next loop resumes from the DB checkpoint.
+        Returns the last committed block.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.PIPELINE_DEPTH)
+
+        async def fetch_stage():
+            try:
+                next_block = last_processed_block + 1
+                while not is_up_to_date(next_block - 1, latest_block):
+                    block_gap = get_block_gap(next_block - 1, latest_block)
+                    # Get block range to process, sized by what the provider has been serving. Both ends
+                    # are inclusive: the range never passes the last block the gap allows (the head without headroom)
+                    to_block = next_block + self.range_controller.next_range(block_gap - 1)
+                    await queue.put(await self.fetch_range(next_block, to_block))
+                    next_block = to_block + 1
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
 
-        print(f"Committed events from {from_block} to {to_block}")
-        return to_block
+        fetcher = asyncio.create_task(fetch_stage())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return last_processed_block
+                if isinstance(item, Exception):
+                    raise item
+                await self.run_write(self.write_range, item, latest_block)
+                last_processed_block = item['to_block']
+                if self.log_coordinator:
+                    self.log_coordinator.note_progress(self.lagoon, last_processed_block)
+        finally:
+            fetcher.cancel()
+
+    async def run_backfill(self, last_processed_block: int, latest_block: int) -> int:
+        """
+        Historical backfill: split the span from `last_processed_block` to the head into
+        `backfill_shards` contiguous shards, fetch and decode them concurrently, and apply
+        them strictly in block order (every range of shard 0, then shard 1, ...). Each
+        shard buffers at most BACKFILL_SHARD_BUFFER ranges ahead of the writer. Progress
+        of every shard is recorded in indexer_state.backfill_shards with each checkpoint.
+        Returns the last committed block.
+        """
+        end_block = last_processed_block + get_block_gap(last_processed_block, latest_block)
+        shard_size = -(-(end_block - last_processed_block) // self.backfill_shards)
+        shards = []
+        for start in range(last_processed_block + 1, end_block + 1, shard_size):
+            shards.append({
+                "from_block": start,
+                "to_block": min(start + shard_size - 1, end_block),
+                "fetched_block": start - 1,
+                "applied_block": start - 1,
+            })
+        print(f"[{self.chain_id} - {self.lagoon}] Backfilling {last_processed_block + 1} to {end_block} in {len(shards)} shards")
+        queues = [asyncio.Queue(maxsize=self.BACKFILL_SHARD_BUFFER) for _ in shards]
+
+        async def fetch_shard(shard: Dict, queue: asyncio.Queue):
+            try:
+                next_block = shard["from_block"]
+                while next_block <= shard["to_block"]:
+                    to_block = next_block + self.range_controller.next_range(shard["to_block"] - next_block)
+                    await queue.put(await self.fetch_range(next_block, to_block))
+                    shard["fetched_block"] = to_block
+                    next_block = to_block + 1
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
+
+        fetchers = [asyncio.create_task(fetch_shard(shard, queue)) for shard, queue in zip(shards, queues)]
+        try:
+            for shard, queue in zip(shards, queues):
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    to_block = item['to_block']
+                    shard["applied_block"] = to_block
+                    progress = [dict(s) for s in shards]
+                    await self.run_write(self.write_range, item, latest_block, progress)
+                    last_processed_block = to_block
+                    if self.log_coordinator:
+                        self.log_coordinator.note_progress(self.lagoon, to_block)
+        finally:
+            for fetcher in fetchers:
+                fetcher.cancel()
+
+        await self.run_write(LagoonDbUtils.update_backfill_shards, self.db, self.vault_id, None)
+        print(f"[{self.chain_id} - {self.lagoon}] Backfill reached block {last_processed_block}, switching to tail")
+        return last_processed_block
+
+    async def handle_reorg(self, reorg: ReorgDetected) -> int:
+        """
+        Find the newest recorded checkpoint still on the canonical chain and roll the
+        vault back to it: its events, request statuses and vault state past that block
+        are undone, and the shared caches forget the replaced blocks. Re-indexing from
+        there is idempotent thanks to the deterministic event ids. Returns the block
+        the vault was rolled back to.
+        """
+        checkpoints = LagoonReorg.get_block_hashes(self.db, self.vault_id)
+        head = await self.blockchain.aio.block_number()
+        candidates = [c for c in checkpoints if c['block_number'] <= head]
+        canonical = await self.blockchain.aio.get_block_headers([c['block_number'] for c in candidates]) if candidates else {}
+        anchor = next((c for c in candidates if canonical[c['block_number']]['hash'] == c['block_hash']), None)
+        if anchor is None:
+            raise RuntimeError(
+                f"{reorg} is deeper than the {len(checkpoints)} recorded checkpoints (REORG_DEPTH={self.REORG_DEPTH}), "
+                f"vault {self.lagoon} must be reindexed"
+            )
+
+        anchor_block = anchor['block_number']
+        self.block_ts_cache.evict_from(anchor_block + 1)
+        if self.log_coordinator:
+            self.log_coordinator.evict_from(anchor_block + 1)
+        await self.run_write(LagoonReorg.rollback_to_block, self.db, self.vault_id, anchor_block, anchor['block_timestamp'])
+        self.event_processor.share_prices.invalidate()
+        self.last_block_hash = anchor['block_hash']
+        if self.log_coordinator:
+            self.log_coordinator.note_progress(self.lagoon, anchor_block)
+        print(f"[{self.chain_id} - {self.lagoon}] {reorg}, rolled back to block {anchor_block}")
+        return anchor_block
+
+    def replay_archive(self) -> int:
+        """
+        Rebuild the vault's indexed data from its local archive, without any RPC call:
+        the archive is first checked to cover the vault contiguously from its genesis
+        block up to its checkpoint, then everything indexed so far is reset and every archived range is
+        decoded and written through the regular write stage, in block order. Returns
+        the last replayed block.
+        """
+        if not self.archive:
+            raise ValueError("Replay needs LOG_ARCHIVE_DIR")
+        print(f"[{self.chain_id} - {self.lagoon}] Replaying {self.archive.path}")
+        # Nothing is reset unless the whole archive can be replayed
+        covered_to = self.first_lagoon_block
+        for record in self.archive.read_ranges():
+            if record['from_block'] != covered_to + 1:
+                raise RuntimeError(
+                    f"Archive of {self.lagoon} has no record of blocks {covered_to + 1} to {record['from_block'] - 1}, nothing replayed"
+                )
+            covered_to = record['to_block']
+        if covered_to == self.first_lagoon_block:
+            raise RuntimeError(f"Archive of {self.lagoon} is empty, nothing replayed")
+        checkpoint = LagoonDbUtils.get_last_processed_block(self.db, self.vault_id, self.first_lagoon_block)
+        if covered_to < checkpoint:
+            raise RuntimeError(
+                f"Archive of {self.lagoon} ends at block {covered_to}, before the checkpoint {checkpoint}, nothing replayed"
+            )
+
+        LagoonDbUtils.reset_vault_index(self.db, self.vault_id)
+        self.event_processor.share_prices.invalidate()
+        self.last_block_hash = None
+        last_processed_block = self.first_lagoon_block
+        ranges = 0
+        for record in self.archive.read_ranges():
+            events = self.decode_logs(record['logs'])
+            for event in events:
+                event['blockTimestamp'] = self.format_block_ts(record['timestamps'][int(event['blockNumber'])])
+            events.sort(key=lambda e: (int(e['blockNumber']), int(e['logIndex'])))
+            fetched = {
+                "from_block": record['from_block'],
+                "to_block": record['to_block'],
+                "events": events,
+                "boundary": record['boundary'],
+            }
+            self.write_range(fetched, record['to_block'], archive=False)
+            last_processed_block = record['to_block']
+            ranges += 1
+        print(f"[{self.chain_id} - {self.lagoon}] Replayed {ranges} ranges up to block {last_processed_block}")
+        return last_processed_block
 
     async def fetcher_loop(self):
         """
-        Processes a single range of blocks and updates the last processed block in the DB.
+        Processes the block ranges up to the current head through the fetch/write
+        pipeline, updating the last processed block in the DB once per range.
         Returns 1 if up to date.
         """
         try:
             print(f"[{self.chain_id} - {self.lagoon}] Indexer running...")
             last_processed_block = LagoonDbUtils.get_last_processed_block(self.db, self.vault_id, self.first_lagoon_block)
             print(f"Last processed block: {last_processed_block}")
+            if self.log_coordinator:
+                self.log_coordinator.note_progress(self.lagoon, last_processed_block)
+            if self.REORG_DEPTH > 0:
+                self.last_block_hash = LagoonReorg.get_block_hash(self.db, self.vault_id, last_processed_block)
 
-            latest_block = self.get_latest_block_number()
+            latest_block = await self.get_latest_block_number()
             print(f"Current chain head: {latest_block}")
 
             if is_up_to_date(last_processed_block, latest_block):
@@ -253,52 +589,32 @@ class LagoonIndexer:
             print(f"Indexer is {percentage_behind}% towards completion of syncing.")
             print(f"Block gap: {block_gap}")
 
-            # Get block range to process
-            range_to_process = min(self.range, block_gap)
             from_block = last_processed_block + 1
-            print(f"Processing block range {from_block} to {from_block + range_to_process}")
-
-            # Wrap the entire operation in a transaction to ensure atomicity
-            with self.db.connection.cursor() as cursor:
-                try:
-                    # Start transaction
-                    cursor.execute("BEGIN")
-                    
-                    # Do NOT advance checkpoint if this raises
-                    await self.fetch_and_store(from_block, range_to_process)
-
-                    # If we got here, everything for this range has been stored successfully
-                    new_last_processed_block = from_block + range_to_process
-                    is_syncing = not is_up_to_date(new_last_processed_block, latest_block)
-                    LagoonDbUtils.update_last_processed_block(self.db, self.vault_id, new_last_processed_block, is_syncing)
-                    print(f"Updated last processed block to {new_last_processed_block} in DB.")
-
-                    bot_last_processed_block = LagoonDbUtils.get_bot_last_processed_block(self.db, self.vault_id, self.first_lagoon_block)
-                    print(f"Bot last processed block: {bot_last_processed_block}")
-                    if (bot_last_processed_block <= new_last_processed_block):
-                        LagoonDbUtils.update_bot_in_sync(self.db, self.vault_id)
-                        print(f"Updated bot status to in sync in DB.")
-                    else:
-                        print(f"Indexer is {bot_last_processed_block - new_last_processed_block} blocks away towards bot syncing.")
-
-                    # Commit the transaction
-                    cursor.execute("COMMIT")
-                    print(f"Transaction committed successfully for blocks {from_block} to {new_last_processed_block}")
-
-                except Exception as e:
-                    # Rollback the transaction on any error
-                    cursor.execute("ROLLBACK")
-                    print(f"Transaction rolled back due to error: {e}")
-                    raise e
+            # Far behind: crawl the history in concurrent shards first, then tail from the new head
+            if self.backfill_shards > 1 and block_gap >= self.backfill_shards * self.range_controller.next_range(block_gap):
+                with rpc_priority(PRIORITY_BACKFILL):
+                    last_processed_block = await self.run_backfill(last_processed_block, latest_block)
+                latest_block = await self.get_latest_block_number()
+                block_gap = get_block_gap(last_processed_block, latest_block)
+
+            # RPC calls of vaults following the head are served before those still catching up
+            catching_up = block_gap > self.range_controller.next_range(block_gap)
+            with rpc_priority(PRIORITY_BACKFILL if catching_up else PRIORITY_TAIL):
+                new_last_processed_block = await self.run_pipeline(last_processed_block, latest_block)
+            print(f"Processed block range {from_block} to {new_last_processed_block}")
 
             if self.real_time and self.sleep_time > 0:
-                print(f"Sleeping {self.sleep_time} seconds.")
-                time.sleep(self.sleep_time)
+                print(f"Waiting for a new head (up to {self.sleep_time} seconds).")
+                await self.wait_for_new_head()
+
+        except ReorgDetected as e:
+            # Resume right away from the rolled back checkpoint
+            await self.handle_reorg(e)
 
         except Exception as e:
             print(f"Error in fetcher loop: {e}")
             traceback.print_exc()
             if self.sleep_time > 0:
                 print(f"Sleeping {self.sleep_time} seconds before retrying.")
-                time.sleep(self.sleep_time)
+                await asyncio.sleep(self.sleep_time)
             return 1
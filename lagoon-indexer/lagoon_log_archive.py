@@ -0,0 +1,152 @@
+import os
+import gzip
+import json
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+_READ_CHUNK = 1 << 16
+
+
+def _gzip_members(data: bytes) -> Iterator[Tuple[int, int, Optional[bytes]]]:
+    """
+    (start, end, payload) of each gzip member in `data`, its CRC checked. A corrupt or
+    truncated member has payload None and ends where the next member header starts.
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        position, parts = offset, []
+        try:
+            while not decompressor.eof and position < len(data):
+                chunk = view[position:position + _READ_CHUNK]
+                parts.append(decompressor.decompress(chunk))
+                position += len(chunk)
+            if not decompressor.eof:
+                raise zlib.error("truncated member")
+        except zlib.error:
+            next_start = data.find(GZIP_MAGIC, offset + 1)
+            end = next_start if next_start >= 0 else len(data)
+            yield offset, end, None
+            offset = end
+            continue
+        end = position - len(decompressor.unused_data)
+        yield offset, end, b"".join(parts)
+        offset = end
+
+
+class LogArchive:
+    """
+    Append-only local archive of what the indexer fetched for one vault: for every
+    committed range, its raw logs, the timestamps of the blocks carrying them and
+    the range boundary hashes.
+
+    Records are gzipped JSON lines in segment files of `segment_blocks` blocks,
+    under `<root>/<chain_id>/<vault>/`. A range written again after a reorg
+    rollback (or a failed commit) is appended like any other record and supersedes
+    the earlier ones it overlaps when the archive is read back.
+    """
+    LOOKBACK_RECORDS = 1024  # Records held back while reading, so later rewrites can supersede them
+
+    def __init__(self, root: str, chain_id: int, vault_address: str, segment_blocks: int = 1_000_000):
+        self.chain_id = chain_id
+        self.path = os.path.join(root, str(chain_id), vault_address.lower())
+        self.segment_blocks = segment_blocks
+        self._segment: Optional[int] = None  # Segment files are only ever appended in increasing order
+
+    def _segments(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if name.endswith(".jsonl.gz"))
+
+    def append(self, from_block: int, to_block: int, logs: List[Dict], timestamps: Dict[int, int], boundary: Optional[Dict]):
+        if self._segment is None:
+            existing = self._segments()
+            self._segment = int(existing[-1].split(".")[0]) if existing else 0
+            if existing:
+                self._cut_torn_tail(os.path.join(self.path, existing[-1]))
+        self._segment = max(self._segment, from_block // self.segment_blocks)
+        record = {
+            "from_block": from_block,
+            "to_block": to_block,
+            "logs": logs,
+            "timestamps": {str(block_number): ts for block_number, ts in timestamps.items()},
+            "boundary": boundary,
+        }
+        os.makedirs(self.path, exist_ok=True)
+        # One gzip member per record: a crash can only truncate the last one
+        with gzip.open(os.path.join(self.path, f"{self._segment:010d}.jsonl.gz"), "at", compresslevel=6) as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _cut_torn_tail(self, segment_path: str):
+        """Truncate a record a crash left half written at the end of the segment, so appends follow the last whole one."""
+        with open(segment_path, "rb") as f:
+            data = f.read()
+        good_end = 0
+        for start, end, payload in _gzip_members(data):
+            if payload is not None:
+                good_end = end
+        if good_end < len(data):
+            print(f"[{self.chain_id}] Archive segment {segment_path} ends with {len(data) - good_end} bytes of a torn record, cutting them")
+            with open(segment_path, "r+b") as f:
+                f.truncate(good_end)
+
+    def _records(self) -> Iterator[Dict]:
+        for name in self._segments():
+            with open(os.path.join(self.path, name), "rb") as f:
+                data = f.read()
+            for start, end, payload in _gzip_members(data):
+                try:
+                    # Only whole members that pass their CRC are read
+                    records = [json.loads(line) for line in payload.decode().splitlines()] if payload is not None else None
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    records = None
+                if records is None:
+                    print(f"[{self.chain_id}] Archive segment {self.path}/{name} has a corrupt record at bytes {start}-{end}, skipping it")
+                    continue
+                yield from records
+
+    def read_ranges(self) -> Iterator[Dict]:
+        """
+        Archived ranges in block order, each as `{from_block, to_block, logs, timestamps, boundary}`
+        with integer timestamp keys. Records superseded by a later rewrite are dropped.
+        """
+        pending: List[Dict] = []
+        released_to = -1
+        for record in self._records():
+            if record["from_block"] <= released_to:
+                raise RuntimeError(
+                    f"Archive {self.path} rewrites block {record['from_block']} after more than {self.LOOKBACK_RECORDS} later ranges"
+                )
+            while pending and pending[-1]["from_block"] >= record["from_block"]:
+                pending.pop()
+            if pending and pending[-1]["to_block"] >= record["from_block"]:
+                self._truncate(pending[-1], record["from_block"] - 1)
+            pending.append(record)
+            if len(pending) > self.LOOKBACK_RECORDS:
+                released = pending.pop(0)
+                released_to = released["to_block"]
+                yield self._decode(released)
+        for record in pending:
+            yield self._decode(record)
+
+    @staticmethod
+    def _truncate(record: Dict, to_block: int):
+        record["to_block"] = to_block
+        record["logs"] = [log for log in record["logs"] if int(log["blockNumber"], 16) <= to_block]
+        record["timestamps"] = {b: ts for b, ts in record["timestamps"].items() if int(b) <= to_block}
+        record["boundary"] = None  # The hash of the new last block was not archived
+
+    @staticmethod
+    def _decode(record: Dict) -> Dict:
+        record["timestamps"] = {int(b): ts for b, ts in record["timestamps"].items()}
+        return record
+
+
+def make_log_archive(chain_id: int, vault_address: str) -> Optional[LogArchive]:
+    """Archive of `vault_address` under LOG_ARCHIVE_DIR, None when archiving is off."""
+    root = os.getenv("LOG_ARCHIVE_DIR")
+    if not root:
+        return None
+    return LogArchive(root, chain_id, vault_address, segment_blocks=int(os.getenv("LOG_ARCHIVE_SEGMENT_BLOCKS", "1000000")))
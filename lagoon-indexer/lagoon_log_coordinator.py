@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.range_controller import AdaptiveRangeController, is_range_limit_error
+
+
+class _LogSegment:
+    """Logs of a block range for a set of vault addresses, fetched by one eth_getLogs."""
+    __slots__ = ('from_block', 'to_block', 'addresses', 'logs', 'task')
+
+    def __init__(self, from_block: int, to_block: int, addresses: List[str]):
+        self.from_block = from_block
+        self.to_block = to_block
+        self.addresses = set(addresses)
+        self.logs: Dict[str, List[Dict]] = {}
+        self.task: Optional[asyncio.Task] = None
+
+
+class ChainLogCoordinator:
+    """
+    Chain-level eth_getLogs coordinator shared by every vault task of a chain.
+
+    When a vault needs logs for a range that is not already fetched (or being
+    fetched), one eth_getLogs is issued with the addresses of every active vault
+    whose checkpoint is near that range. The result is kept per emitter, so the
+    other vaults reaching the same blocks are served from memory, and concurrent
+    requests for the same blocks await the same call. Spans covered by a live log
+    subscription are published with `publish_streamed` and served the same way,
+    so only the gaps around a disconnect go back to eth_getLogs. Checkpoints stay
+    per vault: the coordinator only learns progress from `note_progress`, it never
+    writes it. The chain's range controller, when given, is fed by the calls the
+    coordinator issues, with their own window, latency and result count.
+    """
+    def __init__(self, chain_id: int, topics: List[bytes], max_addresses: int = 500, max_segments: int = 512,
+                 range_controller: Optional[AdaptiveRangeController] = None):
+        self.chain_id = chain_id
+        self.topics = topics
+        self.range_controller = range_controller
+        self.max_addresses = max_addresses
+        self.max_segments = max_segments
+        self.progress: Dict[str, Optional[int]] = {}  # Active vault address -> last processed block
+        self.segments: List[_LogSegment] = []
+        self.calls = 0
+        self.requests = 0
+        self.streamed_blocks = 0
+        self._streamed: Optional[_LogSegment] = None  # Last segment fed by the log subscription
+
+    def set_active(self, addresses: Iterable[str]):
+        active = {address.lower() for address in addresses}
+        self.progress = {address: self.progress.get(address) for address in active}
+        self._prune()
+
+    def note_progress(self, address: str, last_processed_block: int):
+        self.progress[address.lower()] = last_processed_block
+        self._prune()
+
+    async def get_logs(self, client, address: str, from_block: int, to_block: int, pin_to_block: bool = False) -> List[Dict]:
+        """
+        Raw logs of the tracked topics emitted by `address` in [from_block, to_block],
+        ordered by (blockNumber, logIndex). `client` is the caller's AsyncRpcClient,
+        used if a new fetch has to be issued, with `pin_to_block` (see AsyncRpcClient.get_logs).
+        """
+        address = address.lower()
+        self.requests += 1
+        covering = [
+            s for s in self.segments
+            if address in s.addresses and s.from_block <= to_block and s.to_block >= from_block
+        ]
+        gaps = self._gaps(covering, from_block, to_block)
+        if gaps:
+            # One call over the hull of what is missing
+            covering.append(self._start_fetch(client, address, gaps[0][0], gaps[-1][1], pin_to_block))
+
+        for segment in covering:
+            # Shielded: a cancelled vault task must not cancel a fetch other vaults await
+            await asyncio.shield(segment.task)
+
+        logs: Dict[Tuple[int, int], Dict] = {}
+        for segment in covering:
+            for log in segment.logs.get(address, ()):
+                block_number = int(log['blockNumber'], 16)
+                if from_block <= block_number <= to_block:
+                    logs[(block_number, int(log['logIndex'], 16))] = log
+        return [logs[key] for key in sorted(logs)]
+
+    def _start_fetch(self, client, address: str, from_block: int, to_block: int, pin_to_block: bool) -> _LogSegment:
+        span = to_block - from_block
+        # Vaults whose checkpoint is about to enter this range share the call
+        nearby = [
+            a for a, last in self.progress.items()
+            if a != address and last is not None and from_block - 1 - span <= last < to_block
+        ]
+        addresses = [address] + nearby[:self.max_addresses - 1]
+        segment = _LogSegment(from_block, to_block, addresses)
+
+        async def fetch():
+            self.calls += 1
+            start = time.monotonic()
+            try:
+                logs = await client.get_logs(from_block, to_block, addresses, self.topics, raw=True, pin_to_block=pin_to_block)
+            except Exception as e:
+                if self.range_controller and to_block > from_block and is_range_limit_error(e):
+                    self.range_controller.on_limit_error(span, e)
+                raise
+            if self.range_controller:
+                self.range_controller.on_success(span, time.monotonic() - start, len(logs))
+            for log in logs:
+                segment.logs.setdefault(log['address'].lower(), []).append(log)
+
+        def done(task: asyncio.Task):
+            # Failed fetches are dropped so the next request retries them
+            if task.cancelled() or task.exception() is not None:
+                if segment in self.segments:
+                    self.segments.remove(segment)
+
+        segment.task = asyncio.create_task(fetch())
+        segment.task.add_done_callback(done)
+        self.segments.append(segment)
+        if len(addresses) > 1:
+            print(f"[{self.chain_id}] Shared eth_getLogs {from_block}-{to_block} for {len(addresses)} vaults")
+        return segment
+
+    def publish_streamed(self, from_block: int, to_block: int, addresses: List[str], logs: List[Dict]):
+        """
+        Record raw logs received over a logs subscription for `addresses` that was up
+        for the whole of [from_block, to_block]. Contiguous spans extend one segment.
+        """
+        addresses = [address.lower() for address in addresses]
+        segment = self._streamed
+        if segment is None or segment not in self.segments or segment.to_block != from_block - 1 or segment.addresses != set(addresses):
+            segment = _LogSegment(from_block, to_block, addresses)
+            segment.task = asyncio.get_running_loop().create_future()
+            segment.task.set_result(None)
+            self.segments.append(segment)
+            self._streamed = segment
+        segment.to_block = to_block
+        for log in logs:
+            segment.logs.setdefault(log['address'].lower(), []).append(log)
+        self.streamed_blocks += to_block - from_block + 1
+
+    def evict_from(self, block_number: int):
+        """Drop every segment reaching `block_number` or later, after a reorg replaced those blocks."""
+        self.segments = [s for s in self.segments if s.to_block < block_number]
+        if self._streamed is not None and self._streamed not in self.segments:
+            self._streamed = None
+
+    @staticmethod
+    def _gaps(segments: List[_LogSegment], from_block: int, to_block: int) -> List[Tuple[int, int]]:
+        gaps = []
+        cursor = from_block
+        for segment in sorted(segments, key=lambda s: s.from_block):
+            if segment.from_block > cursor:
+                gaps.append((cursor, segment.from_block - 1))
+            cursor = max(cursor, segment.to_block + 1)
+            if cursor > to_block:
+                break
+        if cursor <= to_block:
+            gaps.append((cursor, to_block))
+        return gaps
+
+    def _prune(self):
+        """Drop fetched segments every active vault in them has already moved past."""
+        def still_needed(segment: _LogSegment) -> bool:
+            if not segment.task.done():
+                return True
+            return any(
+                address in self.progress and (self.progress[address] is None or self.progress[address] < segment.to_block)
+                for address in segment.addresses
+            )
+        self.segments = [s for s in self.segments if still_needed(s)]
+        while len(self.segments) > self.max_segments and self.segments[0].task.done():
+            self.segments.pop(0)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "segments": len(self.segments),
+            "requests": self.requests,
+            "get_logs_calls": self.calls,
+            "streamed_blocks": self.streamed_blocks,
+        }
+
+
+def make_chain_log_coordinator(chain_id: int, topics: List[bytes],
+                               range_controller: Optional[AdaptiveRangeController] = None) -> ChainLogCoordinator:
+    return ChainLogCoordinator(
+        chain_id,
+        topics,
+        max_addresses=int(os.getenv("LOGS_MAX_ADDRESSES", "500")),
+        max_segments=int(os.getenv("LOGS_MAX_SEGMENTS", "512")),
+        range_controller=range_controller,
+    )
@@ -0,0 +1,129 @@
+import os
+import asyncio
+import traceback
+from typing import Dict, List
+
+from core.blockchain import getEnvNode
+from core.head_tracker import ChainHeadTracker
+from lagoon_log_coordinator import ChainLogCoordinator
+
+
+def streaming_enabled() -> bool:
+    return os.getenv("LOG_STREAMING", "0").lower() in ("1", "true", "yes")
+
+
+class ChainLogStream:
+    """
+    Streaming mode for real-time tailing: `newHeads` and `logs` subscriptions for the
+    active vaults on one WebSocket, logs buffered per block.
+
+    Blocks are sealed on the heads of that same connection: once the node announces
+    block N, every block up to N - `seal_lag` has had its logs delivered, and those
+    blocks are handed to the coordinator as they were streamed. The head tracker is
+    then pointed at the last sealed block, so the vault loops wake up on it and read
+    the span from memory through the regular decoder and EventProcessor path, with
+    no eth_getLogs. The first head seen after (re)subscribing only opens the stream:
+    the blocks up to it are not published, and the coordinator fills them with
+    eth_getLogs when the vaults reach them, which is the reconciliation pass after a
+    disconnect. When the stream is down the vaults follow the chain head again.
+    """
+    def __init__(self, chain_id: int, topics: List[bytes], coordinator: ChainLogCoordinator, head_tracker: ChainHeadTracker,
+                 seal_lag: int = 1, retry: float = 10.0):
+        self.chain_id = chain_id
+        self.topics = topics
+        self.coordinator = coordinator
+        self.head_tracker = head_tracker
+        self.seal_lag = seal_lag
+        self.retry = retry
+        self.reconnects = 0
+        self.published_spans = 0
+        self.late_logs = 0  # Logs delivered after their block was sealed: seal_lag is too short for the node
+
+    async def run(self):
+        """Stream forever. Meant to run as a task owned by `launch_forever`."""
+        while True:
+            addresses = sorted(self.coordinator.progress)
+            if not addresses:
+                await asyncio.sleep(self.retry)
+                continue
+            try:
+                await self._stream(addresses)
+                continue  # Active vaults changed: resubscribe right away
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                print(f"[{self.chain_id}] Log subscription dropped ({e}), vaults fall back to eth_getLogs")
+                traceback.print_exc()
+            await asyncio.sleep(self.retry)
+
+    async def _stream(self, addresses: List[str]):
+        blockchain = getEnvNode(self.chain_id)
+        subscribed = False
+        published = None  # Last block handed to the coordinator
+        buffered: Dict[int, List[Dict]] = {}
+
+        def on_subscribed(_):
+            nonlocal subscribed
+            subscribed = True
+
+        try:
+            async for kind, item in blockchain.subscribe_heads_and_logs(addresses, self.topics, on_subscribed=on_subscribed):
+                if kind == "logs":
+                    self._buffer(item, published, buffered)
+                    continue
+                if not subscribed:
+                    continue
+                head = int(item['number'], 16)
+                if published is None:
+                    # Logs of this block and older ones may predate the logs subscription
+                    published = head
+                    buffered = {b: logs for b, logs in buffered.items() if b > published}
+                    print(f"[{self.chain_id}] Streaming logs of {len(addresses)} vaults from block {published + 1}")
+                    continue
+                sealed = head - self.seal_lag
+                if sealed <= published:
+                    continue
+                logs = [log for block_number in sorted(b for b in buffered if b <= sealed) for log in buffered.pop(block_number)]
+                self.coordinator.publish_streamed(published + 1, sealed, addresses, logs)
+                self.published_spans += 1
+                published = sealed
+                await self.head_tracker.follow_stream(sealed)
+                if sorted(self.coordinator.progress) != addresses:
+                    print(f"[{self.chain_id}] Active vaults changed, resubscribing logs")
+                    return
+        finally:
+            await self.head_tracker.follow_stream(None)
+
+    def _buffer(self, log: Dict, published, buffered: Dict[int, List[Dict]]):
+        block_number = int(log['blockNumber'], 16)
+        if published is not None and block_number <= published:
+            # Already published: drop the streamed copy of this block and later, the vaults refetch them
+            self.coordinator.evict_from(block_number)
+            if not log.get('removed'):
+                self.late_logs += 1
+                raise RuntimeError(f"Log of block {block_number} arrived after the block was sealed (seal_lag={self.seal_lag})")
+            return
+        if log.get('removed'):
+            # Reorged out before we published it
+            buffered[block_number] = [
+                l for l in buffered.get(block_number, [])
+                if (l['blockHash'], l['logIndex']) != (log['blockHash'], log['logIndex'])
+            ]
+            return
+        buffered.setdefault(block_number, []).append(log)
+
+    def stats(self):
+        return {"reconnects": self.reconnects, "published_spans": self.published_spans, "late_logs": self.late_logs}
+
+
+def make_chain_log_stream(chain_id: int, topics: List[bytes], coordinator: ChainLogCoordinator,
+                          head_tracker: ChainHeadTracker) -> ChainLogStream:
+    return ChainLogStream(
+        chain_id,
+        topics,
+        coordinator,
+        head_tracker,
+        seal_lag=int(os.getenv("LOG_STREAM_SEAL_LAG", "1")),
+        retry=float(os.getenv("LOG_STREAM_RETRY", "10")),
+    )
@@ -0,0 +1,140 @@
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.db import Database
+from db.query.lagoon_events import LagoonEvents
+from db.query.lagoon_ev_helpers import LagoonEventsHelpers
+from db.utils.lagoon_db_date_utils import LagoonDbDateUtils
+
+REQUEST_TABLES = {'deposit': 'deposit_requests', 'redeem': 'redeem_requests'}
+
+
+class RequestLifecycleChanges:
+    """
+    Requests a range moved to a new state. Their wallets and transaction hashes
+    are only queried when asked for.
+    """
+    def __init__(self, db: Database, changed: Dict[str, List[Dict]]):
+        self.db = db
+        self.changed = changed  # table name -> updated rows
+        self._wallets_and_tx_hashes = None
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.changed.values())
+
+    def wallets_and_tx_hashes(self) -> Tuple[List[str], List[str]]:
+        if self._wallets_and_tx_hashes is None:
+            rows = [row for rows in self.changed.values() for row in rows]
+            self._wallets_and_tx_hashes = LagoonEventsHelpers.fetch_wallets_and_tx_hashes(
+                self.db,
+                list({str(row['user_id']) for row in rows}),
+                [str(row['event_id']) for row in rows],
+            )
+        return self._wallets_and_tx_hashes
+
+
+class RequestLifecycle:
+    """
+    Deposit / redeem request transitions of one range (settlements, completions,
+    cancels, referrals), recorded in chain order and applied together by `apply`:
+    one SELECT of the requests they may touch and one UPDATE ... FROM (VALUES ...)
+    per table, instead of an UPDATE per event.
+
+    A transition only sees requests created before it (by block and log index),
+    with the same conditions the per-event updates had, so the rows end up exactly
+    as if every event had been applied on its own in order.
+    """
+    def __init__(self, db: Database, vault_id: str):
+        self.db = db
+        self.vault_id = vault_id
+        self.transitions: Dict[str, List[Dict]] = {table: [] for table in REQUEST_TABLES.values()}
+
+    def _record(self, table_name: str, kind: str, event_data: Dict, **fields):
+        self.transitions[table_name].append({
+            'kind': kind,
+            'position': (int(event_data['block_number']), int(event_data['log_index'])),
+            'timestamp': LagoonDbDateUtils.get_datetime_from_str(event_data['event_timestamp']),
+            **fields,
+        })
+
+    def settle(self, settlement_type: str, event_data: Dict):
+        """Pending requests up to the settlement's timestamp become settled."""
+        self._record(REQUEST_TABLES[settlement_type], 'settle', event_data)
+
+    def complete(self, request_type: str, user_id: str, event_data: Dict):
+        """The user's settled requests (settled up to the event's timestamp) become completed."""
+        self._record(REQUEST_TABLES[request_type], 'complete', event_data, user_id=str(user_id))
+
+    def cancel_deposit(self, request_id: int, event_data: Dict):
+        """Deposit requests with `request_id` updated up to the event's timestamp become canceled."""
+        self._record('deposit_requests', 'cancel', event_data, request_id=int(request_id))
+
+    def refer(self, user_id: str, referral_address: str, event_data: Dict):
+        """The user's deposit requests get `referral_address`."""
+        self._record('deposit_requests', 'refer', event_data, user_id=str(user_id), referral_address=referral_address)
+
+    def apply(self) -> RequestLifecycleChanges:
+        """Apply and clear the recorded transitions."""
+        changed = {}
+        for table_name, transitions in self.transitions.items():
+            if not transitions:
+                continue
+            transitions.sort(key=lambda t: t['position'])
+            rows = LagoonEvents.get_request_lifecycle_rows(
+                self.db,
+                table_name,
+                self.vault_id,
+                sorted({t['request_id'] for t in transitions if t['kind'] == 'cancel'}),
+                sorted({t['user_id'] for t in transitions if t['kind'] == 'refer'}),
+            )
+            updated = self._replay(rows, transitions)
+            LagoonEvents.update_request_lifecycle(self.db, table_name, updated)
+            changed[table_name] = updated
+            print(f"Applied {len(transitions)} {table_name} transitions, {len(updated)} requests updated.")
+        self.transitions = {table: [] for table in REQUEST_TABLES.values()}
+        return RequestLifecycleChanges(self.db, changed)
+
+    @staticmethod
+    def _replay(rows: List[Dict], transitions: List[Dict]) -> List[Dict]:
+        """Run `transitions` over `rows` in order; return the rows that changed, in creation order."""
+        original = {}
+        for row in rows:
+            row['event_id'] = str(row['event_id'])
+            row['user_id'] = str(row['user_id'])
+            row['position'] = (int(row['block_number']), int(row['log_index']))
+            original[row['event_id']] = (row['status'], row['updated_at'], row['settled_at'], row['referral_address'])
+        by_user: Dict[str, List[Dict]] = {}
+        by_request: Dict[Optional[int], List[Dict]] = {}
+        for row in rows:
+            by_user.setdefault(row['user_id'], []).append(row)
+            by_request.setdefault(row['request_id'], []).append(row)
+
+        for transition in transitions:
+            position, ts = transition['position'], transition['timestamp']
+            kind = transition['kind']
+            if kind == 'settle':
+                for row in rows:
+                    if (row['position'] < position and row['status'] == 'pending'
+                            and row['updated_at'] is not None and row['updated_at'] <= ts):
+                        row['status'], row['updated_at'], row['settled_at'] = 'settled', ts, ts
+            elif kind == 'complete':
+                for row in by_user.get(transition['user_id'], []):
+                    if (row['position'] < position and row['status'] == 'settled'
+                            and row['settled_at'] is not None and row['settled_at'] <= ts):
+                        row['status'], row['updated_at'] = 'completed', ts
+            elif kind == 'cancel':
+                for row in by_request.get(transition['request_id'], []):
+                    if row['position'] < position and row['updated_at'] is not None and row['updated_at'] <= ts:
+                        row['status'], row['updated_at'] = 'canceled', ts
+            elif kind == 'refer':
+                for row in by_user.get(transition['user_id'], []):
+                    if row['position'] < position:
+                        row['referral_address'] = transition['referral_address']
+
+        return [
+            row for row in rows
+            if (row['status'], row['updated_at'], row['settled_at'], row['referral_address']) != original[row['event_id']]
+        ]
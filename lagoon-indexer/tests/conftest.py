@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The indexer's modules import from its root, and the ABIs in `constants` are shared with
+# the API: damm-world-api/app/constants in the repo, /app/constants in the container
+INDEXER_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_APP = os.path.join(os.path.dirname(INDEXER_ROOT), "damm-world-api", "app")
+
+for path in (INDEXER_ROOT, API_APP):
+    if os.path.isdir(path) and path not in sys.path:
+        sys.path.insert(0, path)
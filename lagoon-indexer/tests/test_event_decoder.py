@@ -0,0 +1,160 @@
+"""
+Parity of LagoonEventDecoder (decode_raw fast path and decode) with web3's
+process_log, for every tracked Lagoon event, on edge and random values.
+"""
+import random
+from typing import Any, Dict, List
+
+import pytest
+from eth_abi import encode
+from web3 import Web3
+from web3._utils.method_formatters import log_entry_formatter
+from constants.abi.lagoon import LAGOON_ABI
+from lagoon_event_decoder import TRACKED_EVENTS, get_lagoon_event_decoder, _abi_type
+
+VAULT = "0x" + "42" * 20
+EVENT_ABIS = {entry["name"]: entry for entry in LAGOON_ABI if entry.get("type") == "event"}
+
+
+def _edge_values(abi_type: str) -> List[Any]:
+    if abi_type == "address":
+        return ["0x" + "00" * 20, "0x" + "ff" * 20, "0x" + "0123456789abcdef0123" * 2]
+    if abi_type.startswith("uint"):
+        bits = int(abi_type[4:] or 256)
+        return [0, 1, 2 ** bits - 1, 2 ** (bits - 1)]
+    if abi_type == "bool":
+        return [False, True]
+    if abi_type.startswith("("):
+        members = [_edge_values(t) for t in abi_type[1:-1].split(",")]
+        return [tuple(values[n % len(values)] for values in members) for n in range(max(map(len, members)))]
+    raise ValueError(f"Unsupported type in tests: {abi_type}")
+
+
+def _random_value(rng: random.Random, abi_type: str) -> Any:
+    if abi_type == "address":
+        return "0x" + rng.getrandbits(160).to_bytes(20, "big").hex()
+    if abi_type.startswith("uint"):
+        return rng.getrandbits(int(abi_type[4:] or 256))
+    if abi_type == "bool":
+        return rng.random() < 0.5
+    if abi_type.startswith("("):
+        return tuple(_random_value(rng, t) for t in abi_type[1:-1].split(","))
+    raise ValueError(f"Unsupported type in tests: {abi_type}")
+
+
+def _raw_log(event_name: str, values: Dict[str, Any], block_number: int = 1_000_000, log_index: int = 3) -> Dict:
+    event_abi = EVENT_ABIS[event_name]
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    topic0 = next(topic for topic, (name, _) in decoder.decoders.items() if name == event_name)
+    topics = ["0x" + topic0.hex()]
+    for i in event_abi["inputs"]:
+        if i["indexed"]:
+            topics.append("0x" + encode([_abi_type(i)], [values[i["name"]]]).hex())
+    not_indexed = [i for i in event_abi["inputs"] if not i["indexed"]]
+    data = encode([_abi_type(i) for i in not_indexed], [values[i["name"]] for i in not_indexed])
+    return {
+        "address": Web3.to_checksum_address(VAULT),
+        "topics": topics,
+        "data": "0x" + data.hex(),
+        "blockNumber": hex(block_number),
+        "blockHash": "0x" + "ab" * 32,
+        "logIndex": hex(log_index),
+        "transactionIndex": "0x7",
+        "transactionHash": "0x" + "cd" * 32,
+        "removed": False,
+    }
+
+
+def _cases(event_name: str) -> List[Dict[str, Any]]:
+    inputs = EVENT_ABIS[event_name]["inputs"]
+    edges = {i["name"]: _edge_values(_abi_type(i)) for i in inputs}
+    cases = [
+        {name: values[n % len(values)] for name, values in edges.items()}
+        for n in range(max((len(v) for v in edges.values()), default=1))
+    ]
+    rng = random.Random(event_name)
+    cases += [{i["name"]: _random_value(rng, _abi_type(i)) for i in inputs} for _ in range(20)]
+    return cases
+
+
+def _plain(value: Any) -> Any:
+    """web3's AttributeDicts (event args, structs) as plain dicts, compared exactly."""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def _lowercase_addresses(abi_input: Dict, value: Any) -> Any:
+    """`value` as decode_raw returns it: addresses lowercase, structs as dicts, the rest untouched."""
+    if abi_input["type"] == "address":
+        return value.lower()
+    if abi_input["type"] == "tuple":
+        return {c["name"]: _lowercase_addresses(c, value[c["name"]]) for c in abi_input["components"]}
+    return value
+
+
+def _fast_args(event_name: str, web3_args: Dict) -> Dict:
+    return {i["name"]: _lowercase_addresses(i, web3_args[i["name"]]) for i in EVENT_ABIS[event_name]["inputs"]}
+
+
+@pytest.fixture(scope="module")
+def web3_events():
+    return Web3().eth.contract(address=Web3.to_checksum_address(VAULT), abi=LAGOON_ABI).events
+
+
+@pytest.mark.parametrize("event_name", TRACKED_EVENTS)
+def test_decode_raw_matches_web3(event_name, web3_events):
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    for values in _cases(event_name):
+        raw = _raw_log(event_name, values)
+        reference = web3_events[event_name]().process_log(log_entry_formatter(raw))
+        fast = decoder.decode_raw(raw)
+
+        assert fast.event_name == event_name
+        assert fast.args == _fast_args(event_name, reference["args"])
+        assert fast.address == reference["address"].lower()
+        assert fast.blockNumber == reference["blockNumber"]
+        assert fast.blockHash == reference["blockHash"]
+        assert fast.logIndex == reference["logIndex"]
+        assert fast.transactionIndex == reference["transactionIndex"]
+        assert fast.transactionHash == reference["transactionHash"]
+
+
+@pytest.mark.parametrize("event_name", TRACKED_EVENTS)
+def test_decode_matches_web3(event_name, web3_events):
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    for values in _cases(event_name):
+        formatted = log_entry_formatter(_raw_log(event_name, values))
+        reference = web3_events[event_name]().process_log(formatted)
+        event = decoder.decode(formatted)
+
+        assert event["event_name"] == event_name
+        assert _plain(event["args"]) == _plain(reference["args"])
+        assert event["address"] == reference["address"]
+        assert event["blockNumber"] == reference["blockNumber"]
+        assert event["logIndex"] == reference["logIndex"]
+
+
+def test_untracked_topic_is_skipped():
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    raw = _raw_log("Paused", _cases("Paused")[0])
+    raw["topics"] = ["0x" + "00" * 32]
+    assert decoder.decode_raw(raw) is None
+    assert decoder.decode(log_entry_formatter(raw)) is None
+    assert decoder.decode_raw(dict(raw, topics=[])) is None
+
+
+def test_topic_count_mismatch_raises():
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    event_name = next(name for name in TRACKED_EVENTS if any(i["indexed"] for i in EVENT_ABIS[name]["inputs"]))
+    raw = _raw_log(event_name, _cases(event_name)[0])
+    raw["topics"] = raw["topics"][:-1]
+    with pytest.raises(ValueError):
+        decoder.decode_raw(raw)
+
+
+def test_uppercase_topic0_is_decoded():
+    decoder = get_lagoon_event_decoder(TRACKED_EVENTS)
+    raw = _raw_log("Transfer", _cases("Transfer")[0])
+    raw["topics"] = ["0x" + raw["topics"][0][2:].upper()] + raw["topics"][1:]
+    assert decoder.decode_raw(raw).event_name == "Transfer"
@@ -0,0 +1,145 @@
+"""
+ChainLogStream against a stub WebSocket node: blocks are sealed on the heads of the
+subscription's own connection and served to the vaults from the streamed logs.
+"""
+import asyncio
+import json
+from typing import Dict, List
+
+import pytest
+from aiohttp import web
+
+import lagoon_log_stream
+from core.blockchain import Blockchain
+from core.head_tracker import ChainHeadTracker
+from lagoon_log_coordinator import ChainLogCoordinator
+from lagoon_log_stream import ChainLogStream
+
+CHAIN_ID = 31337
+VAULT = "0x" + "42" * 20
+TOPIC = b"\x01" * 32
+
+
+def _head(number: int) -> Dict:
+    return {"number": hex(number), "hash": "0x" + f"{number:064x}"}
+
+
+def _log(number: int, log_index: int = 0, removed: bool = False) -> Dict:
+    return {
+        "address": VAULT,
+        "topics": ["0x" + TOPIC.hex()],
+        "data": "0x",
+        "blockNumber": hex(number),
+        "blockHash": "0x" + f"{number:064x}",
+        "logIndex": hex(log_index),
+        "transactionIndex": "0x0",
+        "transactionHash": "0x" + "cd" * 32,
+        "removed": removed,
+    }
+
+
+async def _stub_node(script: List[tuple]):
+    """WebSocket node acknowledging newHeads / logs subscriptions, then sending `script` and closing."""
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        subscriptions = {}
+        while len(subscriptions) < 2:
+            message = json.loads((await ws.receive()).data)
+            kind = message["params"][0]
+            subscriptions[kind] = f"0x{kind}"
+            await ws.send_json({"jsonrpc": "2.0", "id": message["id"], "result": subscriptions[kind]})
+        for kind, result in script:
+            await ws.send_json({
+                "jsonrpc": "2.0",
+                "method": "eth_subscription",
+                "params": {"subscription": subscriptions[kind], "result": result},
+            })
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"ws://127.0.0.1:{port}/"
+
+
+class _RecordingTracker(ChainHeadTracker):
+    def __init__(self):
+        super().__init__(CHAIN_ID)
+        self.followed = []
+
+    async def follow_stream(self, stream_head):
+        self.followed.append(stream_head)
+        await super().follow_stream(stream_head)
+
+
+async def _run_stream(monkeypatch, script: List[tuple], seal_lag: int = 1):
+    runner, ws_url = await _stub_node(script)
+    node = Blockchain("http://127.0.0.1:9", CHAIN_ID)
+    node.ws_url = ws_url
+    monkeypatch.setattr(lagoon_log_stream, "getEnvNode", lambda chain_id: node)
+
+    coordinator = ChainLogCoordinator(CHAIN_ID, [TOPIC])
+    coordinator.set_active([VAULT])
+    tracker = _RecordingTracker()
+    stream = ChainLogStream(CHAIN_ID, [TOPIC], coordinator, tracker, seal_lag=seal_lag)
+    try:
+        with pytest.raises(Exception) as raised:
+            await stream._stream(sorted(coordinator.progress))
+    finally:
+        await runner.cleanup()
+    return stream, coordinator, tracker, raised.value
+
+
+def test_sealed_blocks_are_served_from_the_stream(monkeypatch):
+    async def scenario():
+        script = [
+            ("logs", _log(100)),  # Before the first head: may be incomplete, never published
+            ("newHeads", _head(100)),
+            ("logs", _log(101)),
+            ("newHeads", _head(101)),
+            ("logs", _log(102, 0)),
+            ("logs", _log(102, 1)),
+            ("logs", _log(102, 1, removed=True)),  # Reorged out before its block was sealed
+            ("newHeads", _head(102)),
+            ("logs", _log(103)),
+            ("newHeads", _head(103)),
+        ]
+        stream, coordinator, tracker, error = await _run_stream(monkeypatch, script)
+        assert isinstance(error, ConnectionError)
+        assert tracker.followed == [101, 102, None]
+        assert tracker.stream_head is None
+        assert stream.published_spans == 2
+
+        # No client: the span must come from the streamed segment, not from eth_getLogs
+        logs = await coordinator.get_logs(None, VAULT, 101, 102)
+        assert [(int(l["blockNumber"], 16), int(l["logIndex"], 16)) for l in logs] == [(101, 0), (102, 0)]
+        assert coordinator.stats()["get_logs_calls"] == 0
+        # Block 100 opened the stream and 103 was never sealed: the vaults fetch them
+        assert coordinator._gaps(coordinator.segments, 100, 103) == [(100, 100), (103, 103)]
+
+    asyncio.run(scenario())
+
+
+def test_late_log_drops_the_stream_and_its_blocks(monkeypatch):
+    async def scenario():
+        script = [
+            ("newHeads", _head(100)),
+            ("logs", _log(101)),
+            ("newHeads", _head(102)),
+            ("logs", _log(101, 1)),  # Delivered after block 101 was sealed
+            ("newHeads", _head(103)),
+        ]
+        stream, coordinator, tracker, error = await _run_stream(monkeypatch, script)
+        assert isinstance(error, RuntimeError)
+        assert stream.late_logs == 1
+        assert tracker.followed == [101, None]
+        # The streamed copy of block 101 is gone, so the vaults refetch it with eth_getLogs
+        assert coordinator._gaps(coordinator.segments, 101, 101) == [(101, 101)]
+
+    asyncio.run(scenario())
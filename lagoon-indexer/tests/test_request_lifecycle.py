@@ -0,0 +1,99 @@
+"""
+RequestLifecycle._replay: transitions of one range applied in chain order, each one
+only seeing the requests created before it.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from lagoon_request_lifecycle import RequestLifecycle
+
+T0 = datetime(2025, 1, 1, 12, 0, 0)
+USER = "00000000-0000-0000-0000-000000000001"
+OTHER_USER = "00000000-0000-0000-0000-000000000002"
+REFERRER = "0x" + "ab" * 20
+OTHER_REFERRER = "0x" + "cd" * 20
+
+
+def _at(seconds: int) -> datetime:
+    return T0 + timedelta(seconds=seconds)
+
+
+def _row(event_id: str, block_number: int, log_index: int, updated_at: datetime, user_id: str = USER,
+         status: str = "pending", request_id: Optional[int] = None) -> Dict:
+    return {
+        "event_id": event_id,
+        "user_id": user_id,
+        "block_number": block_number,
+        "log_index": log_index,
+        "status": status,
+        "updated_at": updated_at,
+        "settled_at": None,
+        "referral_address": None,
+        "request_id": request_id,
+    }
+
+
+def _transition(kind: str, block_number: int, log_index: int, timestamp: datetime, **fields) -> Dict:
+    return {"kind": kind, "position": (block_number, log_index), "timestamp": timestamp, **fields}
+
+
+def _by_id(rows):
+    return {row["event_id"]: row for row in rows}
+
+
+def test_settle_then_complete_in_one_range():
+    rows = [
+        _row("a", 10, 0, _at(0)),
+        _row("b", 10, 1, _at(0), user_id=OTHER_USER),
+        _row("c", 13, 0, _at(30)),  # Created after the settlement
+    ]
+    transitions = [
+        _transition("settle", 12, 0, _at(20)),
+        _transition("complete", 12, 3, _at(20), user_id=USER),
+    ]
+    updated = _by_id(RequestLifecycle._replay(rows, transitions))
+
+    assert sorted(updated) == ["a", "b"]
+    assert (updated["a"]["status"], updated["a"]["updated_at"], updated["a"]["settled_at"]) == ("completed", _at(20), _at(20))
+    assert (updated["b"]["status"], updated["b"]["updated_at"], updated["b"]["settled_at"]) == ("settled", _at(20), _at(20))
+    assert rows[2]["status"] == "pending"
+
+
+def test_cancel_after_settle():
+    rows = [_row("a", 10, 0, _at(0), request_id=7), _row("b", 10, 1, _at(0), request_id=8)]
+    transitions = [
+        _transition("settle", 11, 0, _at(10)),
+        _transition("cancel", 12, 0, _at(20), request_id=7),
+    ]
+    updated = _by_id(RequestLifecycle._replay(rows, transitions))
+
+    assert (updated["a"]["status"], updated["a"]["updated_at"], updated["a"]["settled_at"]) == ("canceled", _at(20), _at(10))
+    assert (updated["b"]["status"], updated["b"]["updated_at"], updated["b"]["settled_at"]) == ("settled", _at(10), _at(10))
+
+
+def test_referral_only_reaches_earlier_requests():
+    transitions = [
+        _transition("refer", 9, 0, _at(0), user_id=USER, referral_address=OTHER_REFERRER),
+        _transition("refer", 11, 0, _at(20), user_id=USER, referral_address=REFERRER),
+    ]
+    rows = [_row("a", 10, 0, _at(10)), _row("b", 12, 0, _at(30))]
+    updated = RequestLifecycle._replay(rows, transitions)
+
+    # The referral before the request does not reach it, the one after it does
+    assert [(row["event_id"], row["referral_address"]) for row in updated] == [("a", REFERRER)]
+    assert rows[1]["referral_address"] is None
+
+    # A referral emitted only before the request changes nothing
+    assert RequestLifecycle._replay([_row("a", 10, 0, _at(10))], transitions[:1]) == []
+
+
+def test_request_created_after_settlement_in_same_block():
+    rows = [
+        _row("before", 20, 0, _at(0)),
+        _row("after", 20, 2, _at(0)),  # Same block and timestamp as the settlement, later log
+    ]
+    updated = _by_id(RequestLifecycle._replay(rows, [_transition("settle", 20, 1, _at(0))]))
+
+    assert sorted(updated) == ["before"]
+    assert updated["before"]["status"] == "settled"
+    assert rows[1]["status"] == "pending"
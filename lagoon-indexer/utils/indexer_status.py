@@ -1,6 +1,6 @@
 import os
 
-headroom = int(os.getenv("INDEXER_HEADROOM", "4"))
+headroom = int(os.getenv("INDEXER_HEADROOM", "0"))  # Reorgs are undone (see REORG_DEPTH), so the head itself can be indexed
 
 def is_up_to_date(last_processed_block: int, current_block: int):
     return last_processed_block + headroom >= current_block
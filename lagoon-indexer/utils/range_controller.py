@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+# Error fragments providers use when an eth_getLogs window is too wide or too dense
+RANGE_LIMIT_ERRORS = (
+    "too many results",
+    "query returned more than",
+    "range too large",
+    "block range is too large",
+    "block range too large",
+    "exceed maximum block range",
+    "exceeds the range allowed",
+    "range exceeds",
+    "log response size exceeded",
+    "response size exceeded",
+    "query timeout exceeded",
+    "max results",
+)
+
+# e.g. Alchemy: "... this block range should work: [0x1d4c0, 0x1d8a7]"
+SUGGESTED_RANGE = re.compile(r"\[(0x[0-9a-fA-F]+),\s*(0x[0-9a-fA-F]+)\]")
+
+
+def is_range_limit_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(fragment in message for fragment in RANGE_LIMIT_ERRORS)
+
+
+class AdaptiveRangeController:
+    """
+    Learns the eth_getLogs window (to_block - from_block) a chain's RPC endpoints
+    can serve. Requests are spread over the endpoint pool, so the window converges
+    on what the strictest of them accepts. Grows quickly while responses are fast and sparse, backs off on slow
+    responses, dense ranges or explicit provider range errors, and remembers
+    the widest window that failed so it does not keep probing past it.
+    """
+    def __init__(self, chain_id: int, initial_range: int, min_range: int = 1, max_range: int = 100_000,
+                 target_latency: float = 3.0, max_results: int = 5_000):
+        self.chain_id = chain_id
+        self.min_range = min_range
+        self.max_range = max(max_range, min_range)
+        self.target_latency = target_latency
+        self.max_results = max_results
+        self.range = min(max(initial_range, min_range), self.max_range)
+        self.ceiling: Optional[int] = None  # Smallest window the provider rejected
+        self._successes_at_ceiling = 0
+        self._lock = threading.Lock()
+
+    def next_range(self, block_gap: int) -> int:
+        with self._lock:
+            return max(0, min(self.range, block_gap))
+
+    def on_success(self, block_range: int, elapsed: float, results: int):
+        with self._lock:
+            if elapsed > self.target_latency or results > self.max_results:
+                # Scale down towards the target, at most halving per step
+                factor = max(0.5, min(self.target_latency / max(elapsed, 1e-6), self.max_results / max(results, 1)))
+                self.range = max(self.min_range, min(self.range, int(block_range * factor)))
+                return
+            if block_range < self.range:
+                return  # A split sub-range; says nothing about the full window
+            sparse = elapsed < self.target_latency / 2 and results < self.max_results / 2
+            grown = self.range * 2 if sparse and self.ceiling is None else int(self.range * 1.25) + 1
+            if self.ceiling is not None:
+                # Creep back up, retrying the failed width only after a streak of clean windows
+                self._successes_at_ceiling += 1
+                if self._successes_at_ceiling < 20:
+                    grown = min(grown, self.ceiling - 1)
+                else:
+                    self.ceiling = None
+                    self._successes_at_ceiling = 0
+            self.range = max(self.min_range, min(grown, self.max_range))
+
+    def on_limit_error(self, block_range: int, error: Exception) -> int:
+        """
+        Shrink after a provider range/size error. Returns the window to retry with,
+        using the provider's suggested range when the error carries one.
+        """
+        with self._lock:
+            suggested = SUGGESTED_RANGE.search(str(error))
+            if suggested:
+                new_range = int(suggested.group(2), 16) - int(suggested.group(1), 16)
+            else:
+                new_range = block_range // 2
+            new_range = max(self.min_range, min(new_range, block_range - 1))
+            self.ceiling = block_range if self.ceiling is None else min(self.ceiling, block_range)
+            self._successes_at_ceiling = 0
+            self.range = min(self.range, new_range)
+            print(f"[{self.chain_id}] Range {block_range} rejected by provider, shrinking window to {self.range}")
+            return new_range
+
+    def stats(self) -> Dict:
+        return {"range": self.range, "ceiling": self.ceiling}
+
+
+_controllers: Dict[int, AdaptiveRangeController] = {}
+_controllers_lock = threading.Lock()
+
+def get_range_controller(chain_id: int, initial_range: int) -> AdaptiveRangeController:
+    """
+    Return the process-wide controller for `chain_id`. Shared by every vault task
+    of the chain and kept across fetcher loops and node refreshes.
+    """
+    with _controllers_lock:
+        if chain_id not in _controllers:
+            _controllers[chain_id] = AdaptiveRangeController(
+                chain_id,
+                initial_range,
+                min_range=int(os.getenv("MIN_FETCH_RANGE", "1")),
+                max_range=int(os.getenv("MAX_FETCH_RANGE", "100000")),
+                target_latency=float(os.getenv("FETCH_TARGET_LATENCY", "3.0")),
+                max_results=int(os.getenv("FETCH_MAX_RESULTS", "5000")),
+            )
+        return _controllers[chain_id]
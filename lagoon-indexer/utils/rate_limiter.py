@@ -0,0 +1,266 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Lower runs first: following the chain head beats historical backfill
+PRIORITY_TAIL = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKFILL = 2
+
+_rpc_priority: contextvars.ContextVar = contextvars.ContextVar("rpc_priority", default=PRIORITY_DEFAULT)
+
+
+@contextmanager
+def rpc_priority(priority: int):
+    """Run RPC calls made in this context (and tasks created from it) at `priority`."""
+    token = _rpc_priority.set(priority)
+    try:
+        yield
+    finally:
+        _rpc_priority.reset(token)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to our own backoff
+
+
+class RpcSlot:
+    """A granted request slot. Call `throttled` if the provider answered 429 or equivalent."""
+    __slots__ = ('is_throttled', 'retry_after')
+
+    def __init__(self):
+        self.is_throttled = False
+        self.retry_after = None
+
+    def throttled(self, retry_after: Optional[float] = None):
+        self.is_throttled = True
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued acquire, woken when it may be its turn: from any thread, on its own thread or event loop."""
+    __slots__ = ('ticket', '_event', '_loop')
+
+    def __init__(self, ticket: Tuple[int, int], loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.ticket = ticket
+        self._loop = loop
+        self._event = asyncio.Event() if loop else threading.Event()
+
+    def clear(self):
+        self._event.clear()
+
+    def wake(self):
+        if self._loop is None:
+            self._event.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # Its loop is closed: nobody waits on it anymore
+
+    def wait(self, timeout: Optional[float]):
+        self._event.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class EndpointScheduler:
+    """
+    Token bucket plus concurrency cap for one RPC endpoint/key, shared by the
+    threads and event loops of the process.
+
+    Waiters are served strictly by (priority, arrival). Only the first one in line
+    checks the bucket, sleeping until its tokens are due; the others sleep until a
+    grant, release or cancellation puts them first. A 429 pauses the bucket for
+    Retry-After (or an exponential backoff) and cuts the rate; clean answers slowly
+    restore it, so throughput settles just under the provider quota.
+    """
+    def __init__(self, label: str, rate: float, burst: float, max_concurrency: int):
+        self.label = label
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.tokens = burst
+        self.inflight = 0
+        self.blocked_until = 0.0
+        self.throttle_streak = 0
+        self.throttled = 0
+        self.granted = 0
+        self._refilled_at = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._waiting: Dict[Tuple[int, int], _Waiter] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _wake_first(self):
+        """Wake the waiter first in line. Called with the lock held."""
+        if self._waiters:
+            self._waiting[self._waiters[0]].wake()
+
+    def _try_take(self, waiter: _Waiter, cost: float) -> Optional[float]:
+        """
+        Take a slot for `waiter` if it is its turn. Returns 0 on success, else seconds
+        to wait, or None to wait until woken.
+        """
+        with self._lock:
+            waiter.clear()
+            if self._waiters[0] != waiter.ticket:
+                return None
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.inflight >= self.max_concurrency:
+                return None
+            # A request costing more than the bucket holds goes once the bucket is full
+            needed = min(cost, self.burst)
+            if self.tokens < needed:
+                return (needed - self.tokens) / self.rate
+            self.tokens -= cost
+            self.inflight += 1
+            self.granted += 1
+            heapq.heappop(self._waiters)
+            del self._waiting[waiter.ticket]
+            self._wake_first()
+            return 0.0
+
+    def _enqueue(self, priority: Optional[int], loop: Optional[asyncio.AbstractEventLoop] = None) -> _Waiter:
+        waiter = _Waiter((_rpc_priority.get() if priority is None else priority, next(self._seq)), loop)
+        with self._lock:
+            heapq.heappush(self._waiters, waiter.ticket)
+            self._waiting[waiter.ticket] = waiter
+        return waiter
+
+    def _abandon(self, waiter: _Waiter):
+        with self._lock:
+            if waiter.ticket in self._waiting:
+                self._waiters.remove(waiter.ticket)
+                heapq.heapify(self._waiters)
+                del self._waiting[waiter.ticket]
+                self._wake_first()
+
+    def acquire(self, priority: Optional[int] = None, cost: float = 1) -> RpcSlot:
+        """
+        Blocking acquire for sync callers. Never call it on a thread running an event
+        loop: it may wait behind that loop's own async waiters or in-flight requests,
+        which cannot make progress while the thread sleeps. Use asyncio.to_thread.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(f"Sync RPC on {self.label} from an event loop thread, run it with asyncio.to_thread")
+        waiter = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try_take(waiter, cost)
+                if wait == 0.0:
+                    return RpcSlot()
+                waiter.wait(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def acquire_async(self, priority: Optional[int] = None, cost: float = 1) -> RpcSlot:
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        try:
+            while True:
+                wait = self._try_take(waiter, cost)
+                if wait == 0.0:
+                    return RpcSlot()
+                await waiter.wait_async(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def release(self, slot: RpcSlot):
+        with self._lock:
+            self.inflight -= 1
+            if slot.is_throttled:
+                self.throttled += 1
+                self.throttle_streak += 1
+                backoff = slot.retry_after if slot.retry_after is not None else min(30.0, 0.5 * 2 ** (self.throttle_streak - 1))
+                self.blocked_until = max(self.blocked_until, time.monotonic() + backoff)
+                self.rate = max(self.max_rate * 0.1, self.rate * 0.7)
+                self.tokens = 0.0
+                print(f"RPC {self.label} throttled, pausing {backoff:.1f}s and lowering rate to {self.rate:.1f}/s")
+            else:
+                self.throttle_streak = 0
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.01)
+            self._wake_first()
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None, cost: float = 1):
+        slot = self.acquire(priority, cost)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def slot_async(self, priority: Optional[int] = None, cost: float = 1):
+        slot = await self.acquire_async(priority, cost)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 2),
+                "inflight": self.inflight,
+                "queued": len(self._waiters),
+                "granted": self.granted,
+                "throttled": self.throttled,
+            }
+
+
+_schedulers: Dict[str, EndpointScheduler] = {}
+_schedulers_lock = threading.Lock()
+_service = "indexer"
+
+def set_rpc_service(service: str):
+    """
+    Name the service this process runs (indexer, api or bot), before its first RPC call.
+    The indexer, API and bot processes use the same keys, so each one takes only its
+    RPC_SERVICE_SHARES share of every key's quota.
+    """
+    global _service
+    _service = service
+
+def _service_share() -> float:
+    shares = dict(
+        (name.strip(), float(share))
+        for name, share in (item.split("=") for item in os.getenv("RPC_SERVICE_SHARES", "indexer=0.8,api=0.1,bot=0.1").split(",") if item.strip())
+    )
+    return shares.get(_service, 1.0)
+
+def get_scheduler(url: str, label: str = None) -> EndpointScheduler:
+    """Return the process-wide scheduler for the endpoint/key `url`, sized to this service's share of its quota."""
+    with _schedulers_lock:
+        if url not in _schedulers:
+            share = _service_share()
+            _schedulers[url] = EndpointScheduler(
+                label or url,
+                rate=float(os.getenv("RPC_RATE_LIMIT", "25")) * share,
+                burst=max(1.0, float(os.getenv("RPC_BURST", "50")) * share),
+                max_concurrency=max(1, int(int(os.getenv("RPC_MAX_CONCURRENCY", "16")) * share)),
+            )
+        return _schedulers[url]
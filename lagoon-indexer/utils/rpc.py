@@ -1,6 +1,16 @@
 import os
 import time
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
 from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+
+from utils.rate_limiter import get_scheduler, parse_retry_after
+from utils.rpc_cache import MISS, get_rpc_cache
 
 
 FALLBACK_ENV_VARS = {
@@ -12,16 +22,43 @@ FALLBACK_ENV_VARS = {
     10: "OPTIMISM_JSON_RPC",
 }
 
+# Optional WebSocket endpoints, used for newHeads / logs subscriptions
+WS_ENV_VARS = {
+    480: "WORLDCHAIN_WS_RPC",
+    31337: "ANVIL_FORKED_WC_WS_RPC",
+    8453: "BASE_WS_RPC",
+    1: "MAINNET_WS_RPC",
+    11155111: "SEPOLIA_WS_RPC",
+    10: "OPTIMISM_WS_RPC",
+}
+
+# JSON-RPC error codes providers use for throttling; counted against the endpoint
+THROTTLE_ERROR_CODES = {-32005, -32029, 429}
+
 
 def is_rpc_working(url: str) -> bool:
     try:
         w3 = Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": 3}))
         return isinstance(w3.eth.block_number, int)
     except Exception as e:
-        print(f"RPC test failed for {url}: {e}")
+        print(f"RPC test failed for {redact_url(url)}: {e}")
         return False
 
 
+def is_throttle_response(response) -> bool:
+    """True if a JSON-RPC response (or any item of a batch response) is a throttling error."""
+    items = response if isinstance(response, list) else [response]
+    return any(
+        isinstance(item, dict) and isinstance(item.get("error"), dict) and item["error"].get("code") in THROTTLE_ERROR_CODES
+        for item in items
+    )
+
+
+def redact_url(url: str) -> str:
+    """Host plus the last 4 characters, so logs tell keys apart without leaking them."""
+    return f"{urlparse(url).netloc}/…{url[-4:]}"
+
+
 def get_rpc_url_candidates(chain_id: int) -> list[str]:
     urls = []
 
@@ -40,41 +77,226 @@ def get_rpc_url_candidates(chain_id: int) -> list[str]:
     return urls
 
 
-def get_rpc_url(chain_id: int) -> str:
-    """Eagerly return the first working URL (for shallow pre-check use)."""
-    urls = get_rpc_url_candidates(chain_id)
-    if not urls:
-        raise ValueError(f"No RPC URLs configured for chain_id {chain_id}")
-
-    for url in urls:
-        print(f"[{chain_id}] Testing RPC: {url}")
-        if is_rpc_working(url):
-            print(f"[{chain_id}] Using RPC: {url}")
-            return url
-        else:
-            print(f"[{chain_id}] RPC failed: {url}")
-
-    raise ConnectionError(f"[{chain_id}] All RPCs failed in shallow test")
-
-
-def get_w3(chain_id: int, retries_per_url: int = 2, delay: float = 2.0) -> Web3:
-    """Returns a connected Web3 instance after rotating through candidates + retries."""
-    urls = get_rpc_url_candidates(chain_id)
-    if not urls:
-        raise ValueError(f"No RPC URLs available for chain_id {chain_id}")
-
-    for url in urls:
-        for attempt in range(1, retries_per_url + 1):
+def get_ws_url(chain_id: int) -> Optional[str]:
+    """WebSocket RPC URL configured for `chain_id`, or None to stay on HTTP polling."""
+    ws_env = WS_ENV_VARS.get(chain_id)
+    url = os.getenv(ws_env, "").strip() if ws_env else ""
+    return url or None
+
+
+class RpcEndpoint:
+    """One RPC URL (gateway key or fallback) with its running health scores."""
+    def __init__(self, url: str):
+        self.url = url
+        self.label = redact_url(url)
+        self.latency = None  # EWMA of successful request latency, seconds
+        self.error_rate = 0.0  # EWMA of failures, 0..1
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.head = None  # Last block number seen by the health probe
+        self.requests = 0
+        self.failures = 0
+        self.scheduler = get_scheduler(url, self.label)  # Rate limit of this endpoint/key
+
+    def score(self) -> float:
+        """Lower is better. Unknown latency scores like a fast endpoint so new keys get traffic."""
+        return (self.latency if self.latency is not None else 0.1) * (1 + 10 * self.error_rate)
+
+
+class RpcEndpointPool:
+    """
+    Long-lived pool of the RPC endpoints configured for a chain.
+
+    Requests are spread over the healthy endpoints (power of two choices on a
+    latency x error-rate score), every request reports back its outcome, and a
+    daemon thread probes all endpoints with eth_blockNumber in the background,
+    marking the ones that fail or lag behind the others' head as unhealthy until
+    they recover. Nothing here blocks on probing when a client is built.
+    """
+    def __init__(self, chain_id: int, urls: List[str], probe_interval: float = 30.0, unhealthy_after: int = 3,
+                 max_lag_blocks: int = 20, alpha: float = 0.2):
+        if not urls:
+            raise ValueError(f"No RPC URLs configured for chain_id {chain_id}")
+        self.chain_id = chain_id
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.probe_interval = probe_interval
+        self.unhealthy_after = unhealthy_after
+        self.max_lag_blocks = max_lag_blocks
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._probe_session = requests.Session()
+        self._probe_thread = None
+
+    def pick(self, exclude: Iterable[RpcEndpoint] = ()) -> RpcEndpoint:
+        """Choose an endpoint for the next request, avoiding `exclude` when possible."""
+        excluded = set(id(e) for e in exclude)
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and id(e) not in excluded]
+            if not candidates:
+                # Everything is down or excluded: fall back to the least bad endpoint
+                candidates = [e for e in self.endpoints if id(e) not in excluded] or self.endpoints
+                return min(candidates, key=RpcEndpoint.score)
+            if len(candidates) == 1:
+                return candidates[0]
+            first, second = random.sample(candidates, 2)
+            return first if first.score() <= second.score() else second
+
+    def best_url(self) -> str:
+        with self._lock:
+            healthy = [e for e in self.endpoints if e.healthy] or self.endpoints
+            return min(healthy, key=RpcEndpoint.score).url
+
+    def record(self, endpoint: RpcEndpoint, latency: float, ok: bool):
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.error_rate = (1 - self.alpha) * endpoint.error_rate + self.alpha * (0.0 if ok else 1.0)
+            if ok:
+                endpoint.latency = latency if endpoint.latency is None else (1 - self.alpha) * endpoint.latency + self.alpha * latency
+                endpoint.consecutive_failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and endpoint.consecutive_failures >= self.unhealthy_after:
+                endpoint.healthy = False
+                print(f"[{self.chain_id}] RPC {endpoint.label} marked unhealthy after {endpoint.consecutive_failures} failures")
+
+    def probe(self):
+        """Probe every endpoint once and update health, latency and head lag."""
+        heads = {}
+        for endpoint in self.endpoints:
+            start = time.monotonic()
             try:
-                print(f"[{chain_id}] Connecting via Web3 ({attempt}/{retries_per_url}): {url}")
-                w3 = Web3(Web3.HTTPProvider(url, request_kwargs={"timeout": 5}))
-                if is_rpc_working(url):
-                    print(f"[{chain_id}] Connected to RPC: {url}")
-                    return w3
-                else:
-                    print(f"[{chain_id}] Web3 not connected: {url}")
+                response = self._probe_session.post(
+                    endpoint.url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}, timeout=3
+                )
+                response.raise_for_status()
+                heads[id(endpoint)] = int(response.json()["result"], 16)
+                self.record(endpoint, time.monotonic() - start, True)
             except Exception as e:
-                print(f"[{chain_id}] Error on Web3 attempt {attempt}: {e}")
-            time.sleep(delay)
+                self.record(endpoint, time.monotonic() - start, False)
+                with self._lock:
+                    endpoint.healthy = False
+                print(f"[{self.chain_id}] RPC probe failed for {endpoint.label}: {e}")
+
+        top = max(heads.values(), default=None)
+        with self._lock:
+            for endpoint in self.endpoints:
+                head = heads.get(id(endpoint))
+                if head is None:
+                    continue
+                endpoint.head = head
+                was_healthy = endpoint.healthy
+                endpoint.healthy = top - head <= self.max_lag_blocks
+                if endpoint.healthy and not was_healthy:
+                    print(f"[{self.chain_id}] RPC {endpoint.label} healthy again")
+                elif not endpoint.healthy:
+                    print(f"[{self.chain_id}] RPC {endpoint.label} is {top - head} blocks behind, marked unhealthy")
+
+    def start_probing(self):
+        if self._probe_thread is not None or self.probe_interval <= 0:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.probe()
+                except Exception as e:
+                    print(f"[{self.chain_id}] RPC health probe crashed: {e}")
+                time.sleep(self.probe_interval)
+
+        self._probe_thread = threading.Thread(target=run, name=f"rpc-probe-{self.chain_id}", daemon=True)
+        self._probe_thread.start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "endpoint": e.label,
+                    "healthy": e.healthy,
+                    "latency_ms": round(e.latency * 1000, 1) if e.latency is not None else None,
+                    "error_rate": round(e.error_rate, 3),
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "head": e.head,
+                    "limiter": e.scheduler.stats(),
+                }
+                for e in self.endpoints
+            ]
+
+
+_pools: Dict[int, RpcEndpointPool] = {}
+_pools_lock = threading.Lock()
+
+def get_endpoint_pool(chain_id: int) -> RpcEndpointPool:
+    """Return the process-wide endpoint pool for `chain_id`, starting its health probe on first use."""
+    with _pools_lock:
+        if chain_id not in _pools:
+            pool = RpcEndpointPool(
+                chain_id,
+                get_rpc_url_candidates(chain_id),
+                probe_interval=float(os.getenv("RPC_PROBE_INTERVAL", "30")),
+                unhealthy_after=int(os.getenv("RPC_UNHEALTHY_AFTER", "3")),
+                max_lag_blocks=int(os.getenv("RPC_MAX_LAG_BLOCKS", "20")),
+            )
+            pool.start_probing()
+            _pools[chain_id] = pool
+        return _pools[chain_id]
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """
+    web3 provider sending each request to an endpoint chosen by the chain's pool.
+    Transport failures and throttling are reported to the pool and the request
+    is retried once per remaining endpoint. Immutable results are served from
+    the local RPC cache when it is on.
+    """
+    def __init__(self, pool: RpcEndpointPool, timeout: float = 30.0):
+        super().__init__()
+        self.pool = pool
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.cache = get_rpc_cache()
+
+    def make_request(self, method, params):
+        if self.cache is not None:
+            cached = self.cache.get(self.pool.chain_id, method, params)
+            if cached is not MISS:
+                return {"jsonrpc": "2.0", "id": next(self.request_counter), "result": cached}
+        request_data = self.encode_rpc_request(method, params)
+        tried: List[RpcEndpoint] = []
+        while True:
+            endpoint = self.pool.pick(exclude=tried)
+            tried.append(endpoint)
+            start = time.monotonic()
+            try:
+                with endpoint.scheduler.slot() as slot:
+                    raw = self.session.post(
+                        endpoint.url, data=request_data, headers={"Content-Type": "application/json"}, timeout=self.timeout
+                    )
+                    if raw.status_code == 429:
+                        slot.throttled(parse_retry_after(raw.headers.get("Retry-After")))
+                    raw.raise_for_status()
+                    response = self.decode_rpc_response(raw.content)
+                    if is_throttle_response(response):
+                        slot.throttled()
+                        raise requests.HTTPError(f"Throttled by {endpoint.label}: {response['error'].get('message')}")
+            except (requests.RequestException, ValueError) as e:
+                self.pool.record(endpoint, time.monotonic() - start, False)
+                if len(tried) >= len(self.pool.endpoints):
+                    raise
+                print(f"[{self.pool.chain_id}] {method} failed on {endpoint.label}, trying another endpoint: {e}")
+                continue
+            self.pool.record(endpoint, time.monotonic() - start, True)
+            if self.cache is not None and "result" in response:
+                self.cache.observe(self.pool.chain_id, method, params, response["result"])
+            return response
+
+
+def get_rpc_url(chain_id: int) -> str:
+    """Return an endpoint URL from the chain's pool, for callers that need a plain URL."""
+    return get_endpoint_pool(chain_id).pick().url
+
 
-    raise ConnectionError(f"[{chain_id}] Failed to connect to any RPC after retries")
+def get_w3(chain_id: int) -> Web3:
+    """Returns a Web3 instance whose requests are spread over the chain's endpoint pool."""
+    return Web3(PooledHTTPProvider(get_endpoint_pool(chain_id), timeout=float(os.getenv("RPC_TIMEOUT", "30"))))
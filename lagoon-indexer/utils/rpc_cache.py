@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Returned by `RpcResultCache.get` when nothing is cached for a request
+MISS = object()
+
+# Results that never change once their block is final. Receipts and transactions
+# are pinned to the block found in the result, blocks and calls to the requested one,
+# traces to the block of their transaction's receipt.
+PINNED_BY_PARAM = {"eth_getBlockByNumber": 0, "eth_call": 1}
+PINNED_BY_RESULT = {"eth_getTransactionReceipt", "eth_getTransactionByHash"}
+PINNED_BY_TRANSACTION = {"debug_traceTransaction"}
+CONTENT_ADDRESSED = {"eth_getBlockByHash"}
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value)
+
+
+def _pinned_block(method: str, params, result) -> Optional[int]:
+    """
+    Block a cacheable result depends on, -1 if it does not depend on one (content
+    addressed), None if the result must not be cached.
+    """
+    if result is None:
+        return None
+    if method in CONTENT_ADDRESSED:
+        return -1
+    if method in PINNED_BY_RESULT:
+        block_number = result.get("blockNumber") if isinstance(result, dict) else None
+        return int(block_number, 16) if isinstance(block_number, str) else None
+    position = PINNED_BY_PARAM.get(method)
+    if position is None or len(params) <= position:
+        return None
+    tag = params[position]
+    if isinstance(tag, dict) and tag.get("blockHash"):
+        return -1
+    if isinstance(tag, str) and tag.startswith("0x"):
+        return int(tag, 16)
+    return None  # latest, pending, safe, finalized...
+
+
+def _cacheable_request(method: str, params) -> bool:
+    if method in CONTENT_ADDRESSED or method in PINNED_BY_RESULT or method in PINNED_BY_TRANSACTION:
+        return True
+    return method in PINNED_BY_PARAM and _pinned_block(method, params, {}) is not None
+
+
+class RpcResultCache:
+    """
+    Local on-disk (SQLite) cache of immutable JSON-RPC results, shared by every
+    chain and client of a process: blocks by number or hash, receipts,
+    transactions, traces and `eth_call` pinned to a block.
+
+    Entries are content addressed by a hash of (chain id, method, params). A
+    result pinned to a block number is only stored once the block is
+    `confirmations` deep under the highest head seen for its chain, so reorg
+    detection never reads a cached header. A trace is only stored once the
+    receipt or transaction of its hash has been seen in such a block, so fetch
+    that first. The file is kept under `max_bytes` by evicting the least
+    recently used entries.
+    """
+    HEAD_PERSIST_INTERVAL = 60.0
+    MAX_TX_BLOCKS = 100_000
+
+    def __init__(self, path: str, max_bytes: int, confirmations: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.confirmations = confirmations
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.by_method: Dict[str, Dict[str, int]] = {}
+        self._heads: Dict[int, int] = {}
+        self._heads_saved: Dict[int, float] = {}
+        self._tx_blocks: "OrderedDict[Tuple[int, str], int]" = OrderedDict()  # (chain id, tx hash) -> block, from receipts
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rpc_results ("
+            "key TEXT PRIMARY KEY, chain_id INTEGER, method TEXT, value BLOB, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rpc_results_last_used ON rpc_results (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chain_heads (chain_id INTEGER PRIMARY KEY, head INTEGER)")
+        self._heads = dict(self._conn.execute("SELECT chain_id, head FROM chain_heads").fetchall())
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM rpc_results").fetchone()[0]
+
+    @staticmethod
+    def _key(chain_id: int, method: str, params) -> str:
+        canonical = json.dumps([chain_id, method, params], sort_keys=True, separators=(",", ":"), default=_json_default)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _count(self, method: str, outcome: str):
+        counts = self.by_method.setdefault(method, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def note_head(self, chain_id: int, head: int):
+        """Record a chain head seen by a client; it decides which blocks are deep enough to cache."""
+        with self._lock:
+            if head <= self._heads.get(chain_id, -1):
+                return
+            self._heads[chain_id] = head
+            now = time.monotonic()
+            if now - self._heads_saved.get(chain_id, 0.0) < self.HEAD_PERSIST_INTERVAL:
+                return
+            self._heads_saved[chain_id] = now
+            self._conn.execute(
+                "INSERT INTO chain_heads (chain_id, head) VALUES (?, ?) "
+                "ON CONFLICT (chain_id) DO UPDATE SET head = MAX(head, excluded.head)",
+                (chain_id, head),
+            )
+
+    def _note_tx_block(self, chain_id: int, method: str, params, result: Any):
+        """Remember the block of a receipt or transaction, which pins the traces of its hash."""
+        if method not in PINNED_BY_RESULT or not params or not isinstance(result, dict):
+            return
+        block_number = result.get("blockNumber")
+        if not isinstance(block_number, str):
+            return  # Still pending
+        with self._lock:
+            key = (chain_id, str(params[0]).lower())
+            self._tx_blocks[key] = int(block_number, 16)
+            self._tx_blocks.move_to_end(key)
+            while len(self._tx_blocks) > self.MAX_TX_BLOCKS:
+                self._tx_blocks.popitem(last=False)
+
+    def get(self, chain_id: int, method: str, params) -> Any:
+        """Cached result of the request, or `MISS`."""
+        if not _cacheable_request(method, params):
+            return MISS
+        key = self._key(chain_id, method, params)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM rpc_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._count(method, "misses")
+                return MISS
+            self._conn.execute("UPDATE rpc_results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self._count(method, "hits")
+        result = json.loads(zlib.decompress(row[0]))
+        self._note_tx_block(chain_id, method, params, result)
+        return result
+
+    def put(self, chain_id: int, method: str, params, result: Any):
+        """Store `result` if it is immutable: content addressed, or pinned to a block deep enough under the head."""
+        if method in PINNED_BY_TRANSACTION:
+            pinned = self._tx_blocks.get((chain_id, str(params[0]).lower())) if params and result is not None else None
+        else:
+            pinned = _pinned_block(method, params, result)
+        if pinned is None:
+            return
+        if pinned >= 0:
+            head = self._heads.get(chain_id)
+            if head is None or head - pinned < self.confirmations:
+                return
+        value = zlib.compress(json.dumps(result, separators=(",", ":")).encode())
+        key = self._key(chain_id, method, params)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM rpc_results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rpc_results (key, chain_id, method, value, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, chain_id, method, value, len(value), time.time()),
+            )
+            self._bytes += len(value) - (previous[0] if previous else 0)
+            self.stores += 1
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def observe(self, chain_id: int, method: str, params, result: Any):
+        """Feed a fresh result from the node: heads move the confirmation line, immutable results are stored."""
+        if method == "eth_blockNumber" and isinstance(result, str):
+            self.note_head(chain_id, int(result, 16))
+        elif _cacheable_request(method, params):
+            self._note_tx_block(chain_id, method, params, result)
+            self.put(chain_id, method, params, result)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget."""
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM rpc_results").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = self._conn.execute("SELECT key, size FROM rpc_results ORDER BY last_used LIMIT 500").fetchall()
+            if not rows:
+                break
+            dropped = []
+            for key, size in rows:
+                if self._bytes <= target:
+                    break
+                dropped.append((key,))
+                self._bytes -= size
+            self._conn.executemany("DELETE FROM rpc_results WHERE key = ?", dropped)
+            self.evictions += len(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM rpc_results").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": rows,
+                "size_mb": round(self._bytes / 2**20, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "by_method": dict(self.by_method),
+            }
+
+
+_cache: Optional[RpcResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_rpc_cache() -> Optional[RpcResultCache]:
+    """Return the process-wide cache at RPC_CACHE_PATH, None when caching is off."""
+    global _cache
+    path = os.getenv("RPC_CACHE_PATH")
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = RpcResultCache(
+                path,
+                max_bytes=int(float(os.getenv("RPC_CACHE_MAX_MB", "512")) * 2**20),
+                confirmations=int(os.getenv("RPC_CACHE_CONFIRMATIONS", "64")),
+            )
+        return _cache